@@ -0,0 +1,80 @@
+"""
+题库筛选与统计基准：倒排表（BankIndex）对比列式数据（BankColumns，需要 NumPy）
+
+用法:
+    python benchmarks/bank_columns.py [题目数量]
+"""
+import sys
+import time
+import random
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models import Question, QuestionBank
+from models.bank_index import BankIndex
+from models.bank_columns import BankColumns, HAS_NUMPY
+
+TYPES = ['single', 'multiple', 'judge', 'fill', 'essay']
+CHAPTERS = [''] + [f"第{i}章" for i in range(1, 21)]
+TAGS = [f"标签{i}" for i in range(100)]
+
+QUERIES = [
+    ("单一题型", dict(types=['single'])),
+    ("题型+章节+难度", dict(types=['single', 'judge'], chapters=['', '第3章'], min_difficulty=2)),
+    ("标签+难度", dict(tags=['标签5', '标签77'], max_difficulty=3)),
+    ("难度区间+多章节", dict(min_difficulty=2, max_difficulty=4, chapters=CHAPTERS[1:8])),
+]
+
+
+def make_questions(count: int):
+    rng = random.Random(42)
+    return [Question(
+        type=rng.choice(TYPES),
+        question=f"第{i}题",
+        difficulty=rng.randint(1, 5),
+        tags=rng.sample(TAGS, rng.randint(0, 3)),
+        chapter=rng.choice(CHAPTERS),
+        created_at="2024-01-01 12:00:00",
+        updated_at="2024-01-01 12:00:00"
+    ) for i in range(count)]
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    if not HAS_NUMPY:
+        print("未安装 NumPy，无法测试列式数据")
+        return
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    questions = make_questions(count)
+    print(f"题目数量: {count}")
+
+    index, ms = timed(lambda: BankIndex(questions))
+    print(f"构建 倒排表 {ms:8.1f} ms")
+    columns, ms = timed(lambda: BankColumns(questions))
+    print(f"构建 列式   {ms:8.1f} ms")
+
+    for label, criteria in QUERIES:
+        expected, index_ms = timed(lambda: index.select(**criteria))
+        result, columns_ms = timed(lambda: columns.select(**criteria))
+        _, count_ms = timed(lambda: columns.count(**criteria))
+        assert result == expected
+        print(f"{label:<16} 命中 {len(result):>8}   倒排表 {index_ms:7.1f} ms   "
+              f"列式筛选 {columns_ms:6.1f} ms   列式计数 {count_ms:6.2f} ms")
+
+    bank = QuestionBank(questions=questions)
+    bank.COLUMNAR_MIN_QUESTIONS = count + 1
+    expected, loop_ms = timed(bank.get_statistics)
+    result, columns_ms = timed(columns.statistics)
+    assert result == expected
+    print(f"题库统计         逐题遍历 {loop_ms:7.1f} ms   列式 {columns_ms:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
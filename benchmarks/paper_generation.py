@@ -0,0 +1,73 @@
+"""
+组卷基准：在大题库上按难度/章节占比、目标平均难度和标签配额组卷
+
+用法:
+    python benchmarks/paper_generation.py [题目数量]
+"""
+import sys
+import time
+import random
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models import Question, QuestionBank
+from services.paper_generator import CandidatePool, PaperSolver
+from services.paper_service import PaperGenerateConfig
+
+TYPES = ['single', 'multiple', 'judge', 'fill', 'essay']
+CHAPTERS = [''] + [f"第{i}章" for i in range(1, 21)]
+TAGS = [f"标签{i}" for i in range(100)]
+
+CONFIGS = [
+    ("固定题量", dict(single_count=40, multiple_count=20, judge_count=20, fill_count=10)),
+    ("难度+章节占比", dict(single_count=40, multiple_count=20, judge_count=20, fill_count=10,
+                          difficulty_distribution={1: 1, 2: 2, 3: 4, 4: 2, 5: 1},
+                          chapter_distribution={"第1章": 2, "第2章": 1, "未分类": 1})),
+    ("目标难度+标签配额", dict(single_count=40, multiple_count=20, judge_count=20, fill_count=10,
+                              target_difficulty=3.6, tag_quotas={"标签5": 15, "标签7": 10}, total_score=150)),
+]
+
+
+def make_questions(count: int):
+    rng = random.Random(42)
+    return [Question(
+        type=rng.choice(TYPES),
+        question=f"第{i}题",
+        difficulty=rng.randint(1, 5),
+        tags=rng.sample(TAGS, rng.randint(0, 3)),
+        chapter=rng.choice(CHAPTERS),
+        created_at="2024-01-01 12:00:00",
+        updated_at="2024-01-01 12:00:00"
+    ) for i in range(count)]
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    bank = QuestionBank(questions=make_questions(count))
+    print(f"题目数量: {count}")
+    
+    _, ms = timed(bank.get_strata)
+    print(f"分层（首次，含二级索引） {ms:8.1f} ms")
+    
+    rng = random.Random(0)
+    for label, options in CONFIGS:
+        config = PaperGenerateConfig(bank_ids=[bank.id], **options)
+        runs = []
+        for _ in range(20):
+            (selected, report), ms = timed(
+                lambda: PaperSolver(CandidatePool([bank], min_difficulty=1, max_difficulty=5), rng).solve(config))
+            runs.append(ms)
+        runs.sort()
+        print(f"{label:<12} 选题 {len(selected):>4}   平均难度 {report['difficulty']['actual']}   "
+              f"缺口 {len(report['shortfall'])}   中位 {runs[len(runs) // 2]:6.1f} ms   最慢 {runs[-1]:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
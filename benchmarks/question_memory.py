@@ -0,0 +1,87 @@
+"""
+题目对象内存与构造耗时基准
+
+用法:
+    python benchmarks/question_memory.py [题目数量]
+
+分别测量：新建题目（使用默认时间戳）、从 JSON 加载题目（与读取题库文件相同，解析出的字典随后释放）
+两种情况下每道题常驻内存的字节数和构造耗时
+"""
+import sys
+import json
+import time
+import random
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+try:
+    import orjson
+    def json_loads(s): return orjson.loads(s)
+except ImportError:
+    def json_loads(s): return json.loads(s)
+
+from models import Question
+
+TYPES = ['single', 'multiple', 'judge', 'fill', 'essay']
+CHAPTERS = [f"第{i}章" for i in range(1, 11)]
+TAGS = ['基础', '重点', '难点', '易错', '概念', '计算']
+
+
+def make_dicts(count: int):
+    """生成题目字典"""
+    rng = random.Random(42)
+    data = []
+    for i in range(count):
+        q_type = rng.choice(TYPES)
+        data.append({
+            'id': f"{i:08d}-0000-4000-8000-{rng.getrandbits(48):012x}",
+            'type': q_type,
+            'question': f"第{i}题：下列关于某个知识点的说法中，正确的是哪一项？",
+            'options': [f"{c}. 选项内容{c}{i}" for c in 'ABCD'] if q_type in ('single', 'multiple') else [],
+            'answer': 'A' if q_type == 'single' else (['A', 'C'] if q_type == 'multiple' else True),
+            'explanation': "",
+            'difficulty': rng.randint(1, 5),
+            'tags': rng.sample(TAGS, 2),
+            'chapter': rng.choice(CHAPTERS),
+            'created_at': "2024-01-01 12:00:00",
+            'updated_at': "2024-01-01 12:00:00",
+            'source': 'imported',
+        })
+    return data
+
+
+def measure(label: str, build, count: int):
+    """耗时与内存分开测量（tracemalloc 本身会显著拖慢构造）"""
+    start = time.perf_counter()
+    objects = build()
+    elapsed = time.perf_counter() - start
+    del objects
+
+    tracemalloc.start()
+    objects = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10} {current / count:>8.0f} 字节/题   {elapsed / count * 1e6:>6.2f} 微秒/题")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"题目数量: {count}")
+
+    measure("新建", lambda: [Question(question=f"第{i}题", chapter="第1章") for i in range(count)], count)
+
+    raw = json.dumps(make_dicts(count), ensure_ascii=False).encode('utf-8')
+    questions = [Question.from_dict(d) for d in json_loads(raw)]
+    start = time.perf_counter()
+    for q in questions:
+        q.to_dict()
+    print(f"{'转换为字典':<10} {'':>17}   {(time.perf_counter() - start) / count * 1e6:>6.2f} 微秒/题")
+    del questions
+
+    measure("从JSON加载", lambda: [Question.from_dict(d) for d in json_loads(raw)], count)
+
+
+if __name__ == "__main__":
+    main()
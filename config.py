@@ -10,6 +10,8 @@ from cryptography.fernet import Fernet
 import base64
 import hashlib
 
+from utils.atomic_io import atomic_write, configure_group_commit
+
 
 import sys
 
@@ -54,6 +56,10 @@ class PathConfig:
     papers_dir: str = ""     # 试卷数据目录
     results_dir: str = ""    # 成绩数据目录
     favorites_file: str = "" # 收藏数据文件
+    storage_backend: str = "json"  # 存储后端：json 或 sqlite
+    database_file: str = ""  # SQLite 数据库文件（为空时使用 data/answer_system.db）
+    data_format: str = "json"  # JSON 存储的文件格式：json（缩进文本）或 binary（紧凑二进制）
+    data_compression: bool = False  # binary 格式是否 zlib 压缩
     
     def __post_init__(self):
         """初始化默认路径"""
@@ -73,9 +79,15 @@ class AppConfig:
     theme: str = "light"  # light, dark
     language: str = "zh_CN"
     auto_save: bool = True
+    autosave_window_ms: int = 1000  # 自动保存合并窗口（毫秒），窗口内的多次作答一起写入；0 表示每次作答立即写入
     show_answer_immediately: bool = False
     default_time_limit: int = 60  # 默认答题时间（分钟）
     multiple_partial_score: bool = True  # 多选题部分得分
+    group_commit: bool = False  # 组提交：合并短时间内多次写盘的 fsync
+    group_commit_window_ms: int = 5  # 组提交等待窗口（毫秒）
+    bank_cache_mb: int = 512  # 题库缓存内存预算（MB），0表示不限制
+    bank_mmap: bool = True  # 按需读取题库时以内存映射打开快照（Windows 下不使用）
+    paper_snapshot: bool = False  # 组卷时默认把题目内容固化为试卷快照
 
 
 class ConfigManager:
@@ -95,11 +107,13 @@ class ConfigManager:
             return
         
         self._initialized = True
+        self._stamp: Optional[tuple] = None
         self.ai_config = AIConfig()
         self.app_config = AppConfig()
         self.path_config = PathConfig()
         self._ensure_directories()
         self._load_config()
+        self._apply_io_config()
     
     def _ensure_directories(self):
         """确保必要的目录存在"""
@@ -134,12 +148,22 @@ class ConfigManager:
         except Exception:
             return ""
     
+    @staticmethod
+    def _config_stamp() -> Optional[tuple]:
+        """配置文件标识（inode, 修改时间），用于发现其他进程写入的配置"""
+        try:
+            st = os.stat(CONFIG_FILE)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns)
+    
     def _load_config(self):
         """加载配置"""
         if not CONFIG_FILE.exists():
             self._save_config()
             return
         
+        self._stamp = self._config_stamp()
         try:
             with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
                 data = json.load(f)
@@ -174,15 +198,28 @@ class ConfigManager:
                 'paths': asdict(self.path_config)
             }
             
-            with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            atomic_write(CONFIG_FILE, json.dumps(data, ensure_ascii=False, indent=2))
+            self._stamp = self._config_stamp()
                 
         except Exception as e:
             print(f"保存配置失败: {e}")
     
+    def _apply_io_config(self):
+        """应用落盘相关配置"""
+        configure_group_commit(self.app_config.group_commit, self.app_config.group_commit_window_ms)
+    
     def save(self):
         """保存配置"""
         self._save_config()
+        self._apply_io_config()
+    
+    def reload_if_changed(self) -> bool:
+        """配置文件被其他进程改写时重新加载（多进程部署时每次请求前调用，只 stat 一次）"""
+        if self._config_stamp() == self._stamp:
+            return False
+        self._load_config()
+        self._apply_io_config()
+        return True
     
     def set_api_key(self, api_key: str):
         """设置API密钥"""
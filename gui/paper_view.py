@@ -354,7 +354,7 @@ class PaperView(QWidget):
     
     def _preview_paper(self, paper: Paper):
         """预览试卷"""
-        questions = self.paper_service.get_paper_questions(paper.id)
+        questions = self.paper_service.load_paper_questions(paper)
         dialog = PaperPreviewDialog(paper, questions, self)
         dialog.exec()
     
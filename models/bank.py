@@ -1,18 +1,23 @@
 """
 题库数据模型
 """
-from dataclasses import dataclass, field, asdict
-from typing import List, Optional, Dict
+from dataclasses import dataclass, field
+from typing import List, Optional, Dict, Iterable, Tuple
 from datetime import datetime
 import uuid
 
 from .question import Question
+from .bank_index import BankIndex
+from .bank_columns import BankColumns, HAS_NUMPY
 
 
 @dataclass
 class QuestionBank:
     """题库数据模型"""
     
+    # 题目数不少于该值且安装了 NumPy 时，筛选和统计改用列式数据
+    COLUMNAR_MIN_QUESTIONS = 5000
+    
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
     name: str = ""
     description: str = ""
@@ -26,13 +31,125 @@ class QuestionBank:
         """初始化后处理"""
         if self.questions is None:
             self.questions = []
+        self._reset_index()
+    
+    def _reset_index(self):
+        """清空内部索引，下次访问时重建"""
+        self._id_index: Dict[str, int] = {}           # 题目ID -> 列表下标
+        self._content_keys: Dict[str, str] = {}       # 题目ID -> 规范化内容
+        self._content_counts: Dict[str, int] = {}     # 规范化内容 -> 出现次数
+        self._indexed_list: Optional[List[Question]] = None
+        self._indexed_len = 0
+        self._dirty_from: Optional[int] = None        # 该下标之后的位置需重新编号
+        self._facets = None                           # 二级索引（BankIndex 或 BankColumns），首次筛选时构建
+        self._columns: Optional[BankColumns] = None   # 列式数据（需要 NumPy），首次使用时构建
+        self._strata: Optional[tuple] = None          # (构建时的二级索引, 分层题目表, 标签题目表)，随二级索引失效
+    
+    @staticmethod
+    def _normalize_content(content: str) -> str:
+        """规范化题目内容（用于去重）"""
+        return content.strip()
+    
+    def _ensure_index(self):
+        """
+        确保内部索引可用
+        questions 列表被整体替换或在外部增删过元素时自动重建
+        """
+        if self._indexed_list is not self.questions or self._indexed_len != len(self.questions):
+            self.rebuild_index()
+        elif self._dirty_from is not None:
+            for i in range(self._dirty_from, len(self.questions)):
+                self._id_index[self.questions[i].id] = i
+            self._dirty_from = None
+    
+    def rebuild_index(self):
+        """重建内部索引（在外部直接修改题目内容后调用）"""
+        self._reset_index()
+        for i, q in enumerate(self.questions):
+            self._id_index[q.id] = i
+            self._count_content(q.id, q.question)
+        self._indexed_list = self.questions
+        self._indexed_len = len(self.questions)
+    
+    def _count_content(self, question_id: str, content: str):
+        """登记题目内容"""
+        key = self._normalize_content(content)
+        self._content_keys[question_id] = key
+        self._content_counts[key] = self._content_counts.get(key, 0) + 1
+    
+    def _uncount_content(self, question_id: str):
+        """注销题目内容"""
+        key = self._content_keys.pop(question_id, None)
+        if key is None:
+            return
+        count = self._content_counts.get(key, 0) - 1
+        if count > 0:
+            self._content_counts[key] = count
+        else:
+            self._content_counts.pop(key, None)
+    
+    def _get_facets(self):
+        """
+        获取二级索引（惰性构建，题库变更后失效）
+        大题库在安装了 NumPy 时使用列式数据做向量化筛选，否则使用倒排表
+        """
+        self._ensure_index()
+        if self._facets is None:
+            columns = self.get_columns() if len(self.questions) >= self.COLUMNAR_MIN_QUESTIONS else None
+            self._facets = columns if columns is not None else BankIndex(self.questions)
+        return self._facets
+    
+    def get_strata(self) -> Tuple[Dict[tuple, List[Question]], Dict[str, List[Question]]]:
+        """
+        组卷用的分层题目表：({(题型, 难度, 章节): 题目列表}, {标签: 题目列表})，未分类章节记为空字符串
+        与二级索引同时失效：二级索引重建后首次访问时重新分层
+        """
+        facets = self._get_facets()
+        if self._strata is None or self._strata[0] is not facets:
+            strata: Dict[tuple, List[Question]] = {}
+            by_tag: Dict[str, List[Question]] = {}
+            for q in self.questions:
+                strata.setdefault((q.type, q.difficulty, q.chapter or ""), []).append(q)
+                for tag in q.tags:
+                    by_tag.setdefault(tag, []).append(q)
+            self._strata = (facets, strata, by_tag)
+        return self._strata[1], self._strata[2]
+    
+    def get_columns(self) -> Optional[BankColumns]:
+        """获取列式数据（惰性构建，题库变更后失效）；未安装 NumPy 或数据无法编码时返回 None"""
+        if not HAS_NUMPY:
+            return None
+        self._ensure_index()
+        if self._columns is None:
+            try:
+                self._columns = BankColumns(self.questions)
+            except (TypeError, ValueError):
+                self._columns = False
+        return self._columns or None
+    
+    def _find_index(self, question_id: str) -> Optional[int]:
+        """查找题目下标"""
+        self._ensure_index()
+        pos = self._id_index.get(question_id)
+        if pos is not None and self.questions[pos].id != question_id:
+            # 题目对象在外部被替换，重建后再查
+            self.rebuild_index()
+            pos = self._id_index.get(question_id)
+        return pos
     
     def to_dict(self) -> dict:
         """转换为字典"""
-        data = asdict(self)
-        # 题目列表转换
-        data['questions'] = [q.to_dict() if isinstance(q, Question) else q for q in self.questions]
-        return data
+        # 不使用 asdict：它会先深拷贝整个题目列表，随后又被题目字典替换
+        return {
+            'id': self.id,
+            'name': self.name,
+            'description': self.description,
+            'subject': self.subject,
+            'chapters': list(self.chapters),
+            'questions': [q.to_dict() if isinstance(q, Question) else q for q in self.questions],
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
     
     @classmethod
     def from_dict(cls, data: dict) -> 'QuestionBank':
@@ -44,73 +161,126 @@ class QuestionBank:
     
     def add_question(self, question: Question) -> bool:
         """添加题目（支持去重检查）"""
+        self._ensure_index()
         # 检查ID重复
-        if any(q.id == question.id for q in self.questions):
+        if question.id in self._id_index:
             return False
         # 检查内容重复（基于题目内容）
-        if any(q.question.strip() == question.question.strip() for q in self.questions):
+        if self._normalize_content(question.question) in self._content_counts:
             return False
+        self._id_index[question.id] = len(self.questions)
+        self._count_content(question.id, question.question)
         self.questions.append(question)
+        self._indexed_len += 1
+        self._facets = self._columns = None
         self.update()
         return True
     
     def is_duplicate(self, question_content: str) -> bool:
         """检查题目内容是否重复"""
-        return any(q.question.strip() == question_content.strip() for q in self.questions)
+        self._ensure_index()
+        return self._normalize_content(question_content) in self._content_counts
     
     def remove_question(self, question_id: str) -> bool:
         """删除题目"""
-        for i, q in enumerate(self.questions):
-            if q.id == question_id:
-                self.questions.pop(i)
-                self.update()
-                return True
-        return False
+        pos = self._find_index(question_id)
+        if pos is None:
+            return False
+        self.questions.pop(pos)
+        del self._id_index[question_id]
+        self._uncount_content(question_id)
+        self._indexed_len -= 1
+        # 后续题目的下标整体前移一位，延迟到下次访问时再重新编号
+        if self._dirty_from is None or pos < self._dirty_from:
+            self._dirty_from = pos
+        self._facets = self._columns = None
+        self.update()
+        return True
     
     def get_question(self, question_id: str) -> Optional[Question]:
         """获取题目"""
-        for q in self.questions:
-            if q.id == question_id:
-                return q
-        return None
+        pos = self._find_index(question_id)
+        return self.questions[pos] if pos is not None else None
     
     def update_question(self, question: Question) -> bool:
         """更新题目"""
-        for i, q in enumerate(self.questions):
-            if q.id == question.id:
-                question.update()
-                self.questions[i] = question
-                self.update()
-                return True
-        return False
+        pos = self._find_index(question.id)
+        if pos is None:
+            return False
+        question.update()
+        self._uncount_content(question.id)
+        self._count_content(question.id, question.question)
+        self.questions[pos] = question
+        self._facets = self._columns = None
+        self.update()
+        return True
+    
+    def query_questions(self, types: Optional[List[str]] = None,
+                        chapters: Optional[List[str]] = None,
+                        min_difficulty: Optional[int] = None,
+                        max_difficulty: Optional[int] = None,
+                        tags: Optional[List[str]] = None,
+                        ids: Optional[Iterable[str]] = None) -> List[Question]:
+        """
+        按条件组合筛选题目（走二级索引，结果保持题库顺序）
+        同一条件内多个取值为“或”，不同条件之间为“且”；章节传空字符串表示未分类
+        ids 用于限定在给定的题目ID范围内筛选
+        """
+        facets = self._get_facets()
+        positions = facets.select(
+            types=types, chapters=chapters,
+            min_difficulty=min_difficulty, max_difficulty=max_difficulty, tags=tags,
+            positions=self._positions_of(ids)
+        )
+        return [self.questions[i] for i in positions]
+    
+    def count_questions(self, types: Optional[List[str]] = None,
+                        chapters: Optional[List[str]] = None,
+                        min_difficulty: Optional[int] = None,
+                        max_difficulty: Optional[int] = None,
+                        tags: Optional[List[str]] = None,
+                        ids: Optional[Iterable[str]] = None) -> int:
+        """按条件统计题目数量（不构造结果列表）"""
+        facets = self._get_facets()
+        return facets.count(
+            types=types, chapters=chapters,
+            min_difficulty=min_difficulty, max_difficulty=max_difficulty, tags=tags,
+            positions=self._positions_of(ids)
+        )
+    
+    def _positions_of(self, ids: Optional[Iterable[str]]) -> Optional[set]:
+        """题目ID转为列表下标（调用前需已确保索引可用）"""
+        if ids is None:
+            return None
+        return {self._id_index[i] for i in ids if i in self._id_index}
     
     def get_questions_by_type(self, question_type: str) -> List[Question]:
         """按类型获取题目"""
-        return [q for q in self.questions if q.type == question_type]
+        return self.query_questions(types=[question_type])
     
     def get_questions_by_difficulty(self, min_diff: int = 1, max_diff: int = 5) -> List[Question]:
         """按难度范围获取题目"""
-        return [q for q in self.questions if min_diff <= q.difficulty <= max_diff]
+        return self.query_questions(min_difficulty=min_diff, max_difficulty=max_diff)
     
     def get_questions_by_tags(self, tags: List[str]) -> List[Question]:
         """按标签获取题目"""
-        return [q for q in self.questions if any(t in q.tags for t in tags)]
+        return self.query_questions(tags=tags)
     
     def get_questions_by_chapter(self, chapter: str) -> List[Question]:
         """按章节获取题目"""
         if not chapter:
             return self.questions
-        return [q for q in self.questions if q.chapter == chapter]
+        return self.query_questions(chapters=[chapter])
     
     def get_all_chapters(self) -> List[str]:
         """获取所有章节（包含预定义章节和题目中的章节）"""
         # 使用列表保持顺序，先加入预定义的章节
         all_chapters = list(self.chapters) if self.chapters else []
         
-        # 遍历题目，发现不在列表中的章节则追加
-        for q in self.questions:
-            if q.chapter and q.chapter not in all_chapters:
-                all_chapters.append(q.chapter)
+        # 按题目中首次出现的顺序追加不在列表中的章节
+        for chapter in self._get_facets().chapter_names():
+            if chapter and chapter not in all_chapters:
+                all_chapters.append(chapter)
         
         return all_chapters
     
@@ -132,6 +302,11 @@ class QuestionBank:
     
     def get_statistics(self) -> Dict:
         """获取题库统计信息"""
+        if len(self.questions) >= self.COLUMNAR_MIN_QUESTIONS:
+            columns = self.get_columns()
+            if columns is not None:
+                return columns.statistics()
+        
         stats = {
             'total': len(self.questions),
             'by_type': {},
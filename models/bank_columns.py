@@ -0,0 +1,226 @@
+"""
+题库列式表示（可选，依赖 NumPy）
+题型、章节、来源编码为整数列，难度为整数列，标签为位图矩阵，题干（小写）拼接成一个文本块并记录偏移；
+计数、直方图和多条件筛选都是整列的向量运算
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .question import Question
+
+
+HAS_NUMPY = np is not None
+
+
+class BankColumns:
+    """
+    题库列式数据（只读，题库变更后整体丢弃重建）
+    筛选接口与 BankIndex 相同，可直接替代二级索引
+    """
+    
+    def __init__(self, questions: List[Question]):
+        if np is None:
+            raise RuntimeError("列式表示需要安装 NumPy")
+        
+        self.size = len(questions)
+        self._questions = questions
+        # 取值 -> 编码，编码按首次出现的顺序分配
+        self.type_codes: Dict[str, int] = {}
+        self.chapter_codes: Dict[str, int] = {}  # 未分类题目记在空字符串下
+        self.source_codes: Dict[str, int] = {}
+        self.tag_codes: Dict[str, int] = {}
+        
+        types, chapters, sources, difficulties = [], [], [], []
+        tag_rows, tag_cols = [], []
+        for i, q in enumerate(questions):
+            types.append(self.type_codes.setdefault(q.type, len(self.type_codes)))
+            chapters.append(self.chapter_codes.setdefault(q.chapter or "", len(self.chapter_codes)))
+            sources.append(self.source_codes.setdefault(q.source, len(self.source_codes)))
+            difficulties.append(q.difficulty)
+            for tag in q.tags:
+                tag_rows.append(i)
+                tag_cols.append(self.tag_codes.setdefault(tag, len(self.tag_codes)))
+        
+        self.types = np.array(types, dtype=np.int32)
+        self.chapters = np.array(chapters, dtype=np.int32)
+        self.sources = np.array(sources, dtype=np.int32)
+        # 难度不是整数（数据异常）时抛出 TypeError/ValueError，由调用方退回二级索引
+        self.difficulties = np.array(difficulties, dtype=np.int64)
+        
+        # 标签位图：每 64 个标签占一个 uint64 字，按列存储使每个字的整列连续
+        words = max(1, (len(self.tag_codes) + 63) // 64)
+        self.tags = np.zeros((self.size, words), dtype=np.uint64, order='F')
+        if tag_rows:
+            cols = np.array(tag_cols, dtype=np.uint64)
+            np.bitwise_or.at(self.tags, (np.array(tag_rows), (cols >> np.uint64(6)).astype(np.intp)),
+                             np.left_shift(np.uint64(1), cols & np.uint64(63)))
+        
+        # 题干文本块，首次按关键词筛选时构建
+        self._stems: Optional[str] = None
+        self._stem_offsets = None
+    
+    # ============ 筛选 ============
+    
+    def _match_codes(self, column, codes: Dict[str, int], values: Iterable[str]):
+        """列取值属于给定集合的掩码"""
+        wanted = [codes[v] for v in values if v in codes]
+        if not wanted:
+            return np.zeros(self.size, dtype=bool)
+        if len(wanted) == 1:
+            return column == wanted[0]
+        lookup = np.zeros(len(codes), dtype=bool)
+        lookup[wanted] = True
+        return lookup[column]
+    
+    def _match_tags(self, tags: Iterable[str]):
+        """包含任一标签的掩码（只扫描查询标签所在的字）"""
+        query: Dict[int, int] = {}
+        for tag in tags:
+            code = self.tag_codes.get(tag)
+            if code is not None:
+                query[code >> 6] = query.get(code >> 6, 0) | (1 << (code & 63))
+        mask = np.zeros(self.size, dtype=bool)
+        for word, bits in query.items():
+            mask |= (self.tags[:, word] & np.uint64(bits)) != 0
+        return mask
+    
+    def _ensure_stems(self):
+        """构建小写题干文本块（题目之间用 \\0 分隔）及每道题的起始偏移"""
+        if self._stems is not None:
+            return
+        texts = [(q.question or "").lower() for q in self._questions]
+        lengths = np.fromiter((len(t) + 1 for t in texts), dtype=np.int64, count=len(texts))
+        self._stem_offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])) if texts else lengths
+        self._stems = "\0".join(texts)
+    
+    def _match_keyword(self, keyword: str):
+        """题干包含关键词（不区分大小写）的掩码"""
+        keyword = keyword.lower()
+        if not keyword:
+            return np.ones(self.size, dtype=bool)
+        mask = np.zeros(self.size, dtype=bool)
+        if "\0" in keyword:
+            return mask
+        self._ensure_stems()
+        # 匹配后吞掉本题剩余文本，同一道题只记一次
+        pattern = re.compile(re.escape(keyword) + "[^\0]*")
+        hits = [m.start() for m in pattern.finditer(self._stems)]
+        if hits:
+            mask[np.searchsorted(self._stem_offsets, hits, side='right') - 1] = True
+        return mask
+    
+    def mask(self, types: Optional[Iterable[str]] = None,
+             chapters: Optional[Iterable[str]] = None,
+             min_difficulty: Optional[int] = None,
+             max_difficulty: Optional[int] = None,
+             tags: Optional[Iterable[str]] = None,
+             positions: Optional[Set[int]] = None,
+             sources: Optional[Iterable[str]] = None,
+             keyword: Optional[str] = None):
+        """
+        各条件掩码求与（同一条件内多个取值为“或”）
+        返回 None 表示没有任何筛选条件
+        """
+        masks = []
+        if positions is not None:
+            selected = np.zeros(self.size, dtype=bool)
+            selected[np.fromiter(positions, dtype=np.intp, count=len(positions))] = True
+            masks.append(selected)
+        if types is not None:
+            masks.append(self._match_codes(self.types, self.type_codes, types))
+        if chapters is not None:
+            masks.append(self._match_codes(self.chapters, self.chapter_codes, chapters))
+        if sources is not None:
+            masks.append(self._match_codes(self.sources, self.source_codes, sources))
+        if tags is not None:
+            masks.append(self._match_tags(tags))
+        if min_difficulty is not None:
+            masks.append(self.difficulties >= min_difficulty)
+        if max_difficulty is not None:
+            masks.append(self.difficulties <= max_difficulty)
+        if keyword is not None:
+            masks.append(self._match_keyword(keyword))
+        
+        if not masks:
+            return None
+        result = masks[0]
+        for other in masks[1:]:
+            result &= other
+        return result
+    
+    def select(self, **criteria) -> List[int]:
+        """按条件筛选，返回按题库顺序排列的题目下标"""
+        mask = self.mask(**criteria)
+        if mask is None:
+            return list(range(self.size))
+        return np.flatnonzero(mask).tolist()
+    
+    def count(self, **criteria) -> int:
+        """按条件计数"""
+        mask = self.mask(**criteria)
+        return self.size if mask is None else int(np.count_nonzero(mask))
+    
+    def chapter_names(self) -> List[str]:
+        """题目中出现过的章节（按首次出现顺序，含表示未分类的空字符串）"""
+        return list(self.chapter_codes)
+    
+    # ============ 统计 ============
+    
+    def _code_histogram(self, column, codes: Dict[str, int], mask=None) -> Dict[str, int]:
+        values = column if mask is None else column[mask]
+        counts = np.bincount(values, minlength=len(codes))
+        return {name: int(counts[code]) for name, code in codes.items() if counts[code]}
+    
+    def histogram(self, field: str, **criteria) -> Dict:
+        """
+        按字段统计题目数量：field 为 type / chapter / source / difficulty / tag
+        可附带筛选条件，只统计符合条件的题目；键按首次出现的顺序排列
+        """
+        mask = self.mask(**criteria)
+        if field == 'type':
+            return self._code_histogram(self.types, self.type_codes, mask)
+        if field == 'chapter':
+            return self._code_histogram(self.chapters, self.chapter_codes, mask)
+        if field == 'source':
+            return self._code_histogram(self.sources, self.source_codes, mask)
+        if field == 'difficulty':
+            values = self.difficulties if mask is None else self.difficulties[mask]
+            if not values.size:
+                return {}
+            if 0 <= values.min() and values.max() < 256:
+                # 难度取值范围很小，计数用 bincount 代替排序
+                counts = np.bincount(values)
+                levels = np.flatnonzero(counts)
+                first = [int(np.argmax(values == level)) for level in levels]
+                return {int(levels[i]): int(counts[levels[i]]) for i in np.argsort(first, kind='stable')}
+            levels, first, counts = np.unique(values, return_index=True, return_counts=True)
+            order = np.argsort(first, kind='stable')
+            return {int(levels[i]): int(counts[i]) for i in order}
+        if field == 'tag':
+            bits = self.tags if mask is None else self.tags[mask]
+            result = {}
+            for name, code in self.tag_codes.items():
+                count = int(np.count_nonzero(bits[:, code >> 6] & (np.uint64(1) << np.uint64(code & 63))))
+                if count:
+                    result[name] = count
+            return result
+        raise ValueError(f"不支持统计的字段: {field}")
+    
+    def statistics(self) -> Dict:
+        """与 QuestionBank.get_statistics 格式相同的统计结果"""
+        by_chapter = {}
+        for chapter, count in self.histogram('chapter').items():
+            name = chapter if chapter else "未分类"
+            by_chapter[name] = by_chapter.get(name, 0) + count
+        return {
+            'total': self.size,
+            'by_type': self.histogram('type'),
+            'by_difficulty': self.histogram('difficulty'),
+            'by_source': self.histogram('source'),
+            'by_chapter': by_chapter
+        }
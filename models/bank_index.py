@@ -0,0 +1,92 @@
+"""
+题库二级索引
+按题型、章节、难度、标签建立倒排表（值 -> 题目下标集合）
+"""
+from typing import List, Dict, Set, Optional, Iterable
+
+from .question import Question
+
+
+_EMPTY: frozenset = frozenset()
+
+
+class BankIndex:
+    """题库二级索引（只读，题库变更后整体丢弃重建）"""
+    
+    def __init__(self, questions: List[Question]):
+        self.size = len(questions)
+        self.by_type: Dict[str, Set[int]] = {}
+        self.by_chapter: Dict[str, Set[int]] = {}  # 未分类题目记在空字符串下
+        self.by_difficulty: Dict[int, Set[int]] = {}
+        self.by_tag: Dict[str, Set[int]] = {}
+        
+        for i, q in enumerate(questions):
+            self.by_type.setdefault(q.type, set()).add(i)
+            self.by_chapter.setdefault(q.chapter or "", set()).add(i)
+            self.by_difficulty.setdefault(q.difficulty, set()).add(i)
+            for tag in q.tags:
+                self.by_tag.setdefault(tag, set()).add(i)
+    
+    @staticmethod
+    def _union(postings: Dict, keys: Iterable) -> Set[int]:
+        """合并多个取值的倒排表（同一条件内为“或”关系）"""
+        keys = list(keys)
+        if len(keys) == 1:
+            return postings.get(keys[0], _EMPTY)
+        return set().union(*(postings.get(k, _EMPTY) for k in keys))
+    
+    def _collect(self, types: Optional[Iterable[str]] = None,
+                 chapters: Optional[Iterable[str]] = None,
+                 min_difficulty: Optional[int] = None,
+                 max_difficulty: Optional[int] = None,
+                 tags: Optional[Iterable[str]] = None,
+                 positions: Optional[Set[int]] = None) -> Optional[Set[int]]:
+        """
+        求各条件倒排表的交集
+        positions 为预先圈定的题目下标（如全文检索的候选集）
+        返回 None 表示没有任何筛选条件
+        """
+        criteria = []
+        if positions is not None:
+            criteria.append(positions)
+        if types is not None:
+            criteria.append(self._union(self.by_type, types))
+        if chapters is not None:
+            criteria.append(self._union(self.by_chapter, chapters))
+        if tags is not None:
+            criteria.append(self._union(self.by_tag, tags))
+        if min_difficulty is not None or max_difficulty is not None:
+            low = min_difficulty if min_difficulty is not None else float('-inf')
+            high = max_difficulty if max_difficulty is not None else float('inf')
+            levels = [d for d in self.by_difficulty if low <= d <= high]
+            # 难度范围覆盖全部题目时不参与求交
+            if len(levels) < len(self.by_difficulty):
+                criteria.append(self._union(self.by_difficulty, levels))
+        
+        if not criteria:
+            return None
+        
+        # 从最小的集合开始求交，代价与结果规模相当
+        criteria.sort(key=len)
+        result = criteria[0]
+        for other in criteria[1:]:
+            if not result:
+                break
+            result = result & other
+        return result
+    
+    def select(self, **criteria) -> List[int]:
+        """按条件筛选，返回按题库顺序排列的题目下标"""
+        result = self._collect(**criteria)
+        if result is None:
+            return list(range(self.size))
+        return sorted(result)
+    
+    def count(self, **criteria) -> int:
+        """按条件计数"""
+        result = self._collect(**criteria)
+        return self.size if result is None else len(result)
+    
+    def chapter_names(self) -> List[str]:
+        """题目中出现过的章节（按首次出现顺序，含表示未分类的空字符串）"""
+        return list(self.by_chapter)
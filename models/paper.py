@@ -36,6 +36,7 @@ class Paper:
     })
     source_banks: List[str] = field(default_factory=list)  # 来源题库ID列表
     shuffle_questions: bool = False  # 是否打乱题目顺序
+    snapshot: bool = False  # 题目内容已固化为试卷快照，答题与查看结果不再从题库取题
     
     def __post_init__(self):
         """初始化后处理"""
@@ -56,7 +57,8 @@ class Paper:
             'questions': [asdict(q) if isinstance(q, PaperQuestion) else q for q in self.questions],
             'score_rules': self.score_rules,
             'source_banks': self.source_banks,
-            'shuffle_questions': self.shuffle_questions
+            'shuffle_questions': self.shuffle_questions,
+            'snapshot': self.snapshot
         }
         return data
     
@@ -67,7 +69,7 @@ class Paper:
         
         # 过滤有效字段
         valid_fields = ['id', 'title', 'description', 'created_at', 'time_limit', 
-                       'total_score', 'score_rules', 'source_banks', 'shuffle_questions']
+                       'total_score', 'score_rules', 'source_banks', 'shuffle_questions', 'snapshot']
         paper_data = {k: v for k, v in data.items() if k in valid_fields}
         
         paper = cls(**paper_data)
@@ -2,9 +2,9 @@
 题目数据模型
 """
 from enum import Enum
-from dataclasses import dataclass, field, asdict
 from typing import List, Optional, Union
-from datetime import datetime
+import sys
+import time
 import uuid
 
 
@@ -37,35 +37,108 @@ class QuestionType(Enum):
         raise ValueError(f"未知的题目类型: {value}")
 
 
-@dataclass
+def _format_time(timestamp: float) -> str:
+    """格式化时间戳"""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+def _intern(value):
+    """驻留字符串：题型、章节、标签等取值很少，大题库中的大量题目共享同一个字符串对象"""
+    return sys.intern(value) if value.__class__ is str else value
+
+
 class Question:
-    """题目数据模型"""
-    
-    id: str = field(default_factory=lambda: str(uuid.uuid4()))
-    type: str = QuestionType.SINGLE.value
-    question: str = ""
-    options: List[str] = field(default_factory=list)
-    answer: Union[str, List[str], bool] = ""
-    explanation: str = ""
-    difficulty: int = 3  # 1-5难度等级
-    tags: List[str] = field(default_factory=list)
-    chapter: str = ""  # 章节/分类
-    created_at: str = field(default_factory=lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    updated_at: str = field(default_factory=lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    source: str = "manual"  # manual, ai_generated, imported
-    
-    def __post_init__(self):
-        """初始化后处理"""
-        # 确保options是列表
-        if self.options is None:
-            self.options = []
-        # 确保tags是列表
-        if self.tags is None:
-            self.tags = []
+    """
+    题目数据模型
+    使用 __slots__ 避免每个实例的 __dict__；默认时间戳先记录为数值，首次读取时才格式化
+    bank_id 只在试卷中的题目上设置，未设置时 to_dict 不输出
+    """
+    
+    # 字段顺序与序列化格式一致
+    FIELDS = ('id', 'type', 'question', 'options', 'answer', 'explanation',
+              'difficulty', 'tags', 'chapter', 'created_at', 'updated_at', 'source')
+    _FIELD_SET = frozenset(FIELDS)
+    
+    __slots__ = ('id', 'type', 'question', 'options', 'answer', 'explanation',
+                 'difficulty', 'tags', 'chapter', '_created_at', '_updated_at', 'source', 'bank_id')
+    
+    def __init__(self, id: str = None, type: str = QuestionType.SINGLE.value, question: str = "",
+                 options: List[str] = None, answer: Union[str, List[str], bool] = "",
+                 explanation: str = "", difficulty: int = 3,  # 1-5难度等级
+                 tags: List[str] = None, chapter: str = "",  # 章节/分类
+                 created_at: str = None, updated_at: str = None,
+                 source: str = "manual"):  # manual, ai_generated, imported
+        self.id = id if id is not None else str(uuid.uuid4())
+        self.type = _intern(type)
+        self.question = question
+        # 确保options、tags是列表
+        self.options = options if options is not None else []
+        self.answer = answer
+        self.explanation = explanation
+        self.difficulty = difficulty
+        self.tags = [_intern(t) for t in tags] if tags else []
+        self.chapter = _intern(chapter)
+        if created_at is None or updated_at is None:
+            now = time.time()
+            created_at = now if created_at is None else created_at
+            updated_at = now if updated_at is None else updated_at
+        self._created_at = created_at
+        self._updated_at = updated_at
+        self.source = _intern(source)
+    
+    @property
+    def created_at(self) -> str:
+        value = self._created_at
+        if value.__class__ is float:
+            value = self._created_at = _format_time(value)
+        return value
+    
+    @created_at.setter
+    def created_at(self, value: str):
+        self._created_at = value
+    
+    @property
+    def updated_at(self) -> str:
+        value = self._updated_at
+        if value.__class__ is float:
+            value = self._updated_at = _format_time(value)
+        return value
+    
+    @updated_at.setter
+    def updated_at(self, value: str):
+        self._updated_at = value
+    
+    def _astuple(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.FIELDS)
+    
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._astuple() == other._astuple()
+    
+    __hash__ = None
+    
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)
+        return f"Question({fields})"
     
     def to_dict(self) -> dict:
-        """转换为字典"""
-        data = asdict(self)
+        """转换为字典（列表字段复制一份，修改返回值不影响题目对象）"""
+        answer = self.answer
+        data = {
+            'id': self.id,
+            'type': self.type,
+            'question': self.question,
+            'options': list(self.options),
+            'answer': list(answer) if answer.__class__ is list else answer,
+            'explanation': self.explanation,
+            'difficulty': self.difficulty,
+            'tags': list(self.tags),
+            'chapter': self.chapter,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'source': self.source
+        }
         # 包含动态添加的bank_id属性（用于试卷中的题目）
         if hasattr(self, 'bank_id'):
             data['bank_id'] = self.bank_id
@@ -75,9 +148,10 @@ class Question:
     def from_dict(cls, data: dict) -> 'Question':
         """从字典创建实例"""
         # 处理可能缺失的字段
-        valid_fields = {f.name for f in cls.__dataclass_fields__.values()}
-        filtered_data = {k: v for k, v in data.items() if k in valid_fields}
-        return cls(**filtered_data)
+        valid_fields = cls._FIELD_SET
+        if data.keys() <= valid_fields:
+            return cls(**data)
+        return cls(**{k: v for k, v in data.items() if k in valid_fields})
     
     def get_type_display(self) -> str:
         """获取题目类型显示名称"""
@@ -138,4 +212,4 @@ class Question:
     
     def update(self):
         """更新修改时间"""
-        self.updated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.updated_at = _format_time(time.time())
@@ -35,6 +35,14 @@ class ExamResult:
     details: List[QuestionResult] = field(default_factory=list)
     status: str = "in_progress"  # in_progress, completed, timeout
     source_banks: List[str] = field(default_factory=list)  # 来源题库ID列表
+    # 打乱顺序的考试：details 的顺序即作答顺序，option_orders 为各题的选项排列
+    # （显示的第 i 个选项是原第 option_orders[题目ID][i] 个），由 shuffle_seed 生成
+    shuffle_seed: Optional[int] = None
+    option_orders: Dict[str, List[int]] = field(default_factory=dict)
+    # 题目ID -> details 下标（按需建立，details 被替换或增删后自动重建），不参与序列化和比较
+    _detail_index: Dict[str, int] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _indexed_details: Optional[list] = field(default=None, init=False, repr=False, compare=False)
+    _indexed_count: int = field(default=0, init=False, repr=False, compare=False)  # 建立索引时 details 的长度
     
     def __post_init__(self):
         """初始化后处理"""
@@ -42,6 +50,8 @@ class ExamResult:
             self.details = []
         if self.source_banks is None:
             self.source_banks = []
+        if self.option_orders is None:
+            self.option_orders = {}
     
     def to_dict(self) -> dict:
         """转换为字典"""
@@ -56,7 +66,9 @@ class ExamResult:
             'user_score': self.user_score,
             'details': [asdict(d) if isinstance(d, QuestionResult) else d for d in self.details],
             'status': self.status,
-            'source_banks': self.source_banks
+            'source_banks': self.source_banks,
+            'shuffle_seed': self.shuffle_seed,
+            'option_orders': self.option_orders
         }
         return data
     
@@ -66,7 +78,8 @@ class ExamResult:
         details_data = data.pop('details', [])
         
         valid_fields = ['id', 'paper_id', 'paper_title', 'user_id', 'start_time', 
-                       'end_time', 'total_score', 'user_score', 'status', 'source_banks']
+                       'end_time', 'total_score', 'user_score', 'status', 'source_banks',
+                       'shuffle_seed', 'option_orders']
         result_data = {k: v for k, v in data.items() if k in valid_fields}
         
         result = cls(**result_data)
@@ -76,21 +89,47 @@ class ExamResult:
         ]
         return result
     
+    def _index_of(self, question_id: str) -> Optional[int]:
+        """题目在 details 中的下标（平均 O(1)），不存在时返回 None"""
+        index = self._detail_index
+        if self._indexed_details is self.details:
+            i = index.get(question_id)
+            if i is not None and i < len(self.details) and self.details[i].question_id == question_id:
+                return i
+            # details 有重复题目时索引条目少于 details，按建立时的长度判断索引是否完整
+            if i is None and self._indexed_count == len(self.details):
+                return None
+        # 索引已过期（details 被替换或直接修改过），重建
+        self._indexed_details = self.details
+        self._indexed_count = len(self.details)
+        index.clear()
+        for pos, d in enumerate(self.details):
+            index.setdefault(d.question_id, pos)
+        return index.get(question_id)
+    
     def add_answer(self, question_result: QuestionResult):
         """添加答题记录"""
         # 检查是否已存在该题的答案
-        for i, d in enumerate(self.details):
-            if d.question_id == question_result.question_id:
-                self.details[i] = question_result
-                return
+        i = self._index_of(question_result.question_id)
+        if i is not None:
+            self.details[i] = question_result
+            return
         self.details.append(question_result)
+        self._detail_index[question_result.question_id] = len(self.details) - 1
+        self._indexed_count = len(self.details)
     
     def get_answer(self, question_id: str) -> Optional[QuestionResult]:
         """获取某题的答题记录"""
-        for d in self.details:
-            if d.question_id == question_id:
-                return d
-        return None
+        i = self._index_of(question_id)
+        return None if i is None else self.details[i]
+    
+    def record_answer(self, question_id: str, answer) -> bool:
+        """记录某题的作答，返回是否有该题"""
+        i = self._index_of(question_id)
+        if i is None:
+            return False
+        self.details[i].user_answer = answer
+        return True
     
     def calculate_score(self):
         """计算总得分"""
@@ -7,6 +7,7 @@ from .exam_service import ExamService
 from .ai_service import AIService
 from .import_service import ImportService
 from .favorite_service import FavoriteService
+from .search_service import SearchService
 
 __all__ = [
     'BankService',
@@ -14,5 +15,6 @@ __all__ = [
     'ExamService',
     'AIService',
     'ImportService',
-    'FavoriteService'
+    'FavoriteService',
+    'SearchService'
 ]
@@ -2,11 +2,13 @@
 题库服务 - 处理题库的增删改查
 """
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Iterable
 from datetime import datetime
+from contextlib import contextmanager
 from functools import lru_cache
 import hashlib
 import os
+import threading
 
 # 使用高性能 JSON 库（比标准库快 10-50 倍）
 try:
@@ -18,59 +20,173 @@ except ImportError:
     def json_loads(s): return json.loads(s)
     def json_dumps(obj): return json.dumps(obj, ensure_ascii=False, indent=2)
 
-from config import BANKS_DIR, DATA_DIR, APP_ROOT, config as app_config
+from config import config as app_config
 from models import QuestionBank, Question
+from utils.sized_cache import SizedLRUCache
+from services.search_service import SearchService
+from services.question_locator import QuestionLocator
+from services.storage import get_storage, change_feed
+from services.storage.base import BankView, MaterializedBankView
 
 
 class BankService:
-    """题库服务类"""
+    """题库服务类（持久化细节由存储后端负责，见 services/storage）"""
     
-    META_FILE = DATA_DIR / "banks_meta.json"
+    # 内存中的元数据，是本进程的权威副本；存储中的版本变化（其他进程写入）时才重新读取
+    _meta: Optional[Dict] = None
+    _meta_stat: Optional[tuple] = None
     
-    # 题库缓存：{bank_id: (mtime, QuestionBank)}
-    _cache: Dict[str, tuple] = {}
+    # 元数据版本号（内容每变化一次加一）与对外发布的只读视图：
+    # (版本号, ETag, 摘要列表)，读取方无需加锁即可直接使用
+    _meta_version = 0
+    _meta_view: tuple = (0, None, ())
+    
+    # 题库缓存：bank_id -> (存储版本标识, QuestionBank)，按估算内存 LRU 淘汰
+    _cache = SizedLRUCache(lambda: max(app_config.app_config.bank_cache_mb, 0) * 1024 * 1024)
+    
+    # 内存中题库对象约为序列化数据大小的倍数，用于估算缓存占用
+    MEMORY_PER_FILE_BYTE = 4
+    
+    # 每个题库一把锁，保证内存对象、增量写入与快照合并的一致性
+    _bank_locks: Dict[str, threading.RLock] = {}
+    _locks_guard = threading.Lock()
+    
+    # 正在后台合并的题库
+    _compacting: set = set()
+    
+    # 快照整体重写次数，用于让进行中的后台合并失效
+    _generations: Dict[str, int] = {}
     
     def __init__(self):
+        self.storage = get_storage().banks
+        self.search_service = SearchService()
+        self.locator = QuestionLocator()
         self._ensure_meta_file()
     
-    def _get_banks_dir(self) -> Path:
-        """获取题库存储目录（动态读取配置）"""
-        custom_dir = app_config.path_config.banks_dir
-        if custom_dir:
-            try:
-                path = Path(custom_dir)
-                # 确保是绝对路径
-                if not path.is_absolute():
-                    path = APP_ROOT / path
-                
-                path.mkdir(parents=True, exist_ok=True)
-                return path
-            except Exception as e:
-                print(f"使用自定义题库目录失败: {e}，将使用默认目录")
-                return BANKS_DIR
-        return BANKS_DIR
-    
     def _ensure_meta_file(self):
-        """确保元数据文件存在"""
-        if not self.META_FILE.exists():
-            self._save_meta({})
+        """确保元数据存在"""
+        with self.storage.meta_lock(write=True):
+            if self.storage.meta_stamp() is None:
+                self._write_meta({})
+                # 还没有任何题库，题目定位索引从空开始维护，不需要之后扫描题库建立
+                self.locator.initialize()
     
-    def _load_meta(self) -> Dict:
-        """加载题库元数据"""
+    def _refresh_meta(self) -> Dict:
+        """存储中的元数据版本变化时重新读取（调用方需持有元数据锁）"""
+        stamp = self.storage.meta_stamp()
+        if BankService._meta is None or stamp != BankService._meta_stat:
+            meta = self.storage.read_meta()
+            BankService._meta = meta
+            BankService._meta_stat = stamp
+            self._publish_meta(meta)
+        return BankService._meta
+    
+    def _write_meta(self, meta: Dict):
+        """写入元数据并更新内存副本（调用方需持有元数据写锁）"""
         try:
-            with open(self.META_FILE, 'rb') as f:
-                return json_loads(f.read())
-        except:
-            return {}
+            self.storage.write_meta(meta)
+        except BaseException:
+            BankService._meta = None
+            raise
+        BankService._meta = meta
+        BankService._meta_stat = self.storage.meta_stamp()
+        self._publish_meta(meta)
+    
+    def _publish_meta(self, meta: Dict):
+        """
+        生成新的只读视图（调用方需持有元数据锁）
+        ETag 取元数据内容摘要，多个进程读到同一份元数据时得到相同的 ETag
+        """
+        raw = json_dumps(meta).encode('utf-8')
+        etag = '"%s"' % hashlib.blake2b(raw, digest_size=8).hexdigest()
+        if etag == BankService._meta_view[1]:
+            return
+        summaries = tuple({'id': bank_id, **info} for bank_id, info in meta.items())
+        BankService._meta_version += 1
+        BankService._meta_view = (BankService._meta_version, etag, summaries)
+    
+    def _get_meta_view(self) -> tuple:
+        """
+        获取元数据只读视图
+        只比对存储中的元数据版本标识，未变化时直接返回内存中的视图
+        """
+        if BankService._meta is None or self.storage.meta_stamp() != BankService._meta_stat:
+            with self.storage.meta_lock():
+                self._refresh_meta()
+        return BankService._meta_view
+    
+    def get_meta_version(self) -> tuple:
+        """元数据版本：(版本号, ETag)，用于客户端缓存校验"""
+        version, etag, _ = self._get_meta_view()
+        return version, etag
+    
+    def _load_meta(self) -> Dict:
+        """加载题库元数据（返回副本，修改请使用 _edit_meta）"""
+        with self.storage.meta_lock():
+            meta = self._refresh_meta()
+            return {bank_id: dict(info) for bank_id, info in meta.items()}
     
     def _save_meta(self, meta: Dict):
-        """保存题库元数据"""
-        with open(self.META_FILE, 'w', encoding='utf-8') as f:
-            f.write(json_dumps(meta))
+        """保存题库元数据（整体覆盖）"""
+        with self.storage.meta_lock(write=True):
+            self._write_meta(meta)
     
-    def _get_bank_file(self, bank_id: str) -> Path:
-        """获取题库文件路径"""
-        return self._get_banks_dir() / f"bank_{bank_id}.json"
+    @contextmanager
+    def _edit_meta(self):
+        """
+        元数据读-改-写事务
+        持有写锁期间读取最新元数据，退出时写回；其他线程和进程的修改不会被覆盖丢失
+        """
+        with self.storage.meta_lock(write=True):
+            meta = self._refresh_meta()
+            try:
+                yield meta
+            except BaseException:
+                # 修改未完成，丢弃内存副本，下次从存储重新读取
+                BankService._meta = None
+                raise
+            self._write_meta(meta)
+    
+    @staticmethod
+    def _meta_entry(bank: QuestionBank) -> Dict:
+        """题库的元数据条目"""
+        return {
+            'name': bank.name,
+            'description': bank.description,
+            'subject': bank.subject,
+            'question_count': len(bank.questions),
+            'created_at': bank.created_at,
+            'updated_at': bank.updated_at
+        }
+    
+    def _get_bank_lock(self, bank_id: str) -> threading.RLock:
+        """获取题库锁"""
+        with self._locks_guard:
+            lock = self._bank_locks.get(bank_id)
+            if lock is None:
+                lock = threading.RLock()
+                self._bank_locks[bank_id] = lock
+            return lock
+    
+    @contextmanager
+    def _writing(self, bank_id: str, notify: bool = True):
+        """
+        修改题库：本进程内按题库加锁，同时持有存储的题库写锁与其他进程互斥；
+        结束后通知其他进程（多 worker 部署时）丢弃该题库的缓存
+        """
+        with self._get_bank_lock(bank_id), self.storage.write_lock(bank_id):
+            yield
+        if notify:
+            change_feed.publish('bank', bank_id)
+    
+    @classmethod
+    def _on_remote_change(cls, bank_id: Optional[str]):
+        """其他进程修改了题库（变更通知），丢弃本进程的缓存；元数据按存储版本标识自动重新读取"""
+        if bank_id is None:
+            cls._cache.clear()
+        else:
+            cls._cache.pop(bank_id)
+            cls._cache.pop(cls._view_key(bank_id))
     
     def create_bank(self, name: str, description: str = "", subject: str = "") -> QuestionBank:
         """创建新题库"""
@@ -80,196 +196,331 @@ class BankService:
             subject=subject
         )
         
-        # 保存题库文件
+        # 保存题库
         self._save_bank(bank)
         
         # 更新元数据
-        meta = self._load_meta()
-        meta[bank.id] = {
-            'name': bank.name,
-            'description': bank.description,
-            'subject': bank.subject,
-            'question_count': 0,
-            'created_at': bank.created_at,
-            'updated_at': bank.updated_at
-        }
-        self._save_meta(meta)
+        with self._edit_meta() as meta:
+            meta[bank.id] = self._meta_entry(bank)
         
         return bank
     
     def _save_bank(self, bank: QuestionBank):
-        """保存题库到文件"""
-        file_path = self._get_bank_file(bank.id)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(json_dumps(bank.to_dict()))
-        # 清除缓存
-        if bank.id in self._cache:
-            del self._cache[bank.id]
+        """整体保存题库（JSON 存储下完整重写快照并清空修改日志）"""
+        with self._writing(bank.id):
+            self.storage.save(bank)
+            self._generations[bank.id] = self._generations.get(bank.id, 0) + 1
+            # 清除缓存
+            self._cache.pop(bank.id)
+            self._cache.pop(self._view_key(bank.id))
+            self.search_service.on_bank_saved(bank)
+            self.locator.record([{'b': bank.id, 'op': 'set', 'n': len(bank.questions),
+                                  'ids': [q.id for q in bank.questions]}])
     
-    def get_bank(self, bank_id: str) -> Optional[QuestionBank]:
-        """获取题库（带缓存）"""
-        file_path = self._get_bank_file(bank_id)
-        if not file_path.exists():
-            return None
+    def _append_log(self, bank: QuestionBank, records: List[Dict]):
+        """
+        保存题目增量修改，只写入变更的题目而不重写整个题库
+        调用方需持有题库锁，且 bank 为缓存中的对象
+        """
+        for record in records:
+            record['updated_at'] = bank.updated_at
+        
+        signature, nbytes, need_compact = self.storage.append(bank, records)
+        
+        # 内存对象已是最新状态，直接刷新缓存标识避免重新加载
+        self._cache.put(bank.id, signature, bank, self._estimate_size(nbytes))
+        
+        if need_compact:
+            self._schedule_compaction(bank.id)
+    
+    def _schedule_compaction(self, bank_id: str):
+        """在后台线程中把修改日志合并回快照"""
+        with self._locks_guard:
+            if bank_id in self._compacting:
+                return
+            self._compacting.add(bank_id)
         
+        def run():
+            try:
+                self.compact_bank(bank_id)
+            except Exception as e:
+                print(f"合并题库日志失败: {e}")
+            finally:
+                with self._locks_guard:
+                    self._compacting.discard(bank_id)
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def compact_bank(self, bank_id: str) -> bool:
+        """将修改日志合并进快照（不使用日志的存储后端无需合并）"""
+        with self._writing(bank_id, notify=False):
+            bank = self.get_bank(bank_id)
+            if not bank:
+                return False
+            log_offset = self.storage.pending_bytes(bank_id)
+            if log_offset == 0:
+                return True
+            generation = self._generations.get(bank_id, 0)
+            snapshot = self.storage.snapshot_signature(bank_id)
+            data = bank.to_dict()
+        
+        # 序列化在锁外进行，期间的新修改继续追加到日志尾部
+        payload = self.storage.encode_snapshot(data)
+        
+        with self._writing(bank_id, notify=False):
+            # 期间题库被（本进程或其他进程）整体重写或删除过，本次合并作废
+            if self._generations.get(bank_id, 0) != generation or \
+                    self.storage.snapshot_signature(bank_id) != snapshot:
+                return False
+            signature, nbytes = self.storage.write_snapshot(bank_id, payload, log_offset)
+            cached = self._cache.peek(bank_id)
+            if cached and cached[1] is bank:
+                self._cache.put(bank_id, signature, bank, self._estimate_size(nbytes))
+        return True
+    
+    def get_bank(self, bank_id: str) -> Optional[QuestionBank]:
+        """获取题库（带缓存，存储中的版本标识变化时重新加载）"""
         try:
-            # 检查缓存是否有效（基于文件修改时间）
-            mtime = os.path.getmtime(file_path)
-            if bank_id in self._cache:
-                cached_mtime, cached_bank = self._cache[bank_id]
-                if cached_mtime == mtime:
+            with self._get_bank_lock(bank_id):
+                signature = self.storage.signature(bank_id)
+                if signature is None:
+                    return None
+                cached_bank = self._cache.get(bank_id, signature)
+                if cached_bank is not None:
                     return cached_bank
-            
-            # 使用高性能 JSON 解析
-            with open(file_path, 'rb') as f:
-                data = json_loads(f.read())
-            bank = QuestionBank.from_dict(data)
-            
-            # 更新缓存
-            self._cache[bank_id] = (mtime, bank)
-            return bank
+                
+                loaded = self.storage.load(bank_id)
+                if loaded is None:
+                    return None
+                bank, signature, nbytes = loaded
+                
+                # 更新缓存
+                self._cache.put(bank_id, signature, bank, self._estimate_size(nbytes))
+                return bank
         except Exception as e:
             print(f"加载题库失败: {e}")
             return None
     
+    @staticmethod
+    def _view_key(bank_id: str) -> tuple:
+        """题库视图在缓存中的键（与完整题库对象共用同一缓存和内存预算）"""
+        return ('view', bank_id)
+    
+    def get_bank_view(self, bank_id: str) -> Optional[BankView]:
+        """
+        获取题库只读视图，用于分页浏览等只需要部分题目的场景
+        完整题库已在缓存中时直接复用；否则打开按需解析的视图，不为每道题创建 Question 对象
+        """
+        try:
+            with self._get_bank_lock(bank_id):
+                signature = self.storage.signature(bank_id)
+                if signature is None:
+                    return None
+                cached = self._cache.peek(bank_id)
+                if cached and cached[0] == signature:
+                    return MaterializedBankView(cached[1], signature)
+                
+                key = self._view_key(bank_id)
+                view = self._cache.get(key, signature)
+                if view is not None:
+                    return view
+                view = self.storage.open_view(bank_id)
+                if view is not None:
+                    self._cache.put(key, view.signature, view, view.nbytes)
+                return view
+        except Exception as e:
+            print(f"加载题库视图失败: {e}")
+            return None
+    
+    def _estimate_size(self, nbytes: int) -> int:
+        """按序列化数据的字节数估算题库对象占用的内存"""
+        return nbytes * self.MEMORY_PER_FILE_BYTE
+    
     def invalidate_cache(self, bank_id: str = None):
         """清除缓存"""
         if bank_id:
-            self._cache.pop(bank_id, None)
+            self._cache.pop(bank_id)
+            self._cache.pop(self._view_key(bank_id))
         else:
             self._cache.clear()
     
+    @classmethod
+    def pin_banks(cls, bank_ids):
+        """固定题库缓存（完整题库与题库视图），进行中的考试引用的题库不被淘汰"""
+        for bank_id in bank_ids:
+            cls._cache.pin(bank_id)
+            cls._cache.pin(cls._view_key(bank_id))
+    
+    @classmethod
+    def unpin_banks(cls, bank_ids):
+        """取消固定题库缓存"""
+        for bank_id in bank_ids:
+            cls._cache.unpin(bank_id)
+            cls._cache.unpin(cls._view_key(bank_id))
+    
+    def get_cache_stats(self) -> Dict:
+        """题库缓存统计：条目数、估算字节数、命中/未命中/淘汰次数"""
+        return self._cache.stats()
+    
     def get_all_banks(self) -> List[QuestionBank]:
         """获取所有题库"""
-        meta = self._load_meta()
+        _, _, summaries = self._get_meta_view()
         banks = []
-        for bank_id in meta.keys():
-            bank = self.get_bank(bank_id)
+        for summary in summaries:
+            bank = self.get_bank(summary['id'])
             if bank:
                 banks.append(bank)
         return banks
     
     def get_banks_summary(self) -> List[Dict]:
-        """获取题库摘要列表（不加载题目）"""
-        meta = self._load_meta()
-        summaries = []
-        for bank_id, info in meta.items():
-            summaries.append({
-                'id': bank_id,
-                **info
-            })
-        return summaries
+        """获取题库摘要列表（不加载题目，直接使用内存中的元数据）"""
+        _, _, summaries = self._get_meta_view()
+        return [dict(summary) for summary in summaries]
+    
+    def locate_questions(self, question_ids: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        查找题目所在的题库：{题目ID: [题库ID, ...]}，找不到的题目不在结果中
+        只查题目定位索引，不加载题库；与元数据题目数不一致的题库才重新读取题目ID
+        """
+        _, _, summaries = self._get_meta_view()
+        counts = {summary['id']: summary.get('question_count', 0) for summary in summaries}
+        return self.locator.locate(question_ids, counts, self._question_ids)
+    
+    def _question_ids(self, bank_id: str) -> Optional[List[str]]:
+        """题库的全部题目ID（题库不存在时返回 None）"""
+        bank = self.get_bank(bank_id)
+        return [q.id for q in bank.questions] if bank else None
     
     def update_bank(self, bank: QuestionBank) -> bool:
         """更新题库"""
-        if not self._get_bank_file(bank.id).exists():
+        if not self.storage.exists(bank.id):
             return False
         
         bank.update()
+        # 调用方可能直接修改过题目对象，重建去重索引
+        bank.rebuild_index()
         self._save_bank(bank)
         
         # 更新元数据
-        meta = self._load_meta()
-        if bank.id in meta:
-            meta[bank.id].update({
-                'name': bank.name,
-                'description': bank.description,
-                'subject': bank.subject,
-                'question_count': len(bank.questions),
-                'updated_at': bank.updated_at
-            })
-            self._save_meta(meta)
+        with self._edit_meta() as meta:
+            if bank.id in meta:
+                meta[bank.id].update({
+                    'name': bank.name,
+                    'description': bank.description,
+                    'subject': bank.subject,
+                    'question_count': len(bank.questions),
+                    'updated_at': bank.updated_at
+                })
         
         return True
     
     def delete_bank(self, bank_id: str) -> bool:
         """删除题库"""
-        file_path = self._get_bank_file(bank_id)
-        if file_path.exists():
-            file_path.unlink()
+        with self._writing(bank_id):
+            self.storage.delete(bank_id)
+            self._cache.pop(bank_id)
+            self._cache.pop(self._view_key(bank_id))
+            self._generations[bank_id] = self._generations.get(bank_id, 0) + 1
+            self.search_service.on_bank_deleted(bank_id)
+            self.locator.record([{'b': bank_id, 'op': 'drop'}])
         
-        meta = self._load_meta()
-        if bank_id in meta:
-            del meta[bank_id]
-            self._save_meta(meta)
+        with self._edit_meta() as meta:
+            meta.pop(bank_id, None)
         
         return True
     
     def add_question_to_bank(self, bank_id: str, question: Question) -> bool:
         """向题库添加题目"""
-        bank = self.get_bank(bank_id)
-        if not bank:
-            return False
+        with self._writing(bank_id):
+            bank = self.get_bank(bank_id)
+            if not bank:
+                return False
+            
+            if not bank.add_question(question):
+                return False
+            self._append_log(bank, [{'op': 'add', 'question': question.to_dict()}])
+            self.search_service.on_questions_changed(bank, changed=[question])
+            self.locator.record([{'b': bank_id, 'op': 'add', 'n': len(bank.questions), 'ids': [question.id]}])
         
-        if bank.add_question(question):
-            self._save_bank(bank)
-            # 更新元数据
-            meta = self._load_meta()
+        # 更新元数据
+        with self._edit_meta() as meta:
             if bank_id in meta:
                 meta[bank_id]['question_count'] = len(bank.questions)
                 meta[bank_id]['updated_at'] = bank.updated_at
-                self._save_meta(meta)
-            return True
-        return False
-
+        return True
+    
     def batch_add_questions(self, bank_id: str, questions: List[Question]) -> int:
         """批量向题库添加题目"""
-        bank = self.get_bank(bank_id)
-        if not bank:
-            return 0
-        
-        added_count = 0
-        for question in questions:
-            if bank.add_question(question):
-                added_count += 1
+        with self._writing(bank_id):
+            bank = self.get_bank(bank_id)
+            if not bank:
+                return 0
+            
+            added = [q for q in questions if bank.add_question(q)]
+            records = [{'op': 'add', 'question': q.to_dict()} for q in added]
+            
+            if records:
+                self._append_log(bank, records)
+                self.search_service.on_questions_changed(bank, changed=added)
+                self.locator.record([{'b': bank_id, 'op': 'add', 'n': len(bank.questions),
+                                      'ids': [q.id for q in added]}])
         
+        added_count = len(records)
         if added_count > 0:
-            self._save_bank(bank)
             # 更新元数据
-            meta = self._load_meta()
-            if bank_id in meta:
-                meta[bank_id]['question_count'] = len(bank.questions)
-                meta[bank_id]['updated_at'] = bank.updated_at
-                self._save_meta(meta)
+            with self._edit_meta() as meta:
+                if bank_id in meta:
+                    meta[bank_id]['question_count'] = len(bank.questions)
+                    meta[bank_id]['updated_at'] = bank.updated_at
         
         return added_count
     
     def update_question_in_bank(self, bank_id: str, question: Question) -> bool:
         """更新题库中的题目"""
-        bank = self.get_bank(bank_id)
-        if not bank:
-            return False
+        with self._writing(bank_id):
+            bank = self.get_bank(bank_id)
+            if not bank:
+                return False
+            
+            if not bank.update_question(question):
+                return False
+            self._append_log(bank, [{'op': 'update', 'question': question.to_dict()}])
+            self.search_service.on_questions_changed(bank, changed=[question])
         
-        if bank.update_question(question):
-            self._save_bank(bank)
-            return True
-        return False
+        # 更新元数据
+        with self._edit_meta() as meta:
+            if bank_id in meta:
+                meta[bank_id]['updated_at'] = bank.updated_at
+        return True
     
     def delete_question_from_bank(self, bank_id: str, question_id: str) -> bool:
         """从题库删除题目"""
-        bank = self.get_bank(bank_id)
-        if not bank:
-            return False
+        with self._writing(bank_id):
+            bank = self.get_bank(bank_id)
+            if not bank:
+                return False
+            
+            if not bank.remove_question(question_id):
+                return False
+            self._append_log(bank, [{'op': 'delete', 'question_id': question_id}])
+            self.search_service.on_questions_changed(bank, removed_ids=[question_id])
+            self.locator.record([{'b': bank_id, 'op': 'del', 'n': len(bank.questions), 'ids': [question_id]}])
         
-        if bank.remove_question(question_id):
-            self._save_bank(bank)
-            # 更新元数据
-            meta = self._load_meta()
+        # 更新元数据
+        with self._edit_meta() as meta:
             if bank_id in meta:
                 meta[bank_id]['question_count'] = len(bank.questions)
                 meta[bank_id]['updated_at'] = bank.updated_at
-                self._save_meta(meta)
-            
-            # 同时从收藏中删除
-            try:
-                from services.favorite_service import FavoriteService
-                favorite_service = FavoriteService()
-                favorite_service.remove_favorite(question_id)
-            except Exception as e:
-                print(f"从收藏中删除题目失败: {e}")
-
-            return True
-        return False
+        
+        # 同时从收藏中删除
+        try:
+            from services.favorite_service import FavoriteService
+            favorite_service = FavoriteService()
+            favorite_service.remove_favorite(question_id)
+        except Exception as e:
+            print(f"从收藏中删除题目失败: {e}")
+        
+        return True
     
     def search_questions(self, bank_id: str, keyword: str = "", 
                         question_type: str = "", tags: List[str] = None) -> List[Question]:
@@ -278,21 +529,19 @@ class BankService:
         if not bank:
             return []
         
-        results = bank.questions
+        # 关键词先经全文索引圈定候选题目，再与类型、标签条件一起走二级索引
+        candidate_ids = self.search_service.candidates(bank_id, keyword) if keyword else None
+        results = bank.query_questions(
+            types=[question_type] if question_type else None,
+            tags=tags if tags else None,
+            ids=candidate_ids
+        )
         
-        # 按关键词筛选
+        # 按关键词精确比对
         if keyword:
             keyword_lower = keyword.lower()
             results = [q for q in results if keyword_lower in q.question.lower()]
         
-        # 按类型筛选
-        if question_type:
-            results = [q for q in results if q.type == question_type]
-        
-        # 按标签筛选
-        if tags:
-            results = [q for q in results if any(t in q.tags for t in tags)]
-        
         return results
     
     def export_bank(self, bank_id: str, export_path: str) -> bool:
@@ -325,18 +574,14 @@ class BankService:
             self._save_bank(bank)
             
             # 更新元数据
-            meta = self._load_meta()
-            meta[bank.id] = {
-                'name': bank.name,
-                'description': bank.description,
-                'subject': bank.subject,
-                'question_count': len(bank.questions),
-                'created_at': bank.created_at,
-                'updated_at': bank.updated_at
-            }
-            self._save_meta(meta)
+            with self._edit_meta() as meta:
+                meta[bank.id] = self._meta_entry(bank)
             
             return bank
         except Exception as e:
             print(f"导入题库失败: {e}")
             return None
+
+
+# 多 worker 部署时，其他进程修改题库后丢弃本进程的缓存
+change_feed.subscribe('bank', BankService._on_remote_change)
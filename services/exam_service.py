@@ -3,134 +3,443 @@
 """
 import json
 import random
-import copy
+import atexit
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Optional, Dict, Union
+from typing import Any, List, Optional, Dict, Union
 from datetime import datetime
 
 from config import RESULTS_DIR, config as app_config
 from models import Paper, Question, ExamResult, QuestionResult
+from services.bank_service import BankService
 from services.paper_service import PaperService
+from services.storage import get_storage, change_feed
+from utils.pagination import paginate, in_date_range
+
+
+@dataclass(eq=False)
+class ExamSession:
+    """
+    进行中考试的会话：考试记录、试卷与按作答顺序排列的题目缓存
+    同一场考试的操作持有会话锁串行执行，不同考试互不阻塞
+    """
+    exam: ExamResult
+    paper: Optional[Paper] = None
+    questions: Optional[List[Question]] = None  # None 表示尚未加载，首次需要时从试卷取题
+    pending: Dict[str, Any] = field(default_factory=dict)  # 尚未写入存储的答案 {题目ID: 答案}
+    pending_since: Optional[float] = None  # 最早一条未写入答案的时间（time.monotonic）
+    lock: threading.RLock = field(default_factory=threading.RLock)
+    last_access: float = field(default_factory=time.monotonic)
+    closed: bool = False  # 已移出会话表，持有旧引用的调用方需重新获取
+    pinned_banks: List[str] = field(default_factory=list)  # 会话固定的题库缓存，移出会话表时释放
 
 
 class ExamService:
-    """答题与评分服务类"""
+    """
+    答题与评分服务类
+    进行中的考试以会话形式按考试ID登记在所有实例共享的会话表中，可同时进行多场考试；
+    会话在表中期间固定其引用的题库缓存；桌面端使用“当前考试”接口，当前考试的会话不会被淘汰
+    """
+    
+    # 会话表 {exam_id: ExamSession}，按最近访问排序
+    _sessions: "OrderedDict[str, ExamSession]" = OrderedDict()
+    _sessions_lock = threading.Lock()
+    _pinned_sessions: set = set()
+    
+    # 会话空闲超过该秒数、或会话数超过上限时移出会话表（未写入的答案先写入存储）
+    SESSION_IDLE_SECONDS = 30 * 60
+    MAX_SESSIONS = 1000
+    
+    # 自动保存：作答先记在会话中，由后台定时器在合并窗口结束时批量写入
+    _autosave_timer: Optional[threading.Timer] = None
+    _autosave_lock = threading.Lock()
+    _autosave_stats = {'flushes': 0, 'answers': 0, 'errors': 0, 'last_lag': 0.0, 'max_lag': 0.0}
     
     def __init__(self):
         self.paper_service = PaperService()
-        self._current_exam: Optional[ExamResult] = None
-        self._current_paper: Optional[Paper] = None
-        self._questions_cache: Dict[str, Question] = {}
-    
-    def _get_results_dir(self) -> Path:
-        """获取成绩存储目录（动态读取配置）"""
-        custom_dir = app_config.path_config.results_dir
-        if custom_dir:
-            path = Path(custom_dir)
-            path.mkdir(parents=True, exist_ok=True)
-            return path
-        return RESULTS_DIR
-    
-    def _get_result_file(self, result_id: str) -> Path:
-        """获取结果文件路径"""
-        return self._get_results_dir() / f"result_{result_id}.json"
+        self.storage = get_storage().results
+        self._current_id: Optional[str] = None
     
     def _save_result(self, result: ExamResult):
         """保存答题结果"""
-        file_path = self._get_result_file(result.id)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(result.to_dict(), f, ensure_ascii=False, indent=2)
+        self.storage.put(result.id, result.to_dict())
+    
+    # ============ 会话表 ============
+    
+    def _register_session(self, session: ExamSession) -> ExamSession:
+        """登记会话，已有同ID会话时返回已有的"""
+        with self._sessions_lock:
+            existing = self._sessions.get(session.exam.id)
+            if existing is None:
+                self._sessions[session.exam.id] = session
+            else:
+                session = existing
+        self._evict_sessions()
+        return session
+    
+    def _get_session(self, exam_id: str) -> Optional[ExamSession]:
+        """获取进行中考试的会话，不在会话表中时从存储加载；考试不存在或已结束时返回 None"""
+        with self._sessions_lock:
+            session = self._sessions.get(exam_id)
+            if session is not None:
+                self._sessions.move_to_end(exam_id)
+                session.last_access = time.monotonic()
+                return session
+        
+        data = self.storage.get(exam_id)
+        if data is None:
+            return None
+        try:
+            exam = self._load_exam(data)
+        except Exception:
+            return None
+        if exam.status != "in_progress":
+            return None
+        return self._register_session(ExamSession(exam, self.paper_service.get_paper(exam.paper_id)))
+    
+    @contextmanager
+    def _locked_session(self, exam_id: str):
+        """获取并锁定会话（不存在时得到 None）；加锁前会话已被移出会话表时重新获取"""
+        while True:
+            session = self._get_session(exam_id)
+            if session is None:
+                yield None
+                return
+            with session.lock:
+                if not session.closed:
+                    yield session
+                    return
+    
+    def _evict_sessions(self):
+        """移出空闲超时或超出数量上限的会话（最久未访问的优先）"""
+        now = time.monotonic()
+        victims = []
+        with self._sessions_lock:
+            excess = len(self._sessions) - self.MAX_SESSIONS
+            for exam_id, session in self._sessions.items():
+                if excess <= 0 and now - session.last_access < self.SESSION_IDLE_SECONDS:
+                    break
+                if exam_id not in self._pinned_sessions:
+                    victims.append(session)
+                    excess -= 1
+            for session in victims:
+                del self._sessions[session.exam.id]
+        
+        for session in victims:
+            with session.lock:
+                try:
+                    self._flush_session(session)
+                except Exception as e:
+                    # 写入失败时保留会话，答案不丢失
+                    print(f"写入答题记录失败: {e}")
+                    with self._sessions_lock:
+                        self._sessions.setdefault(session.exam.id, session)
+                    continue
+                session.closed = True
+                self._unpin_session_banks(session)
+    
+    def _drop_session(self, session: ExamSession):
+        """移出会话（调用方持有会话锁）"""
+        session.closed = True
+        with self._sessions_lock:
+            if self._sessions.get(session.exam.id) is session:
+                del self._sessions[session.exam.id]
+            self._pinned_sessions.discard(session.exam.id)
+        self._unpin_session_banks(session)
+    
+    @classmethod
+    def _on_remote_change(cls, exam_id: Optional[str]):
+        """其他进程修改了考试记录（变更通知），移出本进程的会话，下次访问时从存储重新加载"""
+        dropped = []
+        with cls._sessions_lock:
+            keys = list(cls._sessions) if exam_id is None else [exam_id]
+            for key in keys:
+                if key in cls._pinned_sessions:
+                    continue
+                session = cls._sessions.pop(key, None)
+                if session is not None:
+                    session.closed = True
+                    dropped.append(session)
+        for session in dropped:
+            cls._unpin_session_banks(session)
+    
+    def _pin_session_banks(self, session: ExamSession):
+        """固定会话题目引用的题库缓存（快照试卷不从题库取题，无需固定）"""
+        if session.pinned_banks or session.questions is None:
+            return
+        if session.paper is not None and session.paper.snapshot:
+            return
+        session.pinned_banks = list({q.bank_id for q in session.questions if getattr(q, 'bank_id', None)})
+        BankService.pin_banks(session.pinned_banks)
+        if session.closed:
+            # 固定期间会话已被移出会话表
+            self._unpin_session_banks(session)
+    
+    @staticmethod
+    def _unpin_session_banks(session: ExamSession):
+        """释放会话固定的题库缓存"""
+        banks, session.pinned_banks = session.pinned_banks, []
+        BankService.unpin_banks(banks)
+    
+    # ============ 自动保存 ============
+    
+    def _autosave_window(self) -> Optional[float]:
+        """
+        作答后多久写入存储（秒）：None 表示不自动保存（交卷、会话移出或程序退出时才写入），0 表示立即写入
+        多进程部署时总是立即写入，其他进程只能从存储看到答案
+        """
+        if change_feed.enabled:
+            return 0.0
+        if not app_config.app_config.auto_save:
+            return None
+        return max(0, app_config.app_config.autosave_window_ms) / 1000
+    
+    def _schedule_autosave(self, window: float):
+        """在合并窗口结束时写入所有会话中未写入的答案（已有定时器时不重复安排）"""
+        with self._autosave_lock:
+            if ExamService._autosave_timer is not None:
+                return
+            timer = threading.Timer(window, self.flush_pending)
+            timer.daemon = True
+            ExamService._autosave_timer = timer
+            timer.start()
+    
+    def flush_pending(self) -> int:
+        """
+        把所有会话中尚未写入的答案写入存储（自动保存定时器、程序退出时调用）
+        返回: 写入的考试数
+        """
+        with self._autosave_lock:
+            ExamService._autosave_timer = None
+        with self._sessions_lock:
+            sessions = [s for s in self._sessions.values() if s.pending]
+        
+        flushed = 0
+        failed = False
+        for session in sessions:
+            with session.lock:
+                if session.closed or not session.pending:
+                    continue
+                try:
+                    if not self._flush_session(session):
+                        self._drop_session(session)
+                    flushed += 1
+                except Exception as e:
+                    failed = True
+                    print(f"自动保存答题记录失败: {e}")
+        
+        # 写入失败的答案留在会话中，稍后重试
+        window = self._autosave_window()
+        if failed and window:
+            self._schedule_autosave(window)
+        return flushed
+    
+    def get_autosave_stats(self) -> Dict:
+        """
+        自动保存统计：未写入的考试数与答案数、当前最长未写入时长（持久化延迟，秒）、
+        累计写入次数与答案数、失败次数、最近一次与历史最长的写入延迟
+        """
+        now = time.monotonic()
+        with self._sessions_lock:
+            pending = [(len(s.pending), s.pending_since) for s in self._sessions.values() if s.pending]
+        with self._autosave_lock:
+            stats = dict(self._autosave_stats)
+        window = self._autosave_window()
+        stats.update({
+            'window_ms': None if window is None else int(window * 1000),
+            'pending_exams': len(pending),
+            'pending_answers': sum(count for count, _ in pending),
+            'lag': max((now - since for _, since in pending if since is not None), default=0.0),
+        })
+        return stats
+    
+    def _flush_session(self, session: ExamSession) -> bool:
+        """
+        把会话中尚未写入的答案写入存储（调用方持有会话锁）
+        追加到考试记录的答题日志，开销与试卷长度无关，也不会覆盖其他进程写入的答案；
+        没有答题日志的旧记录改为读-改-写整个考试记录（同时为其创建日志）
+        写入失败时答案留在会话中并抛出异常
+        返回: 考试是否仍在进行
+        """
+        if not session.pending:
+            return True
+        pending = session.pending
+        exam_id = session.exam.id
+        
+        try:
+            records = [{'q': question_id, 'a': answer} for question_id, answer in pending.items()]
+            if not self.storage.append_journal(exam_id, records):
+                def apply(exam: ExamResult) -> bool:
+                    for question_id, answer in pending.items():
+                        exam.record_answer(question_id, answer)
+                    return True
+                
+                updated = self._update_exam(exam_id, apply)
+                if updated is None:
+                    session.pending, session.pending_since = {}, None
+                    return False
+                session.exam = updated
+        except Exception:
+            with self._autosave_lock:
+                self._autosave_stats['errors'] += 1
+            raise
+        
+        session.pending = {}
+        lag = time.monotonic() - session.pending_since if session.pending_since is not None else 0.0
+        session.pending_since = None
+        with self._autosave_lock:
+            stats = self._autosave_stats
+            stats['flushes'] += 1
+            stats['answers'] += len(pending)
+            stats['last_lag'] = lag
+            stats['max_lag'] = max(stats['max_lag'], lag)
+        change_feed.publish('exam', exam_id)
+        return True
+    
+    def _session_questions(self, session: ExamSession) -> List[Question]:
+        """会话的题目缓存（按作答顺序），首次访问时按考试记录的顺序从试卷取题"""
+        if session.questions is None:
+            if session.paper is not None:
+                loaded = self.paper_service.load_paper_questions(session.paper)
+            else:
+                loaded = self.paper_service.get_paper_questions(session.exam.paper_id)
+            session.questions = self._arrange(session.exam, loaded)
+            self._pin_session_banks(session)
+        return session.questions
+    
+    # ============ 开始考试 ============
+    
+    def _current_session(self) -> Optional[ExamSession]:
+        """桌面端当前考试的会话"""
+        if self._current_id is None:
+            return None
+        with self._sessions_lock:
+            return self._sessions.get(self._current_id)
+    
+    def _set_current(self, session: Optional[ExamSession]):
+        """切换桌面端当前考试：固定其会话，释放之前考试的"""
+        with self._sessions_lock:
+            if self._current_id is not None:
+                self._pinned_sessions.discard(self._current_id)
+            self._current_id = session.exam.id if session else None
+            if session is not None:
+                self._pinned_sessions.add(session.exam.id)
     
     def start_exam(self, paper_id: str) -> Optional[ExamResult]:
         """
-        开始答题或恢复已有的考试
+        开始答题或恢复已有的考试（作为本服务的当前考试，供桌面端使用）
         返回考试结果对象用于记录答题
         """
+        # 检查是否已有进行中的考试（基于当前内存状态）
+        current = self._current_session()
+        if current and current.exam.paper_id == paper_id and current.exam.status == "in_progress":
+            return current.exam
+        
+        session = self._open_session(paper_id, resume=True)
+        if session is None:
+            return None
+        self._set_current(session)
+        return session.exam
+    
+    def open_exam(self, paper_id: str, resume: bool = True,
+                  exam_id: Optional[str] = None) -> Optional[ExamResult]:
+        """
+        开始答题，不作为本服务的当前考试，之后按考试ID提交答案、交卷
+        exam_id 为该试卷进行中的考试时恢复这场考试（Web 端考生按自己的考试ID恢复）；
+        否则 resume 为 True 时恢复该试卷最近开始的进行中考试，为 False 时总是新建（重新开始）
+        """
+        session = self._open_session(paper_id, resume, exam_id)
+        return session.exam if session else None
+    
+    def _open_session(self, paper_id: str, resume: bool,
+                      exam_id: Optional[str] = None) -> Optional[ExamSession]:
+        """恢复或新建考试并登记会话"""
         paper = self.paper_service.get_paper(paper_id)
         if not paper:
             return None
         
-        # 检查是否已有进行中的考试（基于当前内存状态）
-        if self._current_exam and self._current_exam.paper_id == paper_id and self._current_exam.status == "in_progress":
-            return self._current_exam
-        
-        # 检查是否有未完成的考试记录（从文件中恢复）
-        existing_exam = self._find_in_progress_exam(paper_id)
-        if existing_exam:
-            self._current_exam = existing_exam
-            self._current_paper = paper
-            # 恢复题目缓存
-            questions = self.paper_service.get_paper_questions(paper_id)
-            if questions:
-                self._questions_cache = {q.id: q for q in questions}
-            return self._current_exam
-        
+        if exam_id:
+            session = self._get_session(exam_id)
+            if session is not None and session.exam.paper_id == paper_id:
+                return session
+        
+        if resume:
+            # 检查是否有未完成的考试记录（从文件中恢复）
+            existing_exam = self._find_in_progress_exam(paper_id)
+            if existing_exam:
+                session = self._get_session(existing_exam.id)
+                if session is not None:
+                    return session
+        
+        created = self._create_exam(paper)
+        if not created:
+            return None
+        exam, questions = created
+        session = self._register_session(ExamSession(exam, paper, questions))
+        self._pin_session_banks(session)
+        return session
+    
+    def _create_exam(self, paper: Paper) -> Optional[tuple]:
+        """
+        新建考试记录并保存
+        返回: (考试结果, 按作答顺序排列的题目)，试卷没有可用题目时返回 None
+        """
         # 获取题目
-        questions = self.paper_service.get_paper_questions(paper_id)
+        questions = self.paper_service.load_paper_questions(paper)
         if not questions:
             return None
         
-        # 如果需要打乱题目
-        if paper.shuffle_questions:
-            # 深拷贝题目列表以避免修改原始数据
-            questions = copy.deepcopy(questions)
-            # 打乱题目顺序
-            random.shuffle(questions)
-            # 打乱每个题目的选项(仅限单选和多选题)
-            for q in questions:
-                if q.type in ['single', 'multiple'] and q.options:
-                    q.options, q.answer = self._shuffle_options(q.options, q.answer, q.type)
-        
-        # 缓存题目
-        self._questions_cache = {q.id: q for q in questions}
-        self._current_paper = paper
-        
         # 创建考试结果
-        self._current_exam = ExamResult(
-            paper_id=paper_id,
+        exam = ExamResult(
+            paper_id=paper.id,
             paper_title=paper.title,
             total_score=paper.total_score,
             status="in_progress",
             source_banks=paper.source_banks if paper.source_banks else []
         )
         
+        # 如果需要打乱题目：只生成题目顺序与选项排列，记录在考试中，取题时再按排列调整
+        if paper.shuffle_questions:
+            exam.shuffle_seed = random.randrange(2 ** 32)
+            questions, exam.option_orders = self._shuffle_orders(questions, exam.shuffle_seed)
+        
         # 初始化每道题的结果记录 - 按打乱后的顺序
         for q in questions:
+            answer = q.answer
+            if q.id in exam.option_orders:
+                answer = self._permute_answer(answer, exam.option_orders[q.id], q.type)
             qr = QuestionResult(
                 question_id=q.id,
                 question_type=q.type,
-                correct_answer=q.answer,
+                correct_answer=answer,
                 max_score=self._get_question_score(paper, q.id)
             )
-            self._current_exam.details.append(qr)
+            exam.details.append(qr)
         
         # 自动保存
-        self._save_result(self._current_exam)
+        self._save_result(exam)
+        self.storage.open_journal(exam.id)
         
-        return self._current_exam
+        return exam, self._arrange(exam, questions)
     
     def _find_in_progress_exam(self, paper_id: str) -> Optional[ExamResult]:
-        """查找指定试卷的进行中考试"""
-        results_dir = self._get_results_dir()
-        for file_path in results_dir.glob("result_*.json"):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                if data.get('paper_id') == paper_id and data.get('status') == 'in_progress':
-                    return ExamResult.from_dict(data)
-            except:
-                continue
-        return None
+        """查找指定试卷最近开始的进行中考试"""
+        return self._latest_in_progress(paper_id=paper_id)
     
     def find_any_in_progress_exam(self) -> Optional[ExamResult]:
-        """查找任意一个进行中的考试"""
-        results_dir = self._get_results_dir()
-        for file_path in results_dir.glob("result_*.json"):
+        """查找最近开始的进行中考试"""
+        return self._latest_in_progress()
+    
+    def _latest_in_progress(self, **criteria) -> Optional[ExamResult]:
+        """按开始时间从新到旧查找第一个可读取的进行中考试"""
+        found = self.storage.find(status='in_progress', **criteria)
+        for data in sorted(found, key=lambda d: d.get('start_time') or '', reverse=True):
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                if data.get('status') == 'in_progress':
-                    return ExamResult.from_dict(data)
+                return self._load_exam(data)
             except:
                 continue
         return None
@@ -142,13 +451,40 @@ class ExamService:
                 return pq.score
         return 5.0
     
-    def _shuffle_options(self, options: List[str], answer, question_type: str) -> tuple:
+    @staticmethod
+    def _shuffle_orders(questions: List[Question], seed: int) -> tuple:
         """
-        打乱选项并更新答案
-        返回: (打乱后的选项, 更新后的答案)
+        由随机种子生成打乱后的题目顺序和单选、多选题的选项排列（同一种子总是得到相同结果）
+        返回: (打乱顺序后的题目列表, {题目ID: 选项排列})
         """
-        if not options:
-            return options, answer
+        rng = random.Random(seed)
+        questions = list(questions)
+        rng.shuffle(questions)
+        orders = {}
+        for q in questions:
+            if q.type in ['single', 'multiple'] and q.options:
+                order = list(range(len(q.options)))
+                rng.shuffle(order)
+                orders[q.id] = order
+        return questions, orders
+    
+    @staticmethod
+    def _permute_answer(answer, order: List[int], question_type: str):
+        """把原选项字母的答案换成按排列显示后的字母"""
+        letters = [chr(ord('A') + i) for i in range(len(order))]
+        old_to_new = {letters[old_idx]: letters[new_idx] for new_idx, old_idx in enumerate(order)}
+        if question_type == 'multiple' and isinstance(answer, list):
+            # 多选题
+            return sorted([old_to_new.get(a, a) for a in answer])
+        # 单选题
+        return old_to_new.get(answer, answer)
+    
+    @classmethod
+    def _apply_option_order(cls, question: Question, order: List[int]):
+        """按排列调整题目的选项与答案（原地修改，只用于从试卷新取出的题目对象）"""
+        options = question.options
+        if not options or len(order) != len(options):
+            return
         
         # 解析选项，提取字母和内容
         option_contents = []
@@ -160,173 +496,284 @@ class ExamService:
                 content = opt
             option_contents.append(content)
         
-        # 建立原始索引映射
-        original_letters = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H'][:len(options)]
-        indices = list(range(len(options)))
-        
-        # 打乱索引
-        random.shuffle(indices)
-        
-        # 生成新的选项列表
-        new_options = []
-        for i, idx in enumerate(indices):
-            new_letter = original_letters[i]
-            new_options.append(f"{new_letter}. {option_contents[idx]}")
-        
-        # 更新答案
-        old_to_new = {original_letters[old_idx]: original_letters[new_idx] 
-                      for new_idx, old_idx in enumerate(indices)}
-        
-        if question_type == 'multiple' and isinstance(answer, list):
-            # 多选题
-            new_answer = sorted([old_to_new.get(a, a) for a in answer])
-        else:
-            # 单选题
-            new_answer = old_to_new.get(answer, answer)
-        
-        return new_options, new_answer
+        question.options = [f"{chr(ord('A') + i)}. {option_contents[idx]}" for i, idx in enumerate(order)]
+        question.answer = cls._permute_answer(question.answer, order, question.type)
+    
+    def _arrange(self, exam: ExamResult, questions: List[Question]) -> List[Question]:
+        """把从试卷取出的题目按考试的作答顺序排列，并按记录的选项排列调整选项"""
+        by_id = {q.id: q for q in questions}
+        for qid, order in exam.option_orders.items():
+            if qid in by_id:
+                self._apply_option_order(by_id[qid], order)
+        return [by_id[qr.question_id] for qr in exam.details if qr.question_id in by_id]
     
     def get_current_exam(self) -> Optional[ExamResult]:
         """获取当前考试"""
-        return self._current_exam
+        session = self._current_session()
+        return session.exam if session else None
     
     def get_current_paper(self) -> Optional[Paper]:
         """获取当前试卷"""
-        return self._current_paper
+        session = self._current_session()
+        return session.paper if session else None
     
     def get_question(self, question_id: str) -> Optional[Question]:
         """获取题目"""
-        return self._questions_cache.get(question_id)
+        session = self._current_session()
+        if not session:
+            return None
+        for q in self._session_questions(session):
+            if q.id == question_id:
+                return q
+        return None
     
     def get_all_questions(self) -> List[Question]:
-        """获取所有题目（按顺序）"""
-        if not self._current_paper:
+        """获取所有题目（按作答顺序，打乱顺序的考试已按记录的排列调整选项）"""
+        session = self._current_session()
+        if not session or not session.paper:
             return []
-        
-        questions = []
-        for pq in self._current_paper.questions:
-            if pq.question_id in self._questions_cache:
-                questions.append(self._questions_cache[pq.question_id])
-        return questions
+        return list(self._session_questions(session))
     
-    def submit_answer(self, question_id: str, answer: Union[str, List[str], bool]):
+    def get_exam_questions(self, exam_id: str) -> Optional[List[Question]]:
         """
-        提交单题答案
+        按考试ID获取题目（按作答顺序，选项与考生看到的一致）
+        已结束的考试按考试记录的排列从试卷取题；考试不存在时返回 None
         """
-        if not self._current_exam:
-            return
-        
-        for qr in self._current_exam.details:
-            if qr.question_id == question_id:
-                qr.user_answer = answer
-                break
-        
-        # 自动保存
-        if app_config.app_config.auto_save:
-            self._save_result(self._current_exam)
+        with self._locked_session(exam_id) as session:
+            if session is not None:
+                return list(self._session_questions(session))
+        result, questions = self.get_result_with_questions(exam_id)
+        if not result:
+            return None
+        return [questions[qr.question_id] for qr in result.details if qr.question_id in questions]
     
-    def finish_exam(self, timeout: bool = False) -> ExamResult:
+    def submit_answer(self, question_id: str, answer: Union[str, List[str], bool],
+                      exam_id: Optional[str] = None) -> bool:
         """
-        完成答题并评分
+        提交单题答案（未指定 exam_id 时提交到当前考试）
+        同一场考试的提交按会话串行，不同考试可并发提交
+        返回: 是否记录成功（考试不存在、已结束或没有该题时为 False）
         """
-        if not self._current_exam:
-            return None
-        
-        # 评分
-        for qr in self._current_exam.details:
+        if exam_id is None:
+            exam_id = self._current_id
+            if exam_id is None:
+                return False
+        
+        with self._locked_session(exam_id) as session:
+            if session is None or not session.exam.record_answer(question_id, answer):
+                return False
+            session.pending[question_id] = answer
+            if session.pending_since is None:
+                session.pending_since = time.monotonic()
+            
+            # 自动保存：合并窗口内的多次作答一起写入，不在请求线程上写盘
+            window = self._autosave_window()
+            if window == 0:
+                if not self._flush_session(session):
+                    # 考试已在其他进程结束或被删除
+                    self._drop_session(session)
+                    return False
+            elif window is not None:
+                self._schedule_autosave(window)
+            return True
+    
+    def _load_exam(self, data: Dict) -> ExamResult:
+        """由存储的文档构造考试记录，进行中的考试合入答题日志中尚未合并的答案"""
+        exam = ExamResult.from_dict(data)
+        if exam.status == "in_progress":
+            for record in self.storage.read_journal(exam.id):
+                exam.record_answer(record['q'], record['a'])
+        return exam
+    
+    def _update_exam(self, exam_id: str, func, close: bool = False) -> Optional[ExamResult]:
+        """
+        读-改-写进行中的考试记录（合入答题日志）：func(exam) 返回 True 时写回，答题日志随之清空；
+        close 为 True 时删除答题日志（考试结束）
+        考试不存在或已结束时返回 None
+        """
+        updated = []
+        
+        def apply(data: Dict, records: List[Dict]) -> Optional[Dict]:
+            exam = ExamResult.from_dict(data)
+            if exam.status != "in_progress":
+                return None
+            for record in records:
+                exam.record_answer(record['q'], record['a'])
+            updated.append(exam)
+            return exam.to_dict() if func(exam) else None
+        
+        self.storage.compact(exam_id, apply, close=close)
+        return updated[0] if updated else None
+    
+    def _grade(self, exam: ExamResult):
+        """按开考时记录的题型与标准答案评分（打乱选项后的答案也记录在其中）"""
+        for qr in exam.details:
             if qr.user_answer is None:
                 qr.is_correct = False
                 qr.score = 0
                 continue
             
-            q = self._questions_cache.get(qr.question_id)
-            if q:
-                is_correct, score_ratio = q.check_answer(qr.user_answer)
-                qr.is_correct = is_correct
-                
-                # 多选题部分得分处理
-                if q.type == 'multiple' and not app_config.app_config.multiple_partial_score:
-                    qr.score = qr.max_score if is_correct else 0
-                else:
-                    qr.score = qr.max_score * score_ratio
-        
-        # 完成考试
-        if timeout:
-            self._current_exam.timeout()
-        else:
-            self._current_exam.complete()
-        
-        # 保存结果
-        self._save_result(self._current_exam)
-        
-        result = self._current_exam
-        
-        # 清理状态
-        self._current_exam = None
-        self._current_paper = None
-        self._questions_cache = {}
+            q = Question(id=qr.question_id, type=qr.question_type, answer=qr.correct_answer)
+            is_correct, score_ratio = q.check_answer(qr.user_answer)
+            qr.is_correct = is_correct
+            
+            # 多选题部分得分处理
+            if q.type == 'multiple' and not app_config.app_config.multiple_partial_score:
+                qr.score = qr.max_score if is_correct else 0
+            else:
+                qr.score = qr.max_score * score_ratio
+    
+    def finish_exam(self, timeout: bool = False, exam_id: Optional[str] = None) -> Optional[ExamResult]:
+        """
+        完成答题并评分（未指定 exam_id 时结束当前考试）
+        在存储中评分并保存，会话中尚未写入的答案一并合入；
+        该考试已结束时返回已保存的结果（重复交卷不会重新评分）
+        """
+        if exam_id is None:
+            exam_id = self._current_id
+            if exam_id is None:
+                return None
         
+        with self._locked_session(exam_id) as session:
+            pending = session.pending if session else {}
+            
+            def finish(exam: ExamResult) -> bool:
+                for question_id, answer in pending.items():
+                    exam.record_answer(question_id, answer)
+                self._grade(exam)
+                if timeout:
+                    exam.timeout()
+                else:
+                    exam.complete()
+                return True
+            
+            result = self._update_exam(exam_id, finish, close=True)
+            if session is not None:
+                session.pending, session.pending_since = {}, None
+                if result is not None:
+                    session.exam = result
+                self._drop_session(session)
+        
+        if exam_id == self._current_id:
+            # 清理状态
+            self._current_id = None
+        
+        if result is None:
+            data = self.storage.get(exam_id)
+            return ExamResult.from_dict(data) if data else None
+        change_feed.publish('exam', exam_id)
         return result
     
+    def _fill_source_banks(self, results: List[Union[ExamResult, Dict]]):
+        """兼容旧数据：source_banks 为空时取自试卷（只补在内存中，读取时不回写文件）"""
+        paper_banks: Dict[str, List[str]] = {}
+        for result in results:
+            is_dict = isinstance(result, dict)
+            source_banks = result.get('source_banks') if is_dict else result.source_banks
+            paper_id = result.get('paper_id') if is_dict else result.paper_id
+            if source_banks or not paper_id:
+                continue
+            if paper_id not in paper_banks:
+                paper = self.paper_service.get_paper(paper_id)
+                paper_banks[paper_id] = list(paper.source_banks) if paper and paper.source_banks else []
+            if paper_banks[paper_id]:
+                if is_dict:
+                    result['source_banks'] = list(paper_banks[paper_id])
+                else:
+                    result.source_banks = list(paper_banks[paper_id])
+    
     def get_result(self, result_id: str) -> Optional[ExamResult]:
         """获取答题结果"""
-        file_path = self._get_result_file(result_id)
-        if not file_path.exists():
-            return None
-        
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            result = ExamResult.from_dict(data)
-            
-            # 兼容旧数据
-            if not result.source_banks and result.paper_id:
-                paper = self.paper_service.get_paper(result.paper_id)
-                if paper and paper.source_banks:
-                    result.source_banks = paper.source_banks
-                    try:
-                        self._save_result(result)
-                    except:
-                        pass
-            
+            data = self.storage.get(result_id)
+            if data is None:
+                return None
+            result = self._load_exam(data)
+            self._fill_source_banks([result])
             return result
         except Exception as e:
             print(f"加载答题结果失败: {e}")
             return None
     
     def get_all_results(self) -> List[ExamResult]:
-        """获取所有答题结果"""
+        """获取所有答题结果（含逐题详情，列表展示请用 get_result_summaries）"""
         results = []
-        results_dir = self._get_results_dir()
-        for file_path in results_dir.glob("result_*.json"):
+        for data in self.storage.iter_all():
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                result = ExamResult.from_dict(data)
-                
-                # 兼容旧数据：如果source_banks为空，尝试从试卷获取
-                if not result.source_banks and result.paper_id:
-                    paper = self.paper_service.get_paper(result.paper_id)
-                    if paper and paper.source_banks:
-                        result.source_banks = paper.source_banks
-                        # 回写修复数据，避免下次再次读取
-                        try:
-                            self._save_result(result)
-                        except:
-                            pass
-                
-                results.append(result)
+                results.append(self._load_exam(data))
             except:
                 continue
+        self._fill_source_banks(results)
         return sorted(results, key=lambda r: r.start_time, reverse=True)
     
+    def get_result_summaries(self) -> List[Dict]:
+        """
+        获取所有答题结果的摘要（按开始时间倒序），只读摘要索引，不解析逐题详情
+        字段见 storage.base.summarize_result
+        """
+        summaries = [dict(s) for s in self.storage.summaries()]
+        self._fill_source_banks(summaries)
+        return sorted(summaries, key=lambda s: s.get('start_time') or '', reverse=True)
+    
+    # 成绩列表可用的排序字段（数值字段按数值排序，score_rate 为得分率）
+    SORT_FIELDS = {'start_time': str, 'end_time': str, 'paper_title': str, 'user_score': float,
+                   'score_rate': float}
+    
+    @staticmethod
+    def _score_rate(summary: Dict) -> float:
+        """得分率（百分比）"""
+        total = summary.get('total_score') or 0
+        return (summary.get('user_score') or 0) / total * 100 if total > 0 else 0.0
+    
+    def query_results(self, bank_id: Optional[str] = None, status: Optional[str] = None,
+                      paper_id: Optional[str] = None,
+                      date_from: Optional[str] = None, date_to: Optional[str] = None,
+                      min_score_rate: Optional[float] = None, max_score_rate: Optional[float] = None,
+                      sort: str = 'start_time', order: str = 'desc',
+                      page_size: Optional[int] = 20, cursor: Optional[str] = None) -> Dict:
+        """
+        分页查询答题结果摘要
+        按来源题库、状态、试卷、开始日期、得分率区间（百分比，两端包含）筛选；
+        cursor 为上一页返回的 next_cursor，page_size 为 None 时返回全部
+        返回: {'items', 'total', 'page_size', 'next_cursor'}，参数无效时抛出 ValueError
+        """
+        if sort not in self.SORT_FIELDS or order not in ('asc', 'desc'):
+            raise ValueError("不支持的排序方式")
+        
+        items = []
+        for s in self.get_result_summaries():
+            if bank_id and bank_id not in (s.get('source_banks') or []):
+                continue
+            if status and s.get('status') != status:
+                continue
+            if paper_id and s.get('paper_id') != paper_id:
+                continue
+            if not in_date_range(s.get('start_time'), date_from, date_to):
+                continue
+            if min_score_rate is not None or max_score_rate is not None:
+                rate = self._score_rate(s)
+                if min_score_rate is not None and rate < min_score_rate:
+                    continue
+                if max_score_rate is not None and rate > max_score_rate:
+                    continue
+            items.append(s)
+        
+        if sort == 'score_rate':
+            sort_value = self._score_rate
+        else:
+            convert = self.SORT_FIELDS[sort]
+            sort_value = lambda s: convert(s.get(sort) or convert())
+        return paginate(
+            items, sort_value, order == 'desc', page_size, cursor,
+            params={'bank_id': bank_id, 'status': status, 'paper_id': paper_id,
+                    'date_from': date_from, 'date_to': date_to,
+                    'min_score_rate': min_score_rate, 'max_score_rate': max_score_rate,
+                    'sort': sort, 'order': order}
+        )
+    
     def delete_result(self, result_id: str) -> bool:
         """删除答题结果"""
-        file_path = self._get_result_file(result_id)
-        if file_path.exists():
-            file_path.unlink()
-            return True
-        return False
+        return self.storage.delete(result_id)
     
     def get_result_with_questions(self, result_id: str) -> tuple[Optional[ExamResult], Dict[str, Question]]:
         """
@@ -342,7 +789,8 @@ class ExamService:
         if not paper:
             return result, {}
         
-        questions = self.paper_service.get_paper_questions(result.paper_id)
+        # 按考试记录的选项排列显示，与考生作答时看到的选项字母一致
+        questions = self._arrange(result, self.paper_service.load_paper_questions(paper))
         questions_dict = {q.id: q for q in questions}
         
         return result, questions_dict
@@ -390,3 +838,9 @@ class ExamService:
         summary['recent_results'] = results[:5]
         
         return summary
+
+
+change_feed.subscribe('exam', ExamService._on_remote_change)
+
+# 进程退出前写入会话中尚未写入的答案
+atexit.register(lambda: ExamService().flush_pending())
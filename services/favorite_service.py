@@ -7,6 +7,7 @@ from typing import List, Optional, Tuple
 
 from config import DATA_DIR, config as app_config
 from models import FavoriteQuestion, FavoriteCollection, Question
+from services.storage import get_storage
 
 
 class FavoriteService:
@@ -16,31 +17,16 @@ class FavoriteService:
     
     def __init__(self):
         self._collection: Optional[FavoriteCollection] = None
+        self.storage = get_storage().favorites
         self._load_favorites()
     
-    def _get_favorites_file(self) -> str:
-        """获取收藏文件路径（动态读取配置）"""
-        custom_file = app_config.path_config.favorites_file
-        if custom_file:
-            # 确保目录存在
-            dir_path = os.path.dirname(custom_file)
-            if dir_path:
-                os.makedirs(dir_path, exist_ok=True)
-            return custom_file
-        return self.DEFAULT_FAVORITES_FILE
-    
     def _load_favorites(self):
         """加载收藏数据"""
-        favorites_file = self._get_favorites_file()
-        if os.path.exists(favorites_file):
-            try:
-                with open(favorites_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self._collection = FavoriteCollection.from_dict(data)
-            except Exception as e:
-                print(f"加载收藏数据失败: {e}")
-                self._collection = FavoriteCollection()
-        else:
+        try:
+            data = self.storage.load()
+            self._collection = FavoriteCollection.from_dict(data) if data is not None else FavoriteCollection()
+        except Exception as e:
+            print(f"加载收藏数据失败: {e}")
             self._collection = FavoriteCollection()
             
     def reload(self):
@@ -50,9 +36,7 @@ class FavoriteService:
     def _save_favorites(self):
         """保存收藏数据"""
         try:
-            favorites_file = self._get_favorites_file()
-            with open(favorites_file, 'w', encoding='utf-8') as f:
-                json.dump(self._collection.to_dict(), f, ensure_ascii=False, indent=2)
+            self.storage.save(self._collection.to_dict())
         except Exception as e:
             print(f"保存收藏数据失败: {e}")
     
@@ -0,0 +1,430 @@
+"""
+组卷求解器
+候选题按 (题型, 难度, 章节) 分层，按目标分布为各层分配题量后在层内随机抽样（分层加权抽样），
+再用贪心替换修补标签配额和平均难度；题目不足时给出尽量接近目标的选题和缺口报告
+"""
+import copy
+import math
+import random
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from models import Question, QuestionBank
+
+
+# 组卷支持的题型（按试卷中的顺序）及中文名
+TYPE_NAMES = {
+    'single': '单选题',
+    'multiple': '多选题',
+    'judge': '判断题',
+    'fill': '填空题'
+}
+
+Cell = Tuple[int, str]  # (难度, 章节)
+
+
+class CandidatePool:
+    """
+    组卷候选池：各题型的候选题按 (难度, 章节) 分层
+    由题库的分层题目表按章节、难度范围、标签筛选得到，同一题目ID出现在多个题库时只保留第一个
+    """
+    
+    def __init__(self, banks: List[QuestionBank], chapters: Optional[List[str]] = None,
+                 min_difficulty: Optional[int] = None, max_difficulty: Optional[int] = None,
+                 tags: Optional[List[str]] = None):
+        self.cells: Dict[str, Dict[Cell, List[Question]]] = {t: {} for t in TYPE_NAMES}
+        self._banks = banks
+        self._chapters = set(chapters) if chapters else None
+        self._min_difficulty = min_difficulty
+        self._max_difficulty = max_difficulty
+        self._tags = set(tags) if tags else None
+        self._tagged: Dict[str, List[Question]] = {}
+        self._excluded: frozenset = frozenset()
+        seen: Set[str] = set()
+        
+        for bank in banks:
+            for (q_type, difficulty, chapter), questions in bank.get_strata()[0].items():
+                cells = self.cells.get(q_type)
+                if cells is None or not self._accepts_cell(difficulty, chapter):
+                    continue
+                if self._tags is not None:
+                    questions = [q for q in questions if not self._tags.isdisjoint(q.tags)]
+                if len(banks) > 1:
+                    questions = [q for q in questions if q.id not in seen]
+                    seen.update(q.id for q in questions)
+                if questions:
+                    cells.setdefault((difficulty, chapter), []).extend(questions)
+    
+    def _accepts_cell(self, difficulty: int, chapter: str) -> bool:
+        """该难度、章节的题目是否符合筛选条件"""
+        if self._chapters is not None and chapter not in self._chapters:
+            return False
+        if self._min_difficulty is not None and difficulty < self._min_difficulty:
+            return False
+        if self._max_difficulty is not None and difficulty > self._max_difficulty:
+            return False
+        return True
+    
+    def tagged(self, tag: str) -> List[Question]:
+        """带某标签的候选题（首次访问时从题库的标签表筛选）"""
+        result = self._tagged.get(tag)
+        if result is None:
+            result, seen = [], set()
+            for bank in self._banks:
+                for q in bank.get_strata()[1].get(tag, ()):
+                    if (q.type in self.cells and q.id not in seen and q.id not in self._excluded
+                            and self._accepts_cell(q.difficulty, q.chapter or "")
+                            and (self._tags is None or not self._tags.isdisjoint(q.tags))):
+                        seen.add(q.id)
+                        result.append(q)
+            self._tagged[tag] = result
+        return result
+    
+    def bank_of(self, question: Question) -> Optional[str]:
+        """候选题所在的题库ID（与去重规则一致，取第一个包含该题的题库）"""
+        for bank in self._banks:
+            if bank.get_question(question.id) is not None:
+                return bank.id
+        return None
+    
+    def excluding(self, questions: Iterable[Question]) -> 'CandidatePool':
+        """
+        去掉给定题目后的候选池（多份试卷之间限制重复时使用）
+        只复制这些题目所在的层，其余层与本候选池共用，本候选池不受影响
+        """
+        by_cell: Dict[tuple, Set[str]] = {}
+        for q in questions:
+            by_cell.setdefault((q.type, q.difficulty, q.chapter or ""), set()).add(q.id)
+        if not by_cell:
+            return self
+        
+        pool = copy.copy(self)
+        pool.cells = {t: dict(cells) for t, cells in self.cells.items()}
+        pool._tagged = {}
+        pool._excluded = self._excluded.union(*by_cell.values())
+        for (q_type, difficulty, chapter), ids in by_cell.items():
+            cells = pool.cells.get(q_type)
+            if cells is None or (difficulty, chapter) not in cells:
+                continue
+            kept = [q for q in cells[(difficulty, chapter)] if q.id not in ids]
+            if kept:
+                cells[(difficulty, chapter)] = kept
+            else:
+                del cells[(difficulty, chapter)]
+        return pool
+    
+    def available(self, q_type: str) -> int:
+        """某题型的候选题数量"""
+        return sum(len(qs) for qs in self.cells.get(q_type, {}).values())
+    
+    def total(self) -> int:
+        """候选题总数"""
+        return sum(self.available(t) for t in self.cells)
+
+
+def _tilt(weights: Dict[Cell, float], target: float) -> Dict[Cell, float]:
+    """
+    指数倾斜：权重乘以 exp(λ·难度)，二分求 λ 使加权平均难度等于目标
+    目标超出可达范围时取最接近的一端
+    """
+    # 同一难度的层倾斜系数相同，二分只需在各难度的总权重上进行
+    levels: Dict[int, float] = {}
+    for (d, _), w in weights.items():
+        if w > 0:
+            levels[d] = levels.get(d, 0.0) + w
+    if not levels:
+        return weights
+    center = sum(d * w for d, w in levels.items()) / sum(levels.values())
+    
+    def mean(lam: float) -> float:
+        tilted = {d: w * math.exp(lam * (d - center)) for d, w in levels.items()}
+        return sum(d * w for d, w in tilted.items()) / sum(tilted.values())
+    
+    low, high = -20.0, 20.0
+    for _ in range(40):
+        mid = (low + high) / 2
+        if mean(mid) < target:
+            low = mid
+        else:
+            high = mid
+    lam = (low + high) / 2
+    return {k: w * math.exp(lam * (k[0] - center)) for k, w in weights.items()}
+
+
+def _apportion(count: int, weights: Dict[Cell, float], caps: Dict[Cell, int]) -> Dict[Cell, int]:
+    """
+    按权重把 count 道题分配到各层（最大余数法），每层不超过其候选数
+    有权重的层装不下时，剩余题量按候选数分配到其他层
+    """
+    alloc = dict.fromkeys(caps, 0)
+    remaining = count
+    for stage in (weights, caps):
+        active = [k for k in caps if stage.get(k, 0) > 0 and alloc[k] < caps[k]]
+        while remaining > 0 and active:
+            total = sum(stage[k] for k in active)
+            quotas = {k: remaining * stage[k] / total for k in active}
+            given = 0
+            for k in active:
+                n = min(int(quotas[k]), caps[k] - alloc[k])
+                alloc[k] += n
+                given += n
+            remaining -= given
+            for k in sorted(active, key=lambda k: quotas[k] - int(quotas[k]), reverse=True):
+                if remaining == 0:
+                    break
+                if alloc[k] < caps[k]:
+                    alloc[k] += 1
+                    remaining -= 1
+                    given += 1
+            active = [k for k in active if alloc[k] < caps[k]]
+            if not given:
+                break
+    return alloc
+
+
+class PaperSolver:
+    """
+    在候选池上按组卷目标选题
+    目标（均可省略）：
+    - counts: 各题型题量（硬约束）
+    - difficulty_distribution / chapter_distribution: 难度、章节的目标占比（按比例归一）
+    - target_difficulty: 目标平均难度
+    - tag_quotas: {标签: 至少题数}（硬约束，按整卷计）
+    难度/章节占比和平均难度是优化目标，尽量接近，实际值写入报告
+    """
+    
+    def __init__(self, pool: CandidatePool, rng: Optional[random.Random] = None):
+        self.pool = pool
+        self.rng = rng or random.Random()
+    
+    # ============ 分配与抽样 ============
+    
+    @staticmethod
+    def _reweight(weights: Dict[Cell, float], caps: Dict[Cell, int],
+                  distribution: Optional[Dict], axis: int):
+        """按目标占比调整权重：某取值的总权重占比 = 目标占比（目标中没有的取值权重为 0）"""
+        if not distribution:
+            return
+        shares = {k: float(v) for k, v in distribution.items() if v and float(v) > 0}
+        available = {}
+        for cell, cap in caps.items():
+            available[cell[axis]] = available.get(cell[axis], 0) + cap
+        total_share = sum(shares.get(v, 0) for v in available)
+        if total_share <= 0:
+            return
+        for cell in weights:
+            share = shares.get(cell[axis], 0) / total_share
+            weights[cell] *= share * sum(available.values()) / available[cell[axis]]
+    
+    def _allocate(self, q_type: str, count: int, config) -> Dict[Cell, int]:
+        """为一种题型的各层分配题量"""
+        caps = {cell: len(qs) for cell, qs in self.pool.cells[q_type].items()}
+        # 不指定分布时权重与候选数成正比，等同于在整个题型内均匀抽样
+        weights = {cell: float(cap) for cell, cap in caps.items()}
+        self._reweight(weights, caps, _int_keys(config.difficulty_distribution), 0)
+        self._reweight(weights, caps, _chapter_keys(config.chapter_distribution), 1)
+        if config.target_difficulty is not None:
+            weights = _tilt(weights, config.target_difficulty)
+        return _apportion(count, weights, caps)
+    
+    def _sample(self, q_type: str, alloc: Dict[Cell, int]) -> List[Question]:
+        """在各层内随机抽取分配的题量"""
+        selected = []
+        for cell, n in alloc.items():
+            if n > 0:
+                selected.extend(self.rng.sample(self.pool.cells[q_type][cell], n))
+        return selected
+    
+    # ============ 贪心修补 ============
+    
+    @staticmethod
+    def _cell_of(q: Question) -> Tuple[str, int, str]:
+        return (q.type, q.difficulty, q.chapter or "")
+    
+    @staticmethod
+    def _replaceable(old: Question, new: Question, tag_counts: Dict[str, int], quotas: Dict[str, int]) -> bool:
+        """用 new 替换 old 后不会让任何标签低于配额"""
+        return all(t in new.tags or tag_counts.get(t, 0) > quotas[t] for t in old.tags if t in quotas)
+    
+    @staticmethod
+    def _tag_counts(selected: List[Question]) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for q in selected:
+            for t in q.tags:
+                counts[t] = counts.get(t, 0) + 1
+        return counts
+    
+    def _swap(self, selected: List[Question], chosen: Set[str], tag_counts: Dict[str, int],
+              old: Question, new: Question, index: Optional[int] = None):
+        """用 new 替换已选的 old（index 为 old 在已选列表中的下标，省略时按对象身份查找）"""
+        if index is None:
+            index = next(i for i, q in enumerate(selected) if q is old)
+        selected[index] = new
+        chosen.discard(old.id)
+        chosen.add(new.id)
+        for t in old.tags:
+            tag_counts[t] = tag_counts.get(t, 0) - 1
+        for t in new.tags:
+            tag_counts[t] = tag_counts.get(t, 0) + 1
+    
+    def _repair_tags(self, selected: List[Question], chosen: Set[str], quotas: Dict[str, int]):
+        """
+        标签配额不足时，用带该标签的候选题替换不带的已选题
+        依次尝试同层、同题型同难度、同题型内替换，尽量不改变题型、难度与章节分布
+        """
+        tag_counts = self._tag_counts(selected)
+        
+        for tag, quota in quotas.items():
+            if tag_counts.get(tag, 0) >= quota:
+                continue
+            types = {q.type for q in selected}
+            candidates = [q for q in self.pool.tagged(tag) if q.type in types and q.id not in chosen]
+            self.rng.shuffle(candidates)
+            for key in (self._cell_of, lambda q: (q.type, q.difficulty), lambda q: q.type):
+                if tag_counts.get(tag, 0) >= quota:
+                    break
+                slots: Dict = {}
+                for q in selected:
+                    if tag not in q.tags:
+                        slots.setdefault(key(q), []).append(q)
+                for new in candidates:
+                    if tag_counts.get(tag, 0) >= quota:
+                        break
+                    if new.id in chosen:
+                        continue
+                    for old in slots.get(key(new), ()):
+                        if old.id in chosen and self._replaceable(old, new, tag_counts, quotas):
+                            self._swap(selected, chosen, tag_counts, old, new)
+                            break
+    
+    def _repair_difficulty(self, selected: List[Question], chosen: Set[str], target: float,
+                           quotas: Dict[str, int]):
+        """
+        平均难度偏离目标时，逐题替换为同题型、同章节、难度相邻的候选题，直到无法再接近目标
+        替换不会让标签低于配额
+        """
+        tag_counts = self._tag_counts(selected)
+        gap = target * len(selected) - sum(q.difficulty for q in selected)
+        
+        order = self.rng.sample(range(len(selected)), len(selected))
+        for _ in range(len(selected) * 4):
+            if abs(gap) <= 0.5:
+                break
+            step = 1 if gap > 0 else -1
+            moved = False
+            for index in order:
+                old = selected[index]
+                # 带有刚好满足配额的标签的题不参与替换，其余题可换成任意相邻难度的题
+                if any(tag_counts.get(t, 0) <= quotas[t] for t in old.tags if t in quotas):
+                    continue
+                cell = self.pool.cells[old.type].get((old.difficulty + step, old.chapter or ""), ())
+                for new in cell:
+                    if new.id in chosen:
+                        continue
+                    self._swap(selected, chosen, tag_counts, old, new, index)
+                    gap -= step
+                    moved = True
+                    break
+                if moved:
+                    break
+            if not moved:
+                break
+    
+    # ============ 求解 ============
+    
+    def solve(self, config) -> Tuple[List[Question], Dict]:
+        """
+        按配置选题，config 为 PaperGenerateConfig
+        返回: (按题型顺序排列的已选题目, 报告)，报告见 build_report
+        """
+        counts = {t: getattr(config, f"{t}_count", 0) or 0 for t in TYPE_NAMES}
+        selected: List[Question] = []
+        for q_type, count in counts.items():
+            if count > 0:
+                selected.extend(self._sample(q_type, self._allocate(q_type, count, config)))
+        
+        chosen = {q.id for q in selected}
+        quotas = {t: int(n) for t, n in (config.tag_quotas or {}).items() if n and int(n) > 0}
+        if quotas:
+            self._repair_tags(selected, chosen, quotas)
+        if config.target_difficulty is not None and selected:
+            self._repair_difficulty(selected, chosen, config.target_difficulty, quotas)
+        
+        order = {t: i for i, t in enumerate(TYPE_NAMES)}
+        selected.sort(key=lambda q: order[q.type])
+        return selected, build_report(config, self.pool, counts, selected, quotas)
+
+
+def _int_keys(distribution: Optional[Dict]) -> Optional[Dict[int, float]]:
+    """难度分布的键转为整数（来自 JSON 时为字符串）"""
+    if not distribution:
+        return None
+    return {int(k): v for k, v in distribution.items()}
+
+
+def _chapter_keys(distribution: Optional[Dict]) -> Optional[Dict[str, float]]:
+    """章节分布中的“未分类”对应分层表中的空字符串"""
+    if not distribution:
+        return None
+    return {("" if k == "未分类" else k): v for k, v in distribution.items()}
+
+
+def assign_scores(selected: List[Question], score_rules: Dict[str, float],
+                  total_score: Optional[float] = None) -> List[float]:
+    """
+    各题分值：按题型分值规则；指定总分时按比例缩放（保留两位小数），舍入误差计入最后一题
+    """
+    scores = [float(score_rules.get(q.type, 5.0)) for q in selected]
+    base = sum(scores)
+    if total_score is None or not scores or base <= 0:
+        return scores
+    scores = [round(s * total_score / base, 2) for s in scores]
+    scores[-1] = round(scores[-1] + total_score - sum(scores), 2)
+    return scores
+
+
+def build_report(config, pool: CandidatePool, counts: Dict[str, int],
+                 selected: List[Question], quotas: Dict[str, int]) -> Dict:
+    """
+    组卷报告：
+    - types: {题型: {requested, selected, available}}
+    - shortfall: 未满足的硬约束说明（空列表表示可行）
+    - difficulty: {target, actual, distribution}，chapters: 各章节题数
+    - tags: {标签: {required, selected}}
+    """
+    by_type: Dict[str, int] = {}
+    by_difficulty: Dict[int, int] = {}
+    by_chapter: Dict[str, int] = {}
+    by_tag: Dict[str, int] = {}
+    for q in selected:
+        by_type[q.type] = by_type.get(q.type, 0) + 1
+        by_difficulty[q.difficulty] = by_difficulty.get(q.difficulty, 0) + 1
+        chapter = q.chapter or "未分类"
+        by_chapter[chapter] = by_chapter.get(chapter, 0) + 1
+        for t in q.tags:
+            if t in quotas:
+                by_tag[t] = by_tag.get(t, 0) + 1
+    
+    shortfall = []
+    types = {}
+    chapter_hint = "（在所选章节范围内）" if config.chapters else ""
+    for q_type, count in counts.items():
+        available = pool.available(q_type)
+        types[q_type] = {'requested': count, 'selected': by_type.get(q_type, 0), 'available': available}
+        if count > 0 and available < count:
+            shortfall.append(f"{TYPE_NAMES[q_type]}不足{chapter_hint}，需要{count}道，实际只有{available}道")
+    for tag, quota in quotas.items():
+        if by_tag.get(tag, 0) < quota:
+            shortfall.append(f"标签“{tag}”的题目不足，需要{quota}道，实际只选出{by_tag.get(tag, 0)}道")
+    
+    actual = sum(q.difficulty for q in selected) / len(selected) if selected else None
+    return {
+        'types': types,
+        'shortfall': shortfall,
+        'difficulty': {
+            'target': config.target_difficulty,
+            'actual': round(actual, 2) if actual is not None else None,
+            'distribution': dict(sorted(by_difficulty.items()))
+        },
+        'chapters': by_chapter,
+        'tags': {tag: {'required': quota, 'selected': by_tag.get(tag, 0)} for tag, quota in quotas.items()}
+    }
@@ -4,12 +4,16 @@
 import json
 import random
 from pathlib import Path
-from typing import List, Optional, Dict
-from dataclasses import dataclass
+from typing import List, Optional, Dict, Tuple
+from dataclasses import dataclass, replace
+from datetime import datetime
 
 from config import PAPERS_DIR, config as app_config
 from models import Paper, PaperQuestion, Question, QuestionBank
 from services.bank_service import BankService
+from services.paper_generator import CandidatePool, PaperSolver, assign_scores
+from services.storage import get_storage
+from utils.pagination import paginate, in_date_range
 
 
 @dataclass
@@ -29,6 +33,15 @@ class PaperGenerateConfig:
     chapters: List[str] = None  # 章节筛选
     score_rules: Dict[str, float] = None  # 分值规则
     shuffle_questions: bool = False  # 是否打乱题目顺序
+    # 以下为组卷目标（可选），尽量满足，实际达到的值见组卷报告
+    difficulty_distribution: Dict[int, float] = None  # 难度占比，如 {1: 0.2, 3: 0.5, 5: 0.3}
+    chapter_distribution: Dict[str, float] = None     # 章节占比（未分类记为“未分类”）
+    target_difficulty: Optional[float] = None          # 目标平均难度
+    tag_quotas: Dict[str, int] = None                  # 标签配额：整卷至少包含的带该标签的题数
+    total_score: Optional[float] = None                # 目标总分，按分值规则的比例缩放各题分值
+    allow_shortfall: bool = False  # 题量或标签配额不足时仍按已选题目生成试卷
+    seed: Optional[int] = None     # 随机种子（相同题库和配置得到相同试卷）
+    snapshot: Optional[bool] = None  # 把题目内容固化为试卷快照（None 时取应用配置 paper_snapshot）
     
     def __post_init__(self):
         if self.bank_ids is None:
@@ -52,36 +65,26 @@ class PaperService:
     
     def __init__(self):
         self.bank_service = BankService()
+        storage = get_storage()
+        self.storage = storage.papers
+        self.snapshots = storage.snapshots
     
-    def _get_papers_dir(self) -> Path:
-        """获取试卷存储目录（动态读取配置）"""
-        custom_dir = app_config.path_config.papers_dir
-        if custom_dir:
-            path = Path(custom_dir)
-            path.mkdir(parents=True, exist_ok=True)
-            return path
-        return PAPERS_DIR
-    
-    def _get_paper_file(self, paper_id: str) -> Path:
-        """获取试卷文件路径"""
-        return self._get_papers_dir() / f"paper_{paper_id}.json"
-    
-    def _save_paper(self, paper: Paper):
-        """保存试卷"""
-        file_path = self._get_paper_file(paper.id)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(paper.to_dict(), f, ensure_ascii=False, indent=2)
+    def _save_paper(self, paper: Paper, questions: Optional[List[Question]] = None):
+        """
+        保存试卷
+        固化快照的试卷先按修改后的题目重写快照：questions 为空时沿用原快照中的题目，新加入的题目从题库读取
+        """
+        if paper.snapshot:
+            if questions is None:
+                questions = self.load_paper_questions(paper)
+            self.snapshots.put(paper.id, self._snapshot_doc(paper, [(q, q.bank_id) for q in questions]))
+        self.storage.put(paper.id, paper.to_dict())
     
     def get_paper(self, paper_id: str) -> Optional[Paper]:
         """获取试卷"""
-        file_path = self._get_paper_file(paper_id)
-        if not file_path.exists():
-            return None
-        
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            return Paper.from_dict(data)
+            data = self.storage.get(paper_id)
+            return Paper.from_dict(data) if data is not None else None
         except Exception as e:
             print(f"加载试卷失败: {e}")
             return None
@@ -89,118 +92,204 @@ class PaperService:
     def get_all_papers(self) -> List[Paper]:
         """获取所有试卷"""
         papers = []
-        papers_dir = self._get_papers_dir()
-        for file_path in papers_dir.glob("paper_*.json"):
+        for data in self.storage.iter_all():
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
                 papers.append(Paper.from_dict(data))
             except:
                 continue
         return sorted(papers, key=lambda p: p.created_at, reverse=True)
     
-    def delete_paper(self, paper_id: str) -> bool:
-        """删除试卷"""
-        file_path = self._get_paper_file(paper_id)
-        if file_path.exists():
-            file_path.unlink()
-            return True
-        return False
+    # 试卷列表可用的排序字段（数值字段按数值排序）
+    SORT_FIELDS = {'created_at': str, 'title': str, 'question_count': float, 'total_score': float,
+                   'time_limit': float}
     
-    def generate_paper(self, config: PaperGenerateConfig) -> tuple[Optional[Paper], str]:
+    def get_paper_summaries(self) -> List[Dict]:
+        """获取所有试卷摘要（按创建时间倒序），只读摘要索引，不解析题目列表"""
+        summaries = [dict(s) for s in self.storage.summaries()]
+        return sorted(summaries, key=lambda s: s.get('created_at') or '', reverse=True)
+    
+    def query_papers(self, bank_id: Optional[str] = None, keyword: Optional[str] = None,
+                     date_from: Optional[str] = None, date_to: Optional[str] = None,
+                     sort: str = 'created_at', order: str = 'desc',
+                     page_size: Optional[int] = 20, cursor: Optional[str] = None) -> Dict:
         """
-        根据配置生成试卷
-        返回: (试卷对象, 错误消息)
+        分页查询试卷摘要
+        按来源题库、标题/描述关键词、创建日期筛选；
+        cursor 为上一页返回的 next_cursor，page_size 为 None 时返回全部
+        返回: {'items', 'total', 'page_size', 'next_cursor'}，参数无效时抛出 ValueError
         """
-        # 收集所有候选题目
-        all_questions: Dict[str, List[Question]] = {
-            'single': [],
-            'multiple': [],
-            'judge': [],
-            'fill': [],
-            'essay': []
-        }
+        if sort not in self.SORT_FIELDS or order not in ('asc', 'desc'):
+            raise ValueError("不支持的排序方式")
+        keyword = (keyword or '').strip().lower()
         
-        # 从指定题库收集题目
-        for bank_id in config.bank_ids:
-            bank = self.bank_service.get_bank(bank_id)
-            if not bank:
+        items = []
+        for s in self.storage.summaries():
+            if bank_id and bank_id not in (s.get('source_banks') or []):
                 continue
-            
-            for q in bank.questions:
-                # 难度筛选
-                if not (config.min_difficulty <= q.difficulty <= config.max_difficulty):
-                    continue
-                # 标签筛选
-                if config.tags and not any(t in q.tags for t in config.tags):
-                    continue
-                # 章节筛选
-                if config.chapters and q.chapter not in config.chapters:
-                    continue
-                
-                if q.type in all_questions:
-                    all_questions[q.type].append(q)
-        
-        # 检查题目是否充足
-        required = {
-            'single': config.single_count,
-            'multiple': config.multiple_count,
-            'judge': config.judge_count,
-            'fill': config.fill_count
-        }
-        
-        # 获取题型中文名
-        type_names = {
-            'single': '单选题',
-            'multiple': '多选题',
-            'judge': '判断题',
-            'fill': '填空题'
-        }
-        
-        # 检查是否选择了章节但没有匹配的题目
-        total_required = sum(required.values())
-        total_available = sum(len(qs) for qs in all_questions.values())
-        
-        if config.chapters and total_required > 0 and total_available == 0:
-            return None, f"所选章节中没有任何题目，请重新选择章节或取消章节筛选"
+            if keyword and keyword not in f"{s.get('title') or ''}\n{s.get('description') or ''}".lower():
+                continue
+            if not in_date_range(s.get('created_at'), date_from, date_to):
+                continue
+            items.append(dict(s))
         
-        for q_type, count in required.items():
-            if count > 0 and len(all_questions[q_type]) < count:
-                type_name = type_names.get(q_type, q_type)
-                chapter_hint = "（在所选章节范围内）" if config.chapters else ""
-                return None, f"{type_name}不足{chapter_hint}，需要{count}道，实际只有{len(all_questions[q_type])}道"
+        convert = self.SORT_FIELDS[sort]
+        return paginate(
+            items, lambda s: convert(s.get(sort) or convert()), order == 'desc', page_size, cursor,
+            params={'bank_id': bank_id, 'keyword': keyword, 'date_from': date_from, 'date_to': date_to,
+                    'sort': sort, 'order': order}
+        )
+    
+    def delete_paper(self, paper_id: str) -> bool:
+        """删除试卷（连同试卷快照）"""
+        self.snapshots.delete(paper_id)
+        return self.storage.delete(paper_id)
+    
+    def build_candidate_pool(self, config: PaperGenerateConfig) -> CandidatePool:
+        """按组卷配置的题库、章节、难度范围和标签筛选候选题，按 (题型, 难度, 章节) 分层"""
+        banks = []
+        for bank_id in config.bank_ids:
+            bank = self.bank_service.get_bank(bank_id)
+            if bank:
+                banks.append(bank)
+        return CandidatePool(
+            banks,
+            chapters=config.chapters or None,
+            min_difficulty=config.min_difficulty,
+            max_difficulty=config.max_difficulty,
+            tags=config.tags or None
+        )
+    
+    def generate_paper_with_report(self, config: PaperGenerateConfig) -> Tuple[Optional[Paper], Dict]:
+        """
+        根据配置生成试卷，并返回组卷报告
+        报告包含各题型的需求/选中/候选数量、难度与章节分布、标签配额完成情况，
+        shortfall 列出未满足的题量与标签配额；error 非空时未生成试卷
+        """
+        pool = self.build_candidate_pool(config)
+        selected, report = self._solve(config, pool, random.Random(config.seed))
+        if report['error']:
+            return None, report
+        paper = self._build_paper(config, selected, report)
+        if paper.snapshot:
+            self.snapshots.put(paper.id, self._snapshot_doc(paper, [(q, pool.bank_of(q)) for q in selected]))
+        self.storage.put(paper.id, paper.to_dict())
+        return paper, report
+    
+    def _solve(self, config: PaperGenerateConfig, pool: CandidatePool,
+               rng: random.Random) -> Tuple[List[Question], Dict]:
+        """在候选池上选题，不满足要求时报告中的 error 非空"""
+        total_required = sum(max(0, n) for n in (config.single_count, config.multiple_count,
+                                                 config.judge_count, config.fill_count))
+        if config.chapters and total_required > 0 and pool.total() == 0:
+            return [], {'error': "所选章节中没有任何题目，请重新选择章节或取消章节筛选", 'shortfall': []}
         
-        # 随机抽题
+        selected, report = PaperSolver(pool, rng).solve(config)
+        report['error'] = ""
+        if report['shortfall'] and not config.allow_shortfall:
+            report['error'] = report['shortfall'][0]
+        elif not selected and total_required > 0:
+            report['error'] = "没有符合条件的题目"
+        return selected, report
+    
+    def _build_paper(self, config: PaperGenerateConfig, selected: List[Question], report: Dict) -> Paper:
+        """用选中的题目组成试卷（不保存）"""
         paper = Paper(
             title=config.title,
             description=config.description,
             time_limit=config.time_limit,
             score_rules=config.score_rules,
             source_banks=config.bank_ids,
-            shuffle_questions=config.shuffle_questions
+            shuffle_questions=config.shuffle_questions,
+            snapshot=app_config.app_config.paper_snapshot if config.snapshot is None else config.snapshot
         )
+        for q, score in zip(selected, assign_scores(selected, config.score_rules, config.total_score)):
+            paper.add_question(question_id=q.id, question_type=q.type, score=score)
+        report['total_score'] = round(paper.total_score, 2)
+        return paper
+    
+    # 批量组卷单次最多生成的份数
+    MAX_BATCH = 200
+    
+    def generate_papers(self, config: PaperGenerateConfig, count: int,
+                        max_overlap: Optional[int] = None) -> Tuple[List[Paper], Dict]:
+        """
+        用同一个候选池批量生成 count 份试卷（平行卷），标题依次加上序号，全部生成后一次批量写入
+        max_overlap 限制任意两份试卷之间相同题目的数量（None 为不限制）：
+        先只从之前各份都没用过的题中选，题目不够时再放开一部分已用过的题，
+        放开的题按每份试卷最多 max_overlap 道挑选，保证两两重复不超过上限
+        返回: (试卷列表, 报告 {'papers': 各份的组卷报告, 'overlap': {'limit', 'max'}, 'error'})；
+        任一份不满足要求时不写入任何试卷，error 说明是第几份及原因。份数或上限无效时抛出 ValueError
+        """
+        if not 1 <= count <= self.MAX_BATCH:
+            raise ValueError(f"生成份数需在 1 到 {self.MAX_BATCH} 之间")
+        if max_overlap is not None and max_overlap < 0:
+            raise ValueError("重复题目数上限不能为负数")
         
-        selected_ids = set()
+        pool = self.build_candidate_pool(config)
+        rng = random.Random(config.seed)
+        papers: List[Paper] = []
+        snapshots: Dict[str, Dict] = {}
+        reports: List[Dict] = []
+        used: Dict[str, Question] = {}       # 已被之前各份选中的题目
+        owners: Dict[str, List[int]] = {}    # 题目ID -> 选中该题的试卷序号
         
-        for q_type, count in required.items():
-            if count <= 0:
-                continue
-            
-            available = [q for q in all_questions[q_type] if q.id not in selected_ids]
-            selected = random.sample(available, count)
+        for k in range(count):
+            variant = replace(config, title=f"{config.title}（{k + 1}）")
+            if max_overlap is None:
+                selected, report = self._solve(variant, pool, rng)
+            else:
+                selected, report = self._solve(variant, pool.excluding(used.values()), rng)
+                if report['shortfall'] and max_overlap > 0 and used:
+                    allowed = self._reusable(owners, max_overlap, rng)
+                    selected, report = self._solve(
+                        variant, pool.excluding(q for qid, q in used.items() if qid not in allowed), rng)
+            reports.append(report)
+            if report['error']:
+                return [], {'papers': reports, 'overlap': {'limit': max_overlap, 'max': None},
+                            'error': f"第{k + 1}份试卷：{report['error']}"}
             
+            paper = self._build_paper(variant, selected, report)
+            if paper.snapshot:
+                snapshots[paper.id] = self._snapshot_doc(paper, [(q, pool.bank_of(q)) for q in selected])
+            papers.append(paper)
             for q in selected:
-                selected_ids.add(q.id)
-                paper.add_question(
-                    question_id=q.id,
-                    question_type=q.type,
-                    score=config.score_rules.get(q.type, 5.0)
-                )
-        
-        # 保存试卷
-        self._save_paper(paper)
+                used[q.id] = q
+                owners.setdefault(q.id, []).append(k)
         
-        return paper, ""
+        self.snapshots.put_many(snapshots)
+        self.storage.put_many({paper.id: paper.to_dict() for paper in papers})
+        return papers, {'papers': reports, 'overlap': {'limit': max_overlap, 'max': self._max_overlap(owners)},
+                        'error': ""}
+    
+    @staticmethod
+    def _reusable(owners: Dict[str, List[int]], limit: int, rng: random.Random) -> set:
+        """随机挑选可以再次使用的已用题目：每份已生成的试卷最多放开 limit 道"""
+        budget: Dict[int, int] = {}
+        allowed = set()
+        for qid in rng.sample(list(owners), len(owners)):
+            if all(budget.get(k, 0) < limit for k in owners[qid]):
+                allowed.add(qid)
+                for k in owners[qid]:
+                    budget[k] = budget.get(k, 0) + 1
+        return allowed
+    
+    @staticmethod
+    def _max_overlap(owners: Dict[str, List[int]]) -> int:
+        """各份试卷两两之间相同题目数的最大值"""
+        pairs: Dict[tuple, int] = {}
+        for ks in owners.values():
+            for i in range(len(ks)):
+                for j in range(i + 1, len(ks)):
+                    pairs[(ks[i], ks[j])] = pairs.get((ks[i], ks[j]), 0) + 1
+        return max(pairs.values(), default=0)
+    
+    def generate_paper(self, config: PaperGenerateConfig) -> tuple[Optional[Paper], str]:
+        """
+        根据配置生成试卷
+        返回: (试卷对象, 错误消息)
+        """
+        paper, report = self.generate_paper_with_report(config)
+        return paper, report['error']
     
     def create_manual_paper(self, title: str, description: str = "", 
                            time_limit: int = 60) -> Paper:
@@ -241,36 +330,72 @@ class PaperService:
         return True
     
     def get_paper_questions(self, paper_id: str) -> List[Question]:
-        """获取试卷的所有题目对象"""
+        """获取试卷的所有题目对象（带 bank_id 属性），见 load_paper_questions"""
         paper = self.get_paper(paper_id)
         if not paper:
             return []
+        return self.load_paper_questions(paper)
+    
+    def load_paper_questions(self, paper: Paper) -> List[Question]:
+        """
+        获取已读取试卷的所有题目对象（带 bank_id 属性），按试卷顺序排列
+        固化快照的试卷只读快照；快照缺失或缺少的题目（以及未固化的试卷）
+        按题目定位索引只打开包含这些题目的题库，通过题库视图只解码用到的题目；
+        返回新建的对象，不影响缓存中的题库
+        """
+        found: Dict[str, Question] = self._snapshot_questions(paper) if paper.snapshot else {}
+        wanted = [pq.question_id for pq in paper.questions if pq.question_id not in found]
+        if wanted:
+            found.update(self._bank_questions(paper, wanted))
         
+        # 按试卷顺序排列
+        return [found[pq.question_id] for pq in paper.questions if pq.question_id in found]
+    
+    def _snapshot_questions(self, paper: Paper) -> Dict[str, Question]:
+        """读取试卷快照中的题目 {题目ID: 题目}，快照不存在或无法读取时返回空字典"""
+        try:
+            data = self.snapshots.get(paper.id)
+        except Exception as e:
+            print(f"读取试卷快照失败: {e}")
+            return {}
+        found = {}
+        for item in (data or {}).get('questions') or []:
+            q = Question.from_dict(item)
+            q.bank_id = item.get('bank_id')
+            found[q.id] = q
+        return found
+    
+    @staticmethod
+    def _snapshot_doc(paper: Paper, entries: List[Tuple[Question, Optional[str]]]) -> Dict:
+        """试卷快照文档：按试卷顺序保存题目内容及所在题库ID，写入后不随题库修改、删除而变化"""
         questions = []
-        # 收集所有相关题库，记录题目和题库的映射关系
-        banks_cache = {}  # {question_id: (question, bank_id)}
-        for bank_id in paper.source_banks:
-            bank = self.bank_service.get_bank(bank_id)
-            if bank:
-                for q in bank.questions:
-                    banks_cache[q.id] = (q, bank_id)
+        for q, bank_id in entries:
+            item = q.to_dict()
+            item['bank_id'] = bank_id
+            questions.append(item)
+        return {'id': paper.id, 'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'questions': questions}
+    
+    def _bank_questions(self, paper: Paper, wanted: List[str]) -> Dict[str, Question]:
+        """从题库读取试卷中的题目 {题目ID: 题目}，找不到的题目不在结果中"""
+        locations = self.bank_service.locate_questions(wanted)
         
-        # 如果没有记录来源题库，遍历所有题库
-        if not banks_cache:
-            all_banks = self.bank_service.get_all_banks()
-            for bank in all_banks:
-                for q in bank.questions:
-                    banks_cache[q.id] = (q, bank.id)
+        # 同一题目出现在多个题库中时优先取试卷记录的来源题库
+        preference = {bank_id: i for i, bank_id in enumerate(paper.source_banks)}
+        by_bank: Dict[str, List[str]] = {}
+        for qid, bank_ids in locations.items():
+            bank_id = min(bank_ids, key=lambda b: preference.get(b, len(preference)))
+            by_bank.setdefault(bank_id, []).append(qid)
         
-        # 按顺序获取题目，并添加bank_id属性
-        for pq in paper.questions:
-            if pq.question_id in banks_cache:
-                q, bank_id = banks_cache[pq.question_id]
-                # 给题目添加bank_id属性
+        found: Dict[str, Question] = {}
+        for bank_id, ids in by_bank.items():
+            view = self.bank_service.get_bank_view(bank_id)
+            if view is None:
+                continue
+            for qid, q in view.get_questions(ids).items():
                 q.bank_id = bank_id
-                questions.append(q)
-        
-        return questions
+                found[qid] = q
+        return found
     
     def duplicate_paper(self, paper_id: str, new_title: str = None) -> Optional[Paper]:
         """复制试卷"""
@@ -279,7 +404,6 @@ class PaperService:
             return None
         
         import uuid
-        from datetime import datetime
         
         new_paper = Paper(
             id=str(uuid.uuid4()),
@@ -287,7 +411,8 @@ class PaperService:
             description=original.description,
             time_limit=original.time_limit,
             score_rules=original.score_rules.copy(),
-            source_banks=original.source_banks.copy()
+            source_banks=original.source_banks.copy(),
+            snapshot=original.snapshot
         )
         
         for pq in original.questions:
@@ -299,5 +424,6 @@ class PaperService:
             ))
         
         new_paper._recalculate_total_score()
-        self._save_paper(new_paper)
+        # 副本沿用原试卷快照中的题目内容
+        self._save_paper(new_paper, self.load_paper_questions(original) if original.snapshot else None)
         return new_paper
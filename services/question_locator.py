@@ -0,0 +1,210 @@
+"""
+题目定位索引 - 记录每道题目所在的题库（题目ID -> 题库ID），跨题库查找题目时只打开用到的题库
+"""
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from config import DATA_DIR
+from utils.atomic_io import atomic_write
+from utils.file_lock import get_file_lock
+from utils.journal import AppendLog
+from services.storage.codec import encode, read_file
+
+
+class QuestionLocator:
+    """
+    题目定位索引，由 BankService 在题库增删题目时维护
+    - question_locations.json 为快照 {"version", "banks": {题库ID: {"count": 题目数, "ids": [题目ID]}}}，
+      之后的修改以 {"b": 题库ID, "op": set/add/del/drop, "n": 修改后的题目数, "ids": [...]} 追加到 .log，
+      日志超过快照大小时合并进快照；其他进程按快照文件标识与日志读取位置增量刷新
+    - 查找时与题库元数据中的题目数比对，不一致（如修改中途崩溃）的题库重新读取其题目ID，
+      索引文件不存在时按这一规则为全部题库建立一次
+    - 导入的题库会保留原题目ID，同一ID可能出现在多个题库中
+    """
+    
+    INDEX_FILE = DATA_DIR / "question_locations.json"
+    VERSION = 1
+    MIN_COMPACT_BYTES = 256 * 1024
+    
+    # 本进程缓存的索引内容（所有实例共享）
+    _lock = threading.RLock()
+    _stamp: Optional[tuple] = None
+    _offset = 0
+    _banks: Dict[str, Dict] = {}          # 题库ID -> {'count': 题目数, 'ids': set}
+    _where: Dict[str, str] = {}           # 题目ID -> 题库ID
+    _shared: Dict[str, Set[str]] = {}     # 出现在多个题库中的题目ID -> 全部题库ID
+    
+    def _log(self) -> AppendLog:
+        return AppendLog(self.INDEX_FILE.with_name(self.INDEX_FILE.name + ".log"))
+    
+    # ============ 内存索引 ============
+    
+    @classmethod
+    def _reset(cls):
+        cls._banks, cls._where, cls._shared = {}, {}, {}
+    
+    @classmethod
+    def _link(cls, bank_id: str, question_ids: Iterable[str]):
+        for qid in question_ids:
+            current = cls._where.setdefault(qid, bank_id)
+            if current != bank_id:
+                cls._shared.setdefault(qid, {current}).add(bank_id)
+    
+    @classmethod
+    def _unlink(cls, bank_id: str, question_ids: Iterable[str]):
+        for qid in question_ids:
+            banks = cls._shared.get(qid)
+            if banks is None:
+                if cls._where.get(qid) == bank_id:
+                    del cls._where[qid]
+                continue
+            banks.discard(bank_id)
+            cls._where[qid] = next(iter(banks))
+            if len(banks) == 1:
+                del cls._shared[qid]
+    
+    @classmethod
+    def _apply(cls, record: Dict):
+        """应用一条修改记录"""
+        bank_id, op = record.get('b'), record.get('op')
+        ids = record.get('ids') or []
+        entry = cls._banks.get(bank_id)
+        if op in ('set', 'drop') and entry is not None:
+            cls._unlink(bank_id, entry['ids'])
+            del cls._banks[bank_id]
+            entry = None
+        if op == 'drop':
+            return
+        if entry is None:
+            entry = cls._banks[bank_id] = {'count': 0, 'ids': set()}
+        if op == 'del':
+            ids = [qid for qid in ids if qid in entry['ids']]
+            entry['ids'].difference_update(ids)
+            cls._unlink(bank_id, ids)
+        else:
+            ids = [qid for qid in ids if qid not in entry['ids']]
+            entry['ids'].update(ids)
+            cls._link(bank_id, ids)
+        entry['count'] = record.get('n', len(entry['ids']))
+    
+    # ============ 持久化 ============
+    
+    def _refresh(self) -> bool:
+        """读取其他进程的新修改（调用方持有索引锁），索引文件不存在或无法使用时返回 False"""
+        log = self._log()
+        with self._lock:
+            try:
+                st = self.INDEX_FILE.stat()
+            except FileNotFoundError:
+                return False
+            stamp = (st.st_ino, st.st_size, st.st_mtime_ns)
+            size = log.size()
+            if QuestionLocator._stamp != stamp or size < QuestionLocator._offset:
+                try:
+                    data = read_file(self.INDEX_FILE)
+                except Exception:
+                    return False
+                if not isinstance(data, dict) or data.get('version') != self.VERSION:
+                    return False
+                self._reset()
+                for bank_id, entry in (data.get('banks') or {}).items():
+                    self._apply({'b': bank_id, 'op': 'set', 'n': entry.get('count'), 'ids': entry.get('ids')})
+                QuestionLocator._stamp, QuestionLocator._offset = stamp, 0
+            if size > QuestionLocator._offset:
+                for record in log.read(QuestionLocator._offset):
+                    self._apply(record)
+                QuestionLocator._offset = size
+            return True
+    
+    def _write_snapshot(self):
+        """把内存中的索引写成快照并清空日志（调用方持有索引写锁与 _lock）"""
+        banks = {bank_id: {'count': entry['count'], 'ids': sorted(entry['ids'])}
+                 for bank_id, entry in self._banks.items()}
+        atomic_write(self.INDEX_FILE, encode({'version': self.VERSION, 'banks': banks}))
+        self._log().clear()
+        st = self.INDEX_FILE.stat()
+        QuestionLocator._stamp, QuestionLocator._offset = (st.st_ino, st.st_size, st.st_mtime_ns), 0
+    
+    def initialize(self):
+        """索引文件不存在时创建空索引（仅在还没有任何题库时调用）"""
+        with get_file_lock(self.INDEX_FILE).write():
+            if not self.INDEX_FILE.exists():
+                with self._lock:
+                    self._reset()
+                    self._write_snapshot()
+    
+    def record(self, records: List[Dict]):
+        """
+        登记题库修改（调用方已写入题库），记录格式见类说明
+        索引文件不存在时只更新本进程的内存索引，由下次查找统一建立
+        """
+        if not records:
+            return
+        log = self._log()
+        with get_file_lock(self.INDEX_FILE).write():
+            if not self._refresh():
+                with self._lock:
+                    for record in records:
+                        self._apply(record)
+                    if QuestionLocator._stamp is None:
+                        return
+                    # 索引文件被删除或损坏：以内存中的索引重写，缺失的题库查找时按题目数校验补上
+                    self._write_snapshot()
+                    return
+            size = log.append(records)
+            with self._lock:
+                for record in records:
+                    self._apply(record)
+                QuestionLocator._offset = size
+                if size > max(QuestionLocator._stamp[1], self.MIN_COMPACT_BYTES):
+                    self._write_snapshot()
+    
+    # ============ 查找 ============
+    
+    def locate(self, question_ids: Iterable[str], counts: Dict[str, int],
+               load_ids: Callable[[str], Optional[List[str]]]) -> Dict[str, List[str]]:
+        """
+        查找题目所在的题库
+        counts 为题库元数据中各题库的题目数，用于发现过期的条目；load_ids(题库ID) 读取题库的全部题目ID
+        返回: {题目ID: [题库ID, ...]}，找不到的题目不在结果中
+        """
+        with get_file_lock(self.INDEX_FILE).read():
+            available = self._refresh()
+        with self._lock:
+            # 索引文件不可用时内存中的条目不可信，全部题库重新读取
+            known = self._banks if available else {}
+            stale = [bank_id for bank_id, count in counts.items()
+                     if known.get(bank_id, {}).get('count', 0) != (count or 0)]
+            removed = [bank_id for bank_id in known if bank_id not in counts]
+        
+        if stale or removed or not available:
+            # 在索引锁外读取题库（读取题库会获取题库锁，题库修改时先持有题库锁再登记到索引）
+            records = [{'b': bank_id, 'op': 'drop'} for bank_id in removed]
+            for bank_id in stale:
+                ids = load_ids(bank_id)
+                if ids is None:
+                    records.append({'b': bank_id, 'op': 'drop'})
+                else:
+                    # 题目数记为元数据中的值，元数据与题库不一致时不会每次查找都重新读取
+                    records.append({'b': bank_id, 'op': 'set', 'n': counts[bank_id] or 0, 'ids': ids})
+            with get_file_lock(self.INDEX_FILE).write():
+                with self._lock:
+                    if not self._refresh():
+                        self._reset()
+                        QuestionLocator._stamp = None
+                    for record in records:
+                        self._apply(record)
+                    self._write_snapshot()
+        
+        result = {}
+        with self._lock:
+            for qid in question_ids:
+                banks = self._shared.get(qid)
+                if banks is not None:
+                    found = [bank_id for bank_id in banks if bank_id in counts]
+                else:
+                    bank_id = self._where.get(qid)
+                    found = [bank_id] if bank_id in counts else []
+                if found:
+                    result[qid] = found
+        return result
@@ -0,0 +1,319 @@
+"""
+全文检索服务 - 维护跨题库的倒排索引
+"""
+import re
+import threading
+import atexit
+from pathlib import Path
+from typing import List, Optional, Dict, Set, Iterable
+
+# 使用高性能 JSON 库（比标准库快 10-50 倍）
+try:
+    import orjson
+    def json_loads(s): return orjson.loads(s)
+    def json_dumps(obj): return orjson.dumps(obj).decode('utf-8')
+except ImportError:
+    import json
+    def json_loads(s): return json.loads(s)
+    def json_dumps(obj): return json.dumps(obj, ensure_ascii=False)
+
+from config import DATA_DIR
+from models import QuestionBank, Question
+from utils.text_index import InvertedIndex
+from utils.atomic_io import atomic_write
+from services.storage import change_feed
+
+# 选项开头的字母标号（"A. "、"B、" 等，与导入解析的选项格式一致），不参与检索
+_OPTION_LABEL = re.compile(r'^\s*[A-H][\.、:：\s]\s*')
+
+
+class SearchService:
+    """全文检索服务类"""
+    
+    # 索引分片目录（与 banks_meta.json 同级）
+    INDEX_DIR = DATA_DIR / "search_index"
+    INDEX_VERSION = 2
+    
+    # 索引变更后延迟写盘的秒数，合并短时间内的多次修改
+    PERSIST_DELAY = 2.0
+    
+    # 全局共享的索引，首次检索时加载
+    _index: Optional[InvertedIndex] = None
+    _loading = False
+    # 各题库分片对应的题库版本：{bank_id: (updated_at, question_count)}
+    _signatures: Dict[str, tuple] = {}
+    _dirty: Set[str] = set()
+    _timer: Optional[threading.Timer] = None
+    _lock = threading.RLock()
+    # 写盘定时器锁：只保护 _timer，持有期间不获取其他锁（题库锁内也会调度写盘）
+    _timer_lock = threading.Lock()
+    
+    # 题库变更事件队列：变更通知在题库锁内发出，只入队不触碰索引，
+    # 由检索或写盘时统一应用，避免与加载索引时的加锁顺序相反
+    _pending: List[tuple] = []
+    _pending_lock = threading.Lock()
+    
+    # 其他进程修改过的题库（变更通知），下次检索前在锁外重新建立其索引；None 表示全部题库
+    _stale: Set[Optional[str]] = set()
+    
+    @staticmethod
+    def question_text(question: Question) -> str:
+        """题目的可检索文本：题干、选项（去掉字母标号）、解析、标签"""
+        parts = [question.question]
+        parts.extend(_OPTION_LABEL.sub('', str(opt), count=1) for opt in question.options)
+        parts.append(question.explanation or "")
+        parts.extend(question.tags)
+        return "\n".join(parts)
+    
+    @staticmethod
+    def _bank_signature(bank: QuestionBank) -> tuple:
+        """题库版本标识"""
+        return (bank.updated_at, len(bank.questions))
+    
+    def _get_shard_file(self, bank_id: str) -> Path:
+        """获取索引分片文件路径"""
+        return self.INDEX_DIR / f"bank_{bank_id}.json"
+    
+    def _get_index(self) -> InvertedIndex:
+        """获取索引（首次调用时从分片加载，过期的分片按题库重建）"""
+        with self._lock:
+            if SearchService._index is None:
+                with self._pending_lock:
+                    SearchService._loading = True
+                index = None
+                try:
+                    index = self._load_index()
+                finally:
+                    with self._pending_lock:
+                        SearchService._index = index
+                        SearchService._loading = False
+                        if index is None:
+                            SearchService._pending = []
+            self._apply_pending()
+            return SearchService._index
+    
+    def _load_index(self) -> InvertedIndex:
+        """从分片文件加载索引"""
+        from services.bank_service import BankService
+        bank_service = BankService()
+        
+        index = InvertedIndex()
+        SearchService._signatures = {}
+        for summary in bank_service.get_banks_summary():
+            bank_id = summary['id']
+            signature = (summary.get('updated_at'), summary.get('question_count'))
+            if self._load_shard(index, bank_id, signature):
+                continue
+            bank = bank_service.get_bank(bank_id)
+            if bank:
+                index.index_bank(bank.id, ((q.id, self.question_text(q)) for q in bank.questions))
+                self._signatures[bank.id] = self._bank_signature(bank)
+                self._dirty.add(bank.id)
+        
+        self._schedule_persist()
+        return index
+    
+    def _load_shard(self, index: InvertedIndex, bank_id: str, signature: tuple) -> bool:
+        """载入索引分片，分片缺失或与题库版本不一致时返回 False"""
+        shard_file = self._get_shard_file(bank_id)
+        if not shard_file.exists():
+            return False
+        try:
+            with open(shard_file, 'rb') as f:
+                data = json_loads(f.read())
+            if data.get('version') != self.INDEX_VERSION:
+                return False
+            if (data.get('updated_at'), data.get('question_count')) != signature:
+                return False
+            index.load_bank(bank_id, data.get('postings', {}))
+            self._signatures[bank_id] = signature
+            return True
+        except Exception as e:
+            print(f"加载检索索引失败: {e}")
+            return False
+    
+    def _apply_pending(self):
+        """把排队的题库变更应用到索引（调用方需持有 _lock）"""
+        with self._pending_lock:
+            events, SearchService._pending = SearchService._pending, []
+        
+        index = SearchService._index
+        for kind, bank_id, signature, docs in events:
+            if kind == 'drop':
+                index.drop_bank(bank_id)
+                self._signatures.pop(bank_id, None)
+            elif kind == 'bank':
+                index.index_bank(bank_id, docs)
+            else:
+                for question_id, text in docs:
+                    if text is None:
+                        index.remove_document(bank_id, question_id)
+                    else:
+                        index.add_document(bank_id, question_id, text)
+            if signature is not None:
+                self._signatures[bank_id] = signature
+            self._dirty.add(bank_id)
+    
+    def _enqueue(self, event: tuple) -> bool:
+        """登记题库变更，索引未加载时忽略（加载时会按版本校验分片）"""
+        with self._pending_lock:
+            if SearchService._index is None and not SearchService._loading:
+                return False
+            SearchService._pending.append(event)
+        self._schedule_persist()
+        return True
+    
+    def _schedule_persist(self):
+        """延迟写盘（只持有定时器锁，不等待索引锁，可在题库锁内调用）"""
+        with self._timer_lock:
+            if SearchService._timer is not None:
+                return
+            timer = threading.Timer(self.PERSIST_DELAY, self.flush)
+            timer.daemon = True
+            SearchService._timer = timer
+            timer.start()
+    
+    def flush(self):
+        """把有变更的索引分片写入磁盘"""
+        with self._timer_lock:
+            SearchService._timer = None
+        with self._lock:
+            index = SearchService._index
+            if index is None:
+                return
+            self._apply_pending()
+            if not self._dirty:
+                return
+            dirty = list(self._dirty)
+            self._dirty.clear()
+            shards = {}
+            for bank_id in dirty:
+                if index.has_bank(bank_id):
+                    updated_at, question_count = self._signatures.get(bank_id, (None, None))
+                    shards[bank_id] = {
+                        'version': self.INDEX_VERSION,
+                        'updated_at': updated_at,
+                        'question_count': question_count,
+                        'postings': index.dump_bank(bank_id)
+                    }
+                else:
+                    shards[bank_id] = None
+        
+        self.INDEX_DIR.mkdir(parents=True, exist_ok=True)
+        for bank_id, shard in shards.items():
+            shard_file = self._get_shard_file(bank_id)
+            try:
+                if shard is None:
+                    if shard_file.exists():
+                        shard_file.unlink()
+                    continue
+                atomic_write(shard_file, json_dumps(shard))
+            except Exception as e:
+                print(f"保存检索索引失败: {e}")
+    
+    # ============ 题库变更通知（索引未加载时忽略，加载时按版本校验） ============
+    
+    def on_questions_changed(self, bank: QuestionBank, changed: Iterable[Question] = (),
+                             removed_ids: Iterable[str] = ()):
+        """题目增、改、删后增量更新索引（在题库锁内调用）"""
+        if SearchService._index is None and not SearchService._loading:
+            return
+        docs = [(q.id, self.question_text(q)) for q in changed]
+        docs.extend((question_id, None) for question_id in removed_ids)
+        self._enqueue(('docs', bank.id, self._bank_signature(bank), docs))
+    
+    def on_bank_saved(self, bank: QuestionBank):
+        """题库整体保存后重建其索引分片"""
+        if SearchService._index is None and not SearchService._loading:
+            return
+        docs = [(q.id, self.question_text(q)) for q in bank.questions]
+        self._enqueue(('bank', bank.id, self._bank_signature(bank), docs))
+    
+    @classmethod
+    def _on_remote_change(cls, bank_id: Optional[str]):
+        """其他进程修改了题库（只登记，不在通知线程中加载题库）"""
+        with cls._pending_lock:
+            if cls._index is not None or cls._loading:
+                cls._stale.add(bank_id)
+    
+    def _refresh_stale(self):
+        """按当前存储内容重建其他进程修改过的题库索引（在索引锁外调用，加锁顺序与题库变更通知一致）"""
+        with self._pending_lock:
+            if not SearchService._stale:
+                return
+            stale, SearchService._stale = SearchService._stale, set()
+        
+        from services.bank_service import BankService
+        bank_service = BankService()
+        if None in stale:
+            stale = {summary['id'] for summary in bank_service.get_banks_summary()} | set(self._signatures)
+        for bank_id in stale:
+            bank = bank_service.get_bank(bank_id)
+            if bank is None:
+                self._enqueue(('drop', bank_id, None, None))
+            else:
+                docs = [(q.id, self.question_text(q)) for q in bank.questions]
+                self._enqueue(('bank', bank_id, self._bank_signature(bank), docs))
+    
+    def on_bank_deleted(self, bank_id: str):
+        """题库删除后移除其索引分片"""
+        if not self._enqueue(('drop', bank_id, None, None)):
+            # 索引尚未加载，直接删除分片文件
+            shard_file = self._get_shard_file(bank_id)
+            if shard_file.exists():
+                shard_file.unlink()
+    
+    # ============ 查询 ============
+    
+    def candidates(self, bank_id: str, keyword: str) -> Optional[Set[str]]:
+        """
+        获取题库中可能包含关键词的题目ID（超集，需再做精确比对）
+        返回 None 表示索引无法缩小范围
+        """
+        self._refresh_stale()
+        with self._lock:
+            return self._get_index().candidates(keyword, bank_id)
+    
+    def search(self, keyword: str, page: int = 1, page_size: int = 20,
+               bank_ids: Optional[List[str]] = None) -> Dict:
+        """跨题库检索题目，按相关度排序并分页"""
+        page = max(page, 1)
+        page_size = max(page_size, 1)
+        
+        self._refresh_stale()
+        with self._lock:
+            index = self._get_index()
+            ranked = index.search(keyword, bank_ids or None) if keyword.strip() else []
+        
+        total = len(ranked)
+        start = (page - 1) * page_size
+        
+        from services.bank_service import BankService
+        bank_service = BankService()
+        items = []
+        for score, bank_id, question_id in ranked[start:start + page_size]:
+            bank = bank_service.get_bank(bank_id)
+            question = bank.get_question(question_id) if bank else None
+            if not question:
+                continue
+            items.append({
+                **question.to_dict(),
+                'bank_id': bank_id,
+                'bank_name': bank.name,
+                'score': round(score, 4)
+            })
+        
+        return {
+            "items": items,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": (total + page_size - 1) // page_size
+        }
+
+
+# 进程退出前写入尚未落盘的索引分片
+atexit.register(lambda: SearchService().flush())
+
+# 多 worker 部署时，其他进程修改题库后重建本进程中对应的索引
+change_feed.subscribe('bank', SearchService._on_remote_change)
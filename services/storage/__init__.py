@@ -0,0 +1,72 @@
+"""
+存储后端
+通过 PathConfig.storage_backend 选择：json（默认，每个题库一个文件）或 sqlite
+"""
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from config import DATA_DIR, APP_ROOT, config as app_config
+from utils.change_feed import ChangeFeed
+from .base import BankStorage, DocumentStorage, BlobStorage, Storage
+from .json_storage import create_json_storage
+from .sqlite_storage import create_sqlite_storage
+
+DEFAULT_DATABASE_FILE = DATA_DIR / "answer_system.db"
+
+_storages: Dict[tuple, Storage] = {}
+_storages_lock = threading.Lock()
+
+# 当前使用的存储后端（首次获取时按配置确定，运行期间不变，切换后端需重启）
+_default: Optional[Storage] = None
+
+# 跨进程变更通知：多 worker 部署时由 Web 服务启用，各服务据此让本进程的缓存失效
+change_feed = ChangeFeed(DATA_DIR / "changes.log")
+
+
+def get_database_file() -> Path:
+    """获取 SQLite 数据库文件路径（动态读取配置）"""
+    custom_file = app_config.path_config.database_file
+    if custom_file:
+        path = Path(custom_file)
+        if not path.is_absolute():
+            path = APP_ROOT / path
+        return path
+    return DEFAULT_DATABASE_FILE
+
+
+def get_storage(backend: Optional[str] = None) -> Storage:
+    """
+    获取存储后端
+    不指定 backend 时返回当前使用的后端；同一配置共享同一实例
+    """
+    global _default
+    if backend is None and _default is not None:
+        return _default
+    
+    name = backend or app_config.path_config.storage_backend or "json"
+    key = (name, str(get_database_file())) if name == "sqlite" else (name,)
+    with _storages_lock:
+        storage = _storages.get(key)
+        if storage is None:
+            if name == "sqlite":
+                storage = create_sqlite_storage(get_database_file())
+            elif name == "json":
+                storage = create_json_storage()
+            else:
+                raise ValueError(f"不支持的存储后端: {name}")
+            _storages[key] = storage
+        if backend is None:
+            _default = storage
+        return storage
+
+
+__all__ = [
+    'BankStorage',
+    'DocumentStorage',
+    'BlobStorage',
+    'Storage',
+    'get_storage',
+    'get_database_file',
+    'change_feed'
+]
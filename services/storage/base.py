@@ -0,0 +1,281 @@
+"""
+存储后端接口
+题库、试卷、答题结果、收藏各自一个存储对象，业务服务只通过这些接口读写数据
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from models import QuestionBank, Question
+
+# 题库头信息字段（题目列表以外的部分）
+BANK_HEADER_FIELDS = ('id', 'name', 'description', 'subject', 'chapters', 'created_at', 'updated_at')
+
+# 答题结果摘要字段（列表页、按状态查找只需要这些，不需要逐题详情）
+RESULT_SUMMARY_FIELDS = ('id', 'paper_id', 'paper_title', 'user_id', 'status', 'user_score', 'total_score',
+                         'start_time', 'end_time', 'source_banks')
+
+
+# 试卷摘要字段（列表页不需要题目列表）
+PAPER_SUMMARY_FIELDS = ('id', 'title', 'description', 'created_at', 'time_limit', 'total_score',
+                        'source_banks', 'shuffle_questions', 'snapshot')
+
+
+def summarize_paper(data: Dict) -> Dict:
+    """试卷摘要：摘要字段 + 题数"""
+    summary = {k: data.get(k) for k in PAPER_SUMMARY_FIELDS}
+    summary['question_count'] = len(data.get('questions') or [])
+    return summary
+
+
+def summarize_result(data: Dict) -> Dict:
+    """答题结果摘要：摘要字段 + 题数与答对题数"""
+    summary = {k: data.get(k) for k in RESULT_SUMMARY_FIELDS}
+    details = data.get('details') or []
+    summary['question_count'] = len(details)
+    summary['correct_count'] = sum(1 for d in details if isinstance(d, dict) and d.get('is_correct'))
+    return summary
+
+
+class BankView(ABC):
+    """
+    题库只读视图
+    题库头信息立即可用，题目按需解析；select 只解析当前页，返回与 Question.to_dict 相同格式的字典
+    """
+    
+    def __init__(self, header: Dict, signature: tuple, nbytes: int):
+        self.header = header
+        self.signature = signature
+        self.nbytes = nbytes  # 视图常驻内存的估算字节数
+    
+    @abstractmethod
+    def select(self, types: Optional[Iterable[str]] = None,
+               chapters: Optional[Iterable[str]] = None,
+               offset: int = 0, limit: Optional[int] = None) -> Tuple[List[Dict], int]:
+        """
+        按题型、章节筛选（chapters 中的空字符串表示未分类），按题库顺序分页
+        返回: (当前页题目字典, 符合条件的总数)
+        """
+    
+    @abstractmethod
+    def get_questions(self, question_ids: Iterable[str]) -> Dict[str, Question]:
+        """
+        按ID取题目，只解码用到的题目；返回新建的 Question 对象，调用方可以随意修改
+        返回: {题目ID: 题目}，不存在的ID不出现在结果中
+        """
+
+
+class MaterializedBankView(BankView):
+    """基于已加载题库对象的视图"""
+    
+    def __init__(self, bank: QuestionBank, signature: tuple, nbytes: int = 0):
+        super().__init__({k: getattr(bank, k) for k in BANK_HEADER_FIELDS}, signature, nbytes)
+        self.bank = bank
+    
+    def select(self, types=None, chapters=None, offset=0, limit=None):
+        questions = self.bank.query_questions(
+            types=list(types) if types is not None else None,
+            chapters=list(chapters) if chapters is not None else None
+        )
+        end = None if limit is None else offset + limit
+        return [q.to_dict() for q in questions[offset:end]], len(questions)
+    
+    def get_questions(self, question_ids):
+        result = {}
+        for qid in question_ids:
+            question = self.bank.get_question(qid)
+            if question is not None and qid not in result:
+                result[qid] = Question.from_dict(question.to_dict())
+        return result
+
+
+class BankStorage(ABC):
+    """
+    题库存储接口
+    signature 为题库当前版本标识，内容变化时必然改变，用于校验内存缓存
+    """
+    
+    @abstractmethod
+    def exists(self, bank_id: str) -> bool:
+        """题库是否存在"""
+    
+    @abstractmethod
+    def signature(self, bank_id: str) -> Optional[tuple]:
+        """题库版本标识，不存在时返回 None"""
+    
+    @abstractmethod
+    def load(self, bank_id: str) -> Optional[Tuple[QuestionBank, tuple, int]]:
+        """
+        加载题库
+        返回: (题库对象, 版本标识, 数据字节数)，不存在时返回 None
+        """
+    
+    @abstractmethod
+    def save(self, bank: QuestionBank):
+        """整体保存题库"""
+    
+    @abstractmethod
+    def append(self, bank: QuestionBank, records: List[Dict]) -> Tuple[tuple, int, bool]:
+        """
+        保存单题增量修改，记录格式：
+        {'op': 'add'|'update', 'question': {...}} 或 {'op': 'delete', 'question_id': ...}
+        返回: (新版本标识, 数据字节数, 是否需要合并)
+        """
+    
+    @abstractmethod
+    def delete(self, bank_id: str):
+        """删除题库"""
+    
+    @abstractmethod
+    def write_lock(self, bank_id: str):
+        """
+        题库写锁（上下文管理器），对其他进程同样有效
+        “校验版本-加载-修改-写入”期间持有，避免基于其他进程已过期的内存对象写入
+        """
+    
+    def open_view(self, bank_id: str) -> Optional[BankView]:
+        """打开题库只读视图（默认整体加载后包装，存储后端可提供按需解析的实现）"""
+        loaded = self.load(bank_id)
+        if loaded is None:
+            return None
+        bank, signature, nbytes = loaded
+        return MaterializedBankView(bank, signature, nbytes)
+    
+    # ============ 增量合并（只有追加日志型存储需要） ============
+    
+    def pending_bytes(self, bank_id: str) -> int:
+        """尚未合并进快照的增量数据字节数"""
+        return 0
+    
+    def snapshot_signature(self, bank_id: str) -> Optional[tuple]:
+        """快照本身的版本标识（不含之后追加的增量），用于判断合并期间快照是否被整体重写"""
+        return self.signature(bank_id)
+    
+    def encode_snapshot(self, data: Dict) -> Any:
+        """序列化题库快照（在题库锁外调用）"""
+        return None
+    
+    def write_snapshot(self, bank_id: str, payload: Any, upto: int) -> Tuple[tuple, int]:
+        """
+        写入快照并丢弃前 upto 字节的增量数据
+        返回: (新版本标识, 数据字节数)
+        """
+        raise NotImplementedError
+    
+    # ============ 题库元数据 {bank_id: {...}} ============
+    
+    @abstractmethod
+    def meta_lock(self, write: bool = False):
+        """元数据锁（上下文管理器），读-改-写期间持有写锁，对其他线程和进程同样有效"""
+    
+    @abstractmethod
+    def meta_stamp(self) -> Optional[tuple]:
+        """元数据版本标识（开销很小，用于判断是否需要重新读取）"""
+    
+    @abstractmethod
+    def read_meta(self) -> Dict:
+        """读取元数据（调用方需持有元数据锁）"""
+    
+    @abstractmethod
+    def write_meta(self, meta: Dict):
+        """写入元数据（调用方需持有元数据写锁）"""
+
+
+class DocumentStorage(ABC):
+    """
+    文档存储接口（试卷、答题结果，每个文档是一个 dict）
+    summarizer 不为空时存储维护文档摘要，summaries / find 只读摘要，不解析每个文档
+    """
+    
+    summarizer: Optional[Callable[[Dict], Dict]] = None
+    
+    @abstractmethod
+    def get(self, doc_id: str) -> Optional[Dict]:
+        """读取文档，不存在时返回 None"""
+    
+    @abstractmethod
+    def put(self, doc_id: str, data: Dict):
+        """写入文档（整体覆盖）"""
+    
+    def put_many(self, docs: Dict[str, Dict]):
+        """批量写入文档 {doc_id: 文档}（默认逐个写入，存储后端可合并为一次批量写入）"""
+        for doc_id, data in docs.items():
+            self.put(doc_id, data)
+    
+    @abstractmethod
+    def delete(self, doc_id: str) -> bool:
+        """删除文档（连同增量日志）"""
+    
+    @abstractmethod
+    def iter_all(self) -> Iterator[Dict]:
+        """遍历全部文档（无法解析的文档跳过）"""
+    
+    @abstractmethod
+    def update(self, doc_id: str, func: Callable[[Dict], Optional[Dict]]) -> Optional[Dict]:
+        """
+        读-改-写单个文档，期间与其他线程和进程互斥
+        func 收到当前文档，返回要写入的新文档；返回 None 表示不写入
+        返回: 写入后的文档（未写入时为读到的文档），文档不存在时返回 None
+        """
+    
+    def find(self, **fields) -> Iterator[Dict]:
+        """按字段值筛选文档"""
+        for data in self.iter_all():
+            if all(data.get(k) == v for k, v in fields.items()):
+                yield data
+    
+    def summaries(self) -> List[Dict]:
+        """全部文档的摘要（默认逐个读取文档后生成，存储后端可维护摘要索引）"""
+        summarize = self.summarizer or (lambda data: data)
+        return [summarize(data) for data in self.iter_all()]
+    
+    # ============ 增量日志（逐条追加对文档的小修改，之后合并进文档） ============
+    # 默认不支持：append_journal 返回 False，调用方改为读-改-写整个文档
+    
+    def open_journal(self, doc_id: str):
+        """为文档创建空的增量日志，之后 append_journal 才会成功"""
+    
+    def append_journal(self, doc_id: str, records: List[Dict]) -> bool:
+        """
+        追加增量记录（与 compact 互斥，不需要读取文档）
+        返回: 是否已追加；日志未创建或已被关闭时返回 False
+        """
+        return False
+    
+    def read_journal(self, doc_id: str) -> List[Dict]:
+        """读取尚未合并的增量记录（按追加顺序）"""
+        return []
+    
+    def compact(self, doc_id: str, func: Callable[[Dict, List[Dict]], Optional[Dict]],
+                close: bool = False) -> Optional[Dict]:
+        """
+        读-改-写文档并合并增量日志，期间与其他线程和进程的追加、修改互斥
+        func 收到当前文档和未合并的记录，返回合入记录后的新文档；返回 None 表示不写入（日志保持不变）
+        写入后日志清空（没有日志时创建）；close 为 True 时删除日志，之后的追加返回 False
+        返回: 同 update
+        """
+        return self.update(doc_id, lambda data: func(data, []))
+
+
+class BlobStorage(ABC):
+    """单个 JSON 对象的存储（收藏夹）"""
+    
+    @abstractmethod
+    def load(self) -> Optional[Dict]:
+        """读取数据，不存在时返回 None"""
+    
+    @abstractmethod
+    def save(self, data: Dict):
+        """保存数据"""
+
+
+class Storage:
+    """一组存储对象（snapshots 为试卷题目快照，文档ID与试卷ID相同）"""
+    
+    def __init__(self, name: str, banks: BankStorage, papers: DocumentStorage,
+                 results: DocumentStorage, favorites: BlobStorage, snapshots: DocumentStorage):
+        self.name = name
+        self.banks = banks
+        self.papers = papers
+        self.results = results
+        self.favorites = favorites
+        self.snapshots = snapshots
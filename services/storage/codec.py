@@ -0,0 +1,168 @@
+"""
+JSON 存储的数据文件编码
+- json: 缩进格式的 JSON 文本（默认，便于人工查看和编辑）
+- binary: 带魔数和版本号的二进制容器，内容为 msgpack（已安装时）或紧凑 JSON，可选 zlib 压缩
+读取时按文件开头的魔数自动识别，新旧两种格式的文件可以同时存在
+"""
+import json
+import struct
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+# 使用高性能 JSON 库（比标准库快 10-50 倍）
+try:
+    import orjson
+    def json_loads(s): return orjson.loads(s)
+    def json_dumps_pretty(obj) -> bytes: return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    def json_dumps_compact(obj) -> bytes: return orjson.dumps(obj)
+except ImportError:
+    def json_loads(s): return json.loads(s)
+    def json_dumps_pretty(obj) -> bytes: return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+    def json_dumps_compact(obj) -> bytes: return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+# msgpack 为可选依赖
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from config import config as app_config
+
+
+FORMATS = ("json", "binary")
+
+# 文件头：魔数（首字节非 ASCII，不会与 JSON 文本混淆）、格式版本、内容编码、标志位
+MAGIC = b"\x89ASD"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBBH")
+
+CODEC_JSON = 0
+CODEC_MSGPACK = 1
+
+FLAG_ZLIB = 0x0001
+ZLIB_LEVEL = 3
+
+
+def is_binary(raw: bytes) -> bool:
+    """是否为二进制容器格式"""
+    return raw[:len(MAGIC)] == MAGIC
+
+
+def encode(obj: Any, fmt: Optional[str] = None, compress: Optional[bool] = None) -> bytes:
+    """
+    按配置（PathConfig.data_format / data_compression）编码
+    fmt、compress 不为 None 时覆盖配置
+    """
+    path_config = app_config.path_config
+    fmt = fmt or path_config.data_format or "json"
+    if fmt == "json":
+        return json_dumps_pretty(obj)
+    if fmt != "binary":
+        raise ValueError(f"不支持的数据格式: {fmt}")
+    
+    if msgpack is not None:
+        codec, payload = CODEC_MSGPACK, msgpack.packb(obj, use_bin_type=True)
+    else:
+        codec, payload = CODEC_JSON, json_dumps_compact(obj)
+    
+    flags = 0
+    if path_config.data_compression if compress is None else compress:
+        flags |= FLAG_ZLIB
+        payload = zlib.compress(payload, ZLIB_LEVEL)
+    return HEADER.pack(MAGIC, FORMAT_VERSION, codec, flags) + payload
+
+
+def _bank_parts(data: Dict, placeholder: bytes, dumps) -> Tuple[bytes, bytes]:
+    """把题目列表替换为空列表后编码题库，返回题目列表前后的两段"""
+    encoded = dumps({k: ([] if k == 'questions' else v) for k, v in data.items()})
+    marker = encoded.index(placeholder) + len(placeholder) - 2
+    return encoded[:marker], encoded[marker + 2:]
+
+
+def encode_bank(data: Dict, fmt: Optional[str] = None,
+                compress: Optional[bool] = None) -> Tuple[bytes, Optional[List[Tuple[int, int]]], str]:
+    """
+    编码题库快照，逐题编码后拼接，同时得到每道题在文件中的字节区间，可单独解码（用于偏移索引）
+    输出与 encode 的结果相同；压缩后无法按区间读取，区间为 None
+    返回: (文件内容, 题目字节区间, 单题编码 json/msgpack)
+    """
+    path_config = app_config.path_config
+    fmt = fmt or path_config.data_format or "json"
+    compress = path_config.data_compression if compress is None else compress
+    if fmt == "binary" and compress:
+        return encode(data, fmt, compress), None, "json"
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的数据格式: {fmt}")
+    
+    questions = data.get('questions') or []
+    if fmt == "json":
+        # 单题缩进后与整体缩进编码的结果一致（JSON 字符串内不含原始换行）
+        prefix, suffix = _bank_parts(data, b'\n  "questions": []', json_dumps_pretty)
+        pieces = [json_dumps_pretty(q).replace(b"\n", b"\n    ") for q in questions]
+        opening, separator, closing = b"[\n    ", b",\n    ", b"\n  ]"
+        codec = "json"
+    elif msgpack is not None:
+        packer = msgpack.Packer(use_bin_type=True)
+        keys = list(data)
+        split = keys.index('questions')
+        prefix = (HEADER.pack(MAGIC, FORMAT_VERSION, CODEC_MSGPACK, 0) + packer.pack_map_header(len(keys))
+                  + b"".join(packer.pack(k) + packer.pack(data[k]) for k in keys[:split]) + packer.pack('questions'))
+        suffix = b"".join(packer.pack(k) + packer.pack(data[k]) for k in keys[split + 1:])
+        pieces = [packer.pack(q) for q in questions]
+        opening, separator, closing = packer.pack_array_header(len(pieces)), b"", b""
+        codec = "msgpack"
+    else:
+        prefix, suffix = _bank_parts(data, b'"questions":[]', json_dumps_compact)
+        prefix = HEADER.pack(MAGIC, FORMAT_VERSION, CODEC_JSON, 0) + prefix
+        opening, separator, closing = b"[", b",", b"]"
+        pieces = [json_dumps_compact(q) for q in questions]
+        codec = "json"
+    
+    if not pieces and fmt != "binary":
+        return prefix + b"[]" + suffix, [], codec
+    
+    spans = []
+    offset = len(prefix) + len(opening)
+    for piece in pieces:
+        spans.append((offset, offset + len(piece)))
+        offset += len(piece) + len(separator)
+    return prefix + opening + separator.join(pieces) + closing + suffix, spans, codec
+
+
+def decode(raw: bytes) -> Any:
+    """解码数据文件内容，自动识别 JSON 文本与二进制容器"""
+    if not is_binary(raw):
+        return json_loads(raw)
+    
+    if len(raw) < HEADER.size:
+        raise ValueError("数据文件头不完整")
+    _, version, codec, flags = HEADER.unpack_from(raw)
+    if version > FORMAT_VERSION:
+        raise ValueError(f"数据文件格式版本 {version} 高于当前程序支持的版本 {FORMAT_VERSION}，请升级程序")
+    
+    payload = memoryview(raw)[HEADER.size:]
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+    
+    if codec == CODEC_JSON:
+        return json_loads(bytes(payload))
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise ValueError("数据文件为 msgpack 编码，需要安装 msgpack")
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    raise ValueError(f"未知的数据编码: {codec}")
+
+
+def record_decoder(codec: str):
+    """单题编码对应的解码函数"""
+    if codec == "msgpack":
+        if msgpack is None:
+            raise ValueError("数据文件为 msgpack 编码，需要安装 msgpack")
+        return lambda raw: msgpack.unpackb(raw, raw=False, strict_map_key=False)
+    return json_loads
+
+
+def read_file(path) -> Any:
+    """读取并解码数据文件"""
+    with open(path, 'rb') as f:
+        return decode(f.read())
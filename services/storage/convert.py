@@ -0,0 +1,99 @@
+"""
+转换 JSON 存储的数据文件格式
+
+用法:
+    python -m services.storage.convert {json|binary} [--compress]
+
+把题库快照、题库元数据、试卷、答题结果、收藏文件统一改写为指定格式，并把该格式写入配置；
+题库快照的偏移索引随之重建，题库修改日志保持不变。建议在程序未运行时执行
+"""
+import sys
+from pathlib import Path
+from typing import Dict, Iterable
+
+from config import config as app_config
+from utils.atomic_io import atomic_write
+from .codec import FORMATS, encode, decode
+from .json_storage import (
+    JsonBankStorage, get_banks_dir, get_papers_dir, get_results_dir, get_favorites_file
+)
+
+
+def _convert_files(paths: Iterable[Path], fmt: str, compress: bool) -> int:
+    """逐个改写文件，已是目标编码的文件跳过；返回改写的文件数"""
+    count = 0
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                raw = f.read()
+            payload = encode(decode(raw), fmt, compress)
+        except Exception as e:
+            print(f"跳过无法解析的文件 {path}: {e}")
+            continue
+        if payload != raw:
+            atomic_write(path, payload)
+            count += 1
+    return count
+
+
+def _convert_banks(banks: JsonBankStorage, fmt: str, compress: bool) -> int:
+    """改写题库快照并重建偏移索引；返回改写的文件数"""
+    count = 0
+    for path in get_banks_dir().glob("bank_*.json"):
+        bank_id = path.stem[len("bank_"):]
+        try:
+            with open(path, 'rb') as f:
+                raw = f.read()
+            encoded = banks.encode_snapshot(decode(raw))
+        except Exception as e:
+            print(f"跳过无法解析的文件 {path}: {e}")
+            continue
+        # 内容未变但缺少索引时也重写，一并生成索引
+        if encoded[0] != raw or (encoded[1] is not None and not banks._get_bank_index(bank_id).exists()):
+            banks._write_snapshot_files(bank_id, encoded)
+            count += 1
+    return count
+
+
+def convert_json_storage(fmt: str, compress: bool = False) -> Dict[str, int]:
+    """
+    把 JSON 存储下的数据文件转换为指定格式，并更新配置使新写入的文件使用该格式
+    返回: 各类数据改写的文件数
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的数据格式: {fmt}")
+    
+    # 先切换配置，转换期间写入的文件也使用新格式
+    app_config.path_config.data_format = fmt
+    app_config.path_config.data_compression = compress
+    app_config.save()
+    
+    banks = JsonBankStorage()
+    counts = {}
+    with banks.meta_lock(write=True):
+        counts['meta'] = _convert_files([banks.meta_file] if banks.meta_file.exists() else [], fmt, compress)
+    counts['banks'] = _convert_banks(banks, fmt, compress)
+    counts['papers'] = _convert_files(get_papers_dir().glob("paper_*.json"), fmt, compress)
+    counts['results'] = _convert_files(get_results_dir().glob("result_*.json"), fmt, compress)
+    counts['snapshots'] = _convert_files(get_papers_dir().glob("snapshot_*.json"), fmt, compress)
+    favorites = get_favorites_file()
+    counts['favorites'] = _convert_files([favorites] if favorites.exists() else [], fmt, compress)
+    return counts
+
+
+def main(argv=None):
+    args = list(sys.argv[1:] if argv is None else argv)
+    compress = '--compress' in args
+    args = [a for a in args if a != '--compress']
+    if len(args) != 1 or args[0] not in FORMATS:
+        print(__doc__)
+        sys.exit(2)
+    
+    counts = convert_json_storage(args[0], compress)
+    print(f"已转换为 {args[0]}{'（zlib 压缩）' if compress else ''} 格式")
+    print(f"  题库 {counts['banks']} 个，元数据 {counts['meta']} 个，试卷 {counts['papers']} 份，"
+          f"成绩 {counts['results']} 条，试卷快照 {counts['snapshots']} 份，收藏 {counts['favorites']} 个文件")
+
+
+if __name__ == "__main__":
+    main()
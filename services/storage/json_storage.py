@@ -0,0 +1,794 @@
+"""
+JSON 文件存储
+每个题库一个 bank_<id>.json 快照 + bank_<id>.log 修改日志，元数据记录在 banks_meta.json；
+试卷、答题结果各自一个文件，收藏记录在 favorites.json
+文件格式（缩进 JSON 或二进制）见 codec.py，读取时自动识别
+"""
+import os
+import re
+import sys
+import copy
+import json
+import mmap
+import threading
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# 使用高性能 JSON 库（比标准库快 10-50 倍）
+try:
+    import orjson
+    def json_loads(s): return orjson.loads(s)
+except ImportError:
+    def json_loads(s): return json.loads(s)
+
+from config import BANKS_DIR, PAPERS_DIR, RESULTS_DIR, DATA_DIR, APP_ROOT, config as app_config
+from models import QuestionBank, Question
+from utils.journal import AppendLog
+from utils.atomic_io import atomic_write, atomic_write_many
+from utils.file_lock import get_file_lock
+from .base import (BankStorage, BankView, DocumentStorage, BlobStorage, Storage,
+                   summarize_paper, summarize_result)
+from .codec import encode, encode_bank, decode, is_binary, read_file, record_decoder
+
+
+def get_banks_dir() -> Path:
+    """获取题库存储目录（动态读取配置）"""
+    custom_dir = app_config.path_config.banks_dir
+    if custom_dir:
+        try:
+            path = Path(custom_dir)
+            # 确保是绝对路径
+            if not path.is_absolute():
+                path = APP_ROOT / path
+            
+            path.mkdir(parents=True, exist_ok=True)
+            return path
+        except Exception as e:
+            print(f"使用自定义题库目录失败: {e}，将使用默认目录")
+            return BANKS_DIR
+    return BANKS_DIR
+
+
+def get_papers_dir() -> Path:
+    """获取试卷存储目录（动态读取配置）"""
+    custom_dir = app_config.path_config.papers_dir
+    if custom_dir:
+        path = Path(custom_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+    return PAPERS_DIR
+
+
+def get_results_dir() -> Path:
+    """获取成绩存储目录（动态读取配置）"""
+    custom_dir = app_config.path_config.results_dir
+    if custom_dir:
+        path = Path(custom_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+    return RESULTS_DIR
+
+
+def get_favorites_file() -> Path:
+    """获取收藏文件路径（动态读取配置）"""
+    custom_file = app_config.path_config.favorites_file
+    if custom_file:
+        # 确保目录存在
+        dir_path = os.path.dirname(custom_file)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        return Path(custom_file)
+    return DATA_DIR / "favorites.json"
+
+
+# 缩进格式快照中的题目数组：每道题从 4 空格缩进的 "{" 行开始，到 "}" 或 "}," 行结束，字段位于 6 空格缩进
+# （以换行符开头的字面量前缀匹配，比多行模式的 ^ 快一个数量级）
+_QUESTIONS_START = b'\n  "questions": ['
+_QUESTIONS_END = b'\n  ]'
+_ITEM_START = re.compile(rb'\n    \{\r?\n')
+_ITEM_END = re.compile(rb'\n    \},?\r?(?=\n)')
+_ITEM_ID = re.compile(rb'\n      "id": ([^\r\n]*)')
+_ITEM_TYPE = re.compile(rb'\n      "type": ([^\r\n]*)')
+_ITEM_CHAPTER = re.compile(rb'\n      "chapter": ([^\r\n]*)')
+
+# 视图中每道题额外占用内存的估算字节数（偏移、ID、题型、章节引用）
+_VIEW_ENTRY_BYTES = 128
+
+# 偏移索引文件格式版本
+INDEX_VERSION = 1
+
+
+def _file_stamp(st: os.stat_result) -> List[int]:
+    """快照文件标识：(inode, 大小, 修改时间)，偏移索引据此判断是否与快照对应"""
+    return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+def build_bank_index(data: Dict, spans: List[Tuple[int, int]], codec: str) -> Dict:
+    """
+    由快照数据和每道题的字节区间生成偏移索引（写入快照后再补上快照文件标识）
+    题型、章节按取值编码，便于不解析题目直接筛选
+    """
+    questions = data.get('questions') or []
+    type_codes: Dict[str, int] = {}
+    chapter_codes: Dict[str, int] = {}
+    types = [type_codes.setdefault(q.get('type'), len(type_codes)) for q in questions]
+    chapters = [chapter_codes.setdefault(q.get('chapter') or "", len(chapter_codes)) for q in questions]
+    return {
+        'version': INDEX_VERSION,
+        'snapshot': None,
+        'codec': codec,
+        'header': {k: v for k, v in data.items() if k != 'questions'},
+        'ids': [q.get('id') for q in questions],
+        'offsets': [offset for span in spans for offset in span],
+        'types': types,
+        'type_names': list(type_codes),
+        'chapters': chapters,
+        'chapter_names': list(chapter_codes)
+    }
+
+
+class JsonBankView(BankView):
+    """
+    JSON 存储的按需解析视图
+    快照可以是内存中的字节或只读内存映射（多个进程共享操作系统页缓存）；
+    有偏移索引时直接按索引定位每道题，否则扫描缩进格式的快照建立偏移和筛选字段（ID、题型、章节），
+    select / get_questions 时才解码用到的题目；修改日志中的题目直接以字典形式叠加，顺序语义与重放日志相同
+    既无索引又无法扫描（如压缩的二进制快照）时退化为解码出全部题目字典，但仍不创建 Question 对象
+    """
+    
+    def __init__(self, raw: Union[bytes, mmap.mmap], records: List[Dict], signature: tuple,
+                 index: Optional[Dict] = None):
+        self._raw = raw
+        # 题目条目：int 为快照中的题目序号，dict 为已解析的题目
+        self._entries: List[Union[int, Dict]] = []
+        self._spans: List[Tuple[int, int]] = []
+        self._types: List[str] = []
+        self._chapters: List[str] = []
+        # 快照中题目的ID（扫描得到的是 JSON 原始字节，用到时再解码）
+        self._ids: List[Union[str, bytes]] = []
+        self._decode_record = json_loads
+        self._positions: Optional[Dict[str, int]] = None
+        
+        if index is not None:
+            header = self._load_index(index)
+        elif is_binary(raw):
+            header = None
+        else:
+            header = self._index(raw)
+        if header is None:
+            data = decode(raw[:] if isinstance(raw, mmap.mmap) else raw)
+            self._raw = b""
+            self._entries = data.pop('questions', None) or []
+            header = data
+        
+        self._overlay(header, records)
+        resident = 0 if isinstance(self._raw, mmap.mmap) else len(self._raw)
+        super().__init__(header, signature, resident + _VIEW_ENTRY_BYTES * len(self._entries))
+    
+    def _load_index(self, index: Dict) -> Dict:
+        """使用偏移索引，返回题库头信息"""
+        type_names = [sys.intern(t) if t else "" for t in index['type_names']]
+        chapter_names = [sys.intern(c) if c else "" for c in index['chapter_names']]
+        offsets = index['offsets']
+        self._spans = list(zip(offsets[0::2], offsets[1::2]))
+        self._types = [type_names[c] for c in index['types']]
+        self._chapters = [chapter_names[c] for c in index['chapters']]
+        self._ids = index['ids']
+        self._entries = list(range(len(self._ids)))
+        self._decode_record = record_decoder(index['codec'])
+        return dict(index['header'])
+    
+    def _index(self, raw: Union[bytes, mmap.mmap]) -> Optional[Dict]:
+        """扫描缩进格式的快照建立题目偏移，返回题库头信息；格式不符时返回 None"""
+        start = raw.find(_QUESTIONS_START)
+        if start < 0:
+            return None
+        lo = start + len(_QUESTIONS_START)
+        if raw[lo:lo + 1] == b"]":
+            # 空题目列表
+            return json_loads(raw[:])
+        # 题目内容的缩进都不少于 4 空格，其后第一个 2 空格缩进的 "]" 即数组结尾
+        hi = raw.find(_QUESTIONS_END, lo)
+        if hi < 0:
+            return None
+        
+        starts = [m.start() + 1 for m in _ITEM_START.finditer(raw, lo, hi)]
+        ends = [m.start() + 6 for m in _ITEM_END.finditer(raw, lo, hi + 1)]
+        if len(starts) != len(ends) or any(s > e for s, e in zip(starts, ends)) \
+                or any(e > s for e, s in zip(ends, starts[1:])):
+            return None
+        
+        # 每道题恰好有一行 id / type / chapter 字段，数量一致即与题目一一对应
+        fields = []
+        for pattern in (_ITEM_ID, _ITEM_TYPE, _ITEM_CHAPTER):
+            values = [m.group(1).rstrip(b",") for m in pattern.finditer(raw, lo, hi)]
+            if len(values) != len(starts):
+                return None
+            fields.append(values)
+        
+        # 题型、章节取值很少，相同的原始字节只解码一次
+        decoded: Dict[bytes, str] = {}
+        def decode(value: bytes) -> str:
+            text = decoded.get(value)
+            if text is None:
+                text = decoded[value] = sys.intern(json_loads(value) or "")
+            return text
+        
+        try:
+            types = [decode(v) for v in fields[1]]
+            chapters = [decode(v) for v in fields[2]]
+        except ValueError:
+            return None
+        
+        header = json_loads(raw[:start] + _QUESTIONS_START + b"]" + raw[hi + len(_QUESTIONS_END):])
+        self._spans = list(zip(starts, ends))
+        self._types = types
+        self._chapters = chapters
+        self._entries = list(range(len(starts)))
+        self._ids = fields[0]
+        return header
+    
+    def _snapshot_ids(self) -> List[str]:
+        """快照中题目的ID列表"""
+        ids = self._ids
+        if ids and ids[0].__class__ is bytes:
+            ids = self._ids = [json_loads(qid) for qid in ids]
+        return ids
+    
+    def _entry_id(self, entry: Union[int, Dict]) -> str:
+        return self._ids[entry] if isinstance(entry, int) else entry.get('id')
+    
+    def _overlay(self, header: Dict, records: List[Dict]):
+        """叠加修改日志"""
+        header.pop('questions', None)
+        if not records:
+            return
+        
+        entries = self._entries
+        if self._spans:
+            positions = {qid: i for i, qid in enumerate(self._snapshot_ids())}
+        else:
+            positions = {q.get('id'): i for i, q in enumerate(entries)}
+        deleted = False
+        
+        for record in records:
+            op = record.get('op')
+            if op in ('add', 'update'):
+                question = record['question']
+                pos = positions.get(question.get('id'))
+                if pos is None:
+                    positions[question.get('id')] = len(entries)
+                    entries.append(question)
+                else:
+                    entries[pos] = question
+            elif op == 'delete':
+                pos = positions.pop(record.get('question_id'), None)
+                if pos is not None:
+                    entries[pos] = None
+                    deleted = True
+            
+            if record.get('updated_at'):
+                header['updated_at'] = record['updated_at']
+        
+        if deleted:
+            self._entries = [e for e in entries if e is not None]
+    
+    def _facets(self, entry: Union[int, Dict]) -> Tuple[str, str]:
+        if isinstance(entry, int):
+            return self._types[entry], self._chapters[entry]
+        return entry.get('type'), entry.get('chapter') or ""
+    
+    def _question(self, entry: Union[int, Dict]) -> Question:
+        """解码题目（已解析的题目字典被视图共享，复制后再构造，避免调用方修改影响视图）"""
+        if isinstance(entry, int):
+            start, end = self._spans[entry]
+            return Question.from_dict(self._decode_record(self._raw[start:end]))
+        return Question.from_dict(copy.deepcopy(entry))
+    
+    def _materialize(self, entry: Union[int, Dict]) -> Dict:
+        # 经模型规整，补齐旧数据缺失的字段
+        return self._question(entry).to_dict()
+    
+    def get_questions(self, question_ids: Iterable[str]) -> Dict[str, Question]:
+        positions = self._positions
+        if positions is None:
+            self._snapshot_ids()
+            positions = self._positions = {self._entry_id(e): i for i, e in enumerate(self._entries)}
+        result = {}
+        for qid in question_ids:
+            pos = positions.get(qid)
+            if pos is not None and qid not in result:
+                result[qid] = self._question(self._entries[pos])
+        return result
+    
+    def select(self, types=None, chapters=None, offset=0, limit=None):
+        if types is None and chapters is None:
+            matched = self._entries
+        else:
+            type_set = set(types) if types is not None else None
+            chapter_set = set(chapters) if chapters is not None else None
+            matched = []
+            for entry in self._entries:
+                q_type, q_chapter = self._facets(entry)
+                if type_set is not None and q_type not in type_set:
+                    continue
+                if chapter_set is not None and q_chapter not in chapter_set:
+                    continue
+                matched.append(entry)
+        
+        end = None if limit is None else offset + limit
+        return [self._materialize(e) for e in matched[offset:end]], len(matched)
+
+
+class JsonBankStorage(BankStorage):
+    """题库 JSON 快照 + 追加日志存储"""
+    
+    # 日志超过该大小且超过快照一半大小时需要合并
+    LOG_COMPACT_MIN_BYTES = 256 * 1024
+    
+    def __init__(self, meta_file: Path = None):
+        self.meta_file = Path(meta_file or DATA_DIR / "banks_meta.json")
+        self._meta_lock = get_file_lock(self.meta_file)
+    
+    def _get_bank_file(self, bank_id: str) -> Path:
+        """获取题库文件路径"""
+        return get_banks_dir() / f"bank_{bank_id}.json"
+    
+    def _get_bank_log(self, bank_id: str) -> AppendLog:
+        """获取题库修改日志（与快照文件同目录）"""
+        return AppendLog(get_banks_dir() / f"bank_{bank_id}.log")
+    
+    def _get_bank_index(self, bank_id: str) -> Path:
+        """获取题库偏移索引文件路径（与快照文件同目录）"""
+        return get_banks_dir() / f"bank_{bank_id}.idx"
+    
+    def exists(self, bank_id: str) -> bool:
+        return self._get_bank_file(bank_id).exists()
+    
+    def signature(self, bank_id: str) -> Optional[tuple]:
+        """(快照修改时间, 日志大小)"""
+        try:
+            mtime = os.path.getmtime(self._get_bank_file(bank_id))
+        except FileNotFoundError:
+            return None
+        return (mtime, self._get_bank_log(bank_id).size())
+    
+    def load(self, bank_id: str) -> Optional[Tuple[QuestionBank, tuple, int]]:
+        """加载快照并重放修改日志"""
+        signature = self.signature(bank_id)
+        if signature is None:
+            return None
+        with open(self._get_bank_file(bank_id), 'rb') as f:
+            raw = f.read()
+        bank = QuestionBank.from_dict(decode(raw))
+        self._replay_log(bank, self._get_bank_log(bank_id).read())
+        return bank, signature, len(raw) + signature[1]
+    
+    def open_view(self, bank_id: str) -> Optional[JsonBankView]:
+        """
+        按需解析的题库视图，不为每道题创建 Question 对象
+        快照以只读内存映射打开（见 _map_snapshot），偏移索引与快照对应时直接使用
+        """
+        try:
+            f = open(self._get_bank_file(bank_id), 'rb')
+        except FileNotFoundError:
+            return None
+        with f:
+            st = os.fstat(f.fileno())
+            raw = self._map_snapshot(f, st.st_size)
+        # 先取日志大小，只读到该位置：之后其他进程追加的记录不会进入视图而不反映在版本标识中
+        log = self._get_bank_log(bank_id)
+        size = log.size()
+        records = log.read(end=size)
+        signature = (st.st_mtime, size)
+        return JsonBankView(raw, records, signature, self._read_index(bank_id, st, raw))
+    
+    @staticmethod
+    def _map_snapshot(f, size: int):
+        """
+        只读映射快照文件，多个进程打开同一题库时共享操作系统页缓存
+        Windows 下映射中的文件无法被替换（快照写入会失败），改为读入内存
+        """
+        if size and sys.platform != 'win32' and app_config.app_config.bank_mmap:
+            try:
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                pass
+        return f.read()
+    
+    def _read_index(self, bank_id: str, st: os.stat_result, raw) -> Optional[Dict]:
+        """读取与快照对应的偏移索引，不存在、版本不符或已过期时返回 None"""
+        try:
+            index = read_file(self._get_bank_index(bank_id))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"题库偏移索引损坏，将重新扫描快照: {e}")
+            return None
+        if index.get('version') != INDEX_VERSION or index.get('snapshot') != _file_stamp(st):
+            return None
+        offsets = index['offsets']
+        if offsets and offsets[-1] > len(raw):
+            return None
+        return index
+    
+    def _replay_log(self, bank: QuestionBank, records: List[Dict]):
+        """
+        重放修改日志
+        每条记录只决定对应题目的最终状态，重复重放同一段日志结果不变
+        """
+        if not records:
+            return
+        
+        questions: List[Optional[Question]] = list(bank.questions)
+        positions = {q.id: i for i, q in enumerate(questions)}
+        
+        for record in records:
+            op = record.get('op')
+            if op in ('add', 'update'):
+                question = Question.from_dict(record['question'])
+                pos = positions.get(question.id)
+                if pos is None:
+                    positions[question.id] = len(questions)
+                    questions.append(question)
+                else:
+                    questions[pos] = question
+            elif op == 'delete':
+                pos = positions.pop(record.get('question_id'), None)
+                if pos is not None:
+                    questions[pos] = None
+            
+            if record.get('updated_at'):
+                bank.updated_at = record['updated_at']
+        
+        bank.questions = [q for q in questions if q is not None]
+    
+    def save(self, bank: QuestionBank):
+        """完整重写快照（及偏移索引），并清空修改日志"""
+        self._write_snapshot_files(bank.id, self.encode_snapshot(bank.to_dict()))
+        self._get_bank_log(bank.id).clear()
+    
+    def _write_snapshot_files(self, bank_id: str, encoded: Tuple[bytes, Optional[Dict]]):
+        """
+        先写快照再写偏移索引（索引记录快照文件标识）
+        两次写入之间崩溃或被其他进程读到时，索引与快照标识不符，读取方会忽略索引
+        """
+        payload, index = encoded
+        bank_file = self._get_bank_file(bank_id)
+        index_file = self._get_bank_index(bank_id)
+        atomic_write(bank_file, payload)
+        if index is None:
+            # 压缩格式无法按偏移读取
+            if index_file.exists():
+                index_file.unlink()
+            return
+        index['snapshot'] = _file_stamp(os.stat(bank_file))
+        atomic_write(index_file, encode(index, "binary", False))
+    
+    def append(self, bank: QuestionBank, records: List[Dict]) -> Tuple[tuple, int, bool]:
+        """追加修改记录，只写入变更的题目而不重写整个题库"""
+        log_size = self._get_bank_log(bank.id).append(records)
+        st = os.stat(self._get_bank_file(bank.id))
+        need_compact = log_size >= max(self.LOG_COMPACT_MIN_BYTES, st.st_size // 2)
+        return (st.st_mtime, log_size), st.st_size + log_size, need_compact
+    
+    def delete(self, bank_id: str):
+        for file_path in (self._get_bank_file(bank_id), self._get_bank_index(bank_id)):
+            if file_path.exists():
+                file_path.unlink()
+        self._get_bank_log(bank_id).clear()
+    
+    def write_lock(self, bank_id: str):
+        """快照文件旁路的进程级文件锁"""
+        return get_file_lock(self._get_bank_file(bank_id)).write()
+    
+    def pending_bytes(self, bank_id: str) -> int:
+        return self._get_bank_log(bank_id).size()
+    
+    def snapshot_signature(self, bank_id: str) -> Optional[tuple]:
+        """(快照 inode, 修改时间)"""
+        try:
+            st = os.stat(self._get_bank_file(bank_id))
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns)
+    
+    def encode_snapshot(self, data: Dict) -> Tuple[bytes, Optional[Dict]]:
+        """返回: (快照内容, 偏移索引)"""
+        payload, spans, codec = encode_bank(data)
+        return payload, (build_bank_index(data, spans, codec) if spans is not None else None)
+    
+    def write_snapshot(self, bank_id: str, encoded: Tuple[bytes, Optional[Dict]], upto: int) -> Tuple[tuple, int]:
+        self._write_snapshot_files(bank_id, encoded)
+        self._get_bank_log(bank_id).trim(upto)
+        signature = self.signature(bank_id)
+        return signature, len(encoded[0]) + signature[1]
+    
+    # ============ 元数据 ============
+    
+    def meta_lock(self, write: bool = False):
+        return self._meta_lock.write() if write else self._meta_lock.read()
+    
+    def meta_stamp(self) -> Optional[tuple]:
+        """元数据文件的版本标识：(inode, 修改时间, 大小)"""
+        try:
+            st = os.stat(self.meta_file)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    
+    def read_meta(self) -> Dict:
+        try:
+            return read_file(self.meta_file)
+        except:
+            return {}
+    
+    def write_meta(self, meta: Dict):
+        atomic_write(self.meta_file, encode(meta))
+
+
+class JsonSummaryIndex:
+    """
+    文档摘要索引：<prefix>s.index 为快照 {"version", "docs": {id: 摘要}}，
+    之后的增删以 {"id", "s": 摘要或 null} 追加到 <prefix>s.index.log，日志超过快照大小时合并进快照
+    写入文档的调用方持有文档锁后再更新索引（索引锁在文档锁之后获取）；
+    索引不存在或版本不符时扫描全部文档重建，绕过本程序直接放进目录的文档需删除索引文件后重建
+    """
+    
+    VERSION = 1
+    MIN_COMPACT_BYTES = 256 * 1024
+    
+    def __init__(self, storage: 'JsonDocumentStorage'):
+        self.storage = storage
+        self._lock = threading.Lock()
+        # 本进程缓存的索引内容，按快照文件标识与日志读取位置增量刷新
+        self._path: Optional[Path] = None
+        self._stamp: Optional[List[int]] = None
+        self._offset = 0
+        self._docs: Dict[str, Dict] = {}
+    
+    def _files(self) -> Tuple[Path, AppendLog]:
+        snapshot = self.storage._dir_getter() / f"{self.storage.prefix}s.index"
+        return snapshot, AppendLog(snapshot.with_name(snapshot.name + ".log"))
+    
+    def summaries(self) -> List[Dict]:
+        """全部文档的摘要"""
+        snapshot, log = self._files()
+        with get_file_lock(snapshot).read():
+            if self._refresh(snapshot, log):
+                with self._lock:
+                    return list(self._docs.values())
+        with get_file_lock(snapshot).write():
+            if not self._refresh(snapshot, log):
+                self._rebuild(snapshot, log)
+            with self._lock:
+                return list(self._docs.values())
+    
+    def record(self, doc_id: str, data: Optional[Dict]):
+        """文档已写入（data 为 None 表示已删除），更新索引"""
+        self.record_many({doc_id: data})
+    
+    def record_many(self, docs: Dict[str, Optional[Dict]]):
+        """多个文档已写入，一次追加到索引日志"""
+        snapshot, log = self._files()
+        with get_file_lock(snapshot).write():
+            if not self._refresh(snapshot, log):
+                # 重建时扫描到的已是写入后的文档
+                self._rebuild(snapshot, log)
+                return
+            summarize = self.storage.summarizer
+            records = [{'id': doc_id, 's': None if data is None else summarize(data)}
+                       for doc_id, data in docs.items()]
+            size = log.append(records)
+            with self._lock:
+                for record in records:
+                    self._apply(record['id'], record['s'])
+                self._offset = size
+                if size > max(self._stamp[1], self.MIN_COMPACT_BYTES):
+                    self._write_snapshot(snapshot, log)
+    
+    def _apply(self, doc_id: str, summary: Optional[Dict]):
+        if summary is None:
+            self._docs.pop(doc_id, None)
+        else:
+            self._docs[doc_id] = summary
+    
+    def _refresh(self, snapshot: Path, log: AppendLog) -> bool:
+        """读取其他进程的新修改（调用方持有索引锁），索引不可用时返回 False"""
+        with self._lock:
+            try:
+                stamp = _file_stamp(snapshot.stat())
+            except FileNotFoundError:
+                return False
+            size = log.size()
+            if self._path != snapshot or self._stamp != stamp or size < self._offset:
+                try:
+                    data = read_file(snapshot)
+                except Exception:
+                    return False
+                if not isinstance(data, dict) or data.get('version') != self.VERSION:
+                    return False
+                self._path, self._stamp, self._offset = snapshot, stamp, 0
+                self._docs = dict(data.get('docs') or {})
+            if size > self._offset:
+                # 日志中可能有写入快照前已合并的记录，按顺序重放结果不变
+                for record in log.read(self._offset):
+                    self._apply(record.get('id'), record.get('s'))
+                self._offset = size
+            return True
+    
+    def _rebuild(self, snapshot: Path, log: AppendLog):
+        """扫描全部文档重建索引（调用方持有索引写锁）"""
+        summarize = self.storage.summarizer
+        docs = {}
+        for data in self.storage.iter_all():
+            if data.get('id'):
+                docs[data['id']] = summarize(data)
+        with self._lock:
+            self._docs = docs
+            self._write_snapshot(snapshot, log)
+    
+    def _write_snapshot(self, snapshot: Path, log: AppendLog):
+        """把内存中的索引写成快照并清空日志（调用方持有索引写锁与 _lock）"""
+        atomic_write(snapshot, encode({'version': self.VERSION, 'docs': self._docs}))
+        log.clear()
+        self._path, self._stamp, self._offset = snapshot, _file_stamp(snapshot.stat()), 0
+
+
+class JsonDocumentStorage(DocumentStorage):
+    """
+    每个文档一个 <prefix>_<id>.json 文件，增量日志为同名的 .journal 文件
+    指定 summarizer 时维护摘要索引（JsonSummaryIndex）
+    """
+    
+    def __init__(self, dir_getter: Callable[[], Path], prefix: str,
+                 summarizer: Optional[Callable[[Dict], Dict]] = None):
+        self._dir_getter = dir_getter
+        self.prefix = prefix
+        self.summarizer = summarizer
+        self._index = JsonSummaryIndex(self) if summarizer else None
+    
+    def _record(self, doc_id: str, data: Optional[Dict]):
+        if self._index is not None:
+            self._index.record(doc_id, data)
+    
+    def _get_file(self, doc_id: str) -> Path:
+        return self._dir_getter() / f"{self.prefix}_{doc_id}.json"
+    
+    def _get_journal(self, doc_id: str) -> AppendLog:
+        return AppendLog(self._dir_getter() / f"{self.prefix}_{doc_id}.journal")
+    
+    def get(self, doc_id: str) -> Optional[Dict]:
+        try:
+            return read_file(self._get_file(doc_id))
+        except FileNotFoundError:
+            return None
+    
+    def put(self, doc_id: str, data: Dict):
+        file_path = self._get_file(doc_id)
+        with get_file_lock(file_path).write():
+            atomic_write(file_path, encode(data))
+            self._record(doc_id, data)
+    
+    def put_many(self, docs: Dict[str, Dict]):
+        # 按路径顺序持有全部文档锁（避免与其他批量写入死锁），文件一起落盘，摘要索引只追加一次
+        files = {doc_id: self._get_file(doc_id) for doc_id in docs}
+        with ExitStack() as stack:
+            for doc_id in sorted(files, key=lambda d: str(files[d])):
+                stack.enter_context(get_file_lock(files[doc_id]).write())
+            atomic_write_many((files[doc_id], encode(data)) for doc_id, data in docs.items())
+            if self._index is not None and docs:
+                self._index.record_many(docs)
+    
+    def update(self, doc_id: str, func: Callable[[Dict], Optional[Dict]]) -> Optional[Dict]:
+        file_path = self._get_file(doc_id)
+        with get_file_lock(file_path).write():
+            try:
+                data = read_file(file_path)
+            except FileNotFoundError:
+                return None
+            new_data = func(data)
+            if new_data is None:
+                return data
+            atomic_write(file_path, encode(new_data))
+            self._record(doc_id, new_data)
+            return new_data
+    
+    def open_journal(self, doc_id: str):
+        journal = self._get_journal(doc_id)
+        with get_file_lock(self._get_file(doc_id)).write():
+            journal.path.touch()
+    
+    def append_journal(self, doc_id: str, records: List[Dict]) -> bool:
+        journal = self._get_journal(doc_id)
+        # 共享锁：多个追加可以并发（单次 O_APPEND 写入不会交错），与 compact 互斥
+        with get_file_lock(self._get_file(doc_id)).read():
+            if not journal.exists():
+                return False
+            journal.append(records)
+            return True
+    
+    def read_journal(self, doc_id: str) -> List[Dict]:
+        return self._get_journal(doc_id).read()
+    
+    def compact(self, doc_id, func, close=False):
+        file_path = self._get_file(doc_id)
+        journal = self._get_journal(doc_id)
+        with get_file_lock(file_path).write():
+            try:
+                data = read_file(file_path)
+            except FileNotFoundError:
+                return None
+            new_data = func(data, journal.read())
+            if new_data is None:
+                return data
+            atomic_write(file_path, encode(new_data))
+            self._record(doc_id, new_data)
+            if close:
+                journal.clear()
+            else:
+                atomic_write(journal.path, b"")
+            return new_data
+    
+    def delete(self, doc_id: str) -> bool:
+        file_path = self._get_file(doc_id)
+        self._get_journal(doc_id).clear()
+        with get_file_lock(file_path).write():
+            if not file_path.exists():
+                return False
+            file_path.unlink()
+            self._record(doc_id, None)
+            return True
+    
+    def iter_all(self) -> Iterator[Dict]:
+        for file_path in self._dir_getter().glob(f"{self.prefix}_*.json"):
+            try:
+                data = read_file(file_path)
+            except:
+                continue
+            yield data
+    
+    def summaries(self) -> List[Dict]:
+        if self._index is None:
+            return super().summaries()
+        return self._index.summaries()
+    
+    def find(self, **fields) -> Iterator[Dict]:
+        """筛选字段都在摘要中时按摘要索引筛选，只读取命中的文档"""
+        if self._index is None or not fields or any(k not in self.summarizer({}) for k in fields):
+            yield from super().find(**fields)
+            return
+        for summary in self._index.summaries():
+            if all(summary.get(k) == v for k, v in fields.items()):
+                data = self.get(summary['id'])
+                if data is not None and all(data.get(k) == v for k, v in fields.items()):
+                    yield data
+
+
+class JsonBlobStorage(BlobStorage):
+    """单个 JSON 文件"""
+    
+    def __init__(self, path_getter: Callable[[], Path]):
+        self._path_getter = path_getter
+    
+    def load(self) -> Optional[Dict]:
+        path = self._path_getter()
+        if not os.path.exists(path):
+            return None
+        return read_file(path)
+    
+    def save(self, data: Dict):
+        atomic_write(self._path_getter(), encode(data))
+
+
+def create_json_storage() -> Storage:
+    """创建 JSON 文件存储"""
+    return Storage(
+        name="json",
+        banks=JsonBankStorage(),
+        papers=JsonDocumentStorage(get_papers_dir, "paper", summarize_paper),
+        results=JsonDocumentStorage(get_results_dir, "result", summarize_result),
+        favorites=JsonBlobStorage(get_favorites_file),
+        snapshots=JsonDocumentStorage(get_papers_dir, "snapshot")
+    )
@@ -0,0 +1,86 @@
+"""
+JSON 文件数据迁移到 SQLite
+
+用法:
+    python -m services.storage.migrate [数据库文件] [--switch]
+
+--switch 迁移完成后把配置中的存储后端切换为 sqlite（需重启程序生效）
+"""
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+
+from config import config as app_config
+from .json_storage import create_json_storage
+from .sqlite_storage import create_sqlite_storage
+from . import get_database_file
+
+
+def migrate_json_to_sqlite(database_file: Optional[str | Path] = None) -> Dict[str, int]:
+    """
+    把当前 JSON 数据（含未合并的修改日志）导入 SQLite 数据库
+    已存在的同 ID 数据会被覆盖，可重复执行
+    返回: 各类数据的迁移数量
+    """
+    source = create_json_storage()
+    target = create_sqlite_storage(database_file or get_database_file())
+    counts = {'banks': 0, 'papers': 0, 'results': 0, 'snapshots': 0, 'favorites': 0}
+    
+    with source.banks.meta_lock():
+        meta = source.banks.read_meta()
+    migrated_meta = {}
+    for bank_id, info in meta.items():
+        loaded = source.banks.load(bank_id)
+        if loaded is None:
+            print(f"跳过缺失的题库文件: {bank_id}")
+            continue
+        bank = loaded[0]
+        target.banks.save(bank)
+        migrated_meta[bank_id] = {**info, 'question_count': len(bank.questions), 'updated_at': bank.updated_at}
+        counts['banks'] += 1
+    
+    with target.banks.meta_lock(write=True):
+        target_meta = target.banks.read_meta()
+        target_meta.update(migrated_meta)
+        target.banks.write_meta(target_meta)
+    
+    for key in ('papers', 'results', 'snapshots'):
+        source_docs, target_docs = getattr(source, key), getattr(target, key)
+        for data in source_docs.iter_all():
+            if data.get('id'):
+                target_docs.put(data['id'], data)
+                # 进行中考试尚未合并的答题记录
+                records = source_docs.read_journal(data['id'])
+                if records:
+                    target_docs.open_journal(data['id'])
+                    target_docs.append_journal(data['id'], records)
+                counts[key] += 1
+    
+    favorites = source.favorites.load()
+    if favorites is not None:
+        target.favorites.save(favorites)
+        counts['favorites'] = len(favorites.get('favorites', []))
+    
+    return counts
+
+
+def main(argv=None):
+    args = list(sys.argv[1:] if argv is None else argv)
+    switch = '--switch' in args
+    args = [a for a in args if a != '--switch']
+    database_file = Path(args[0]) if args else get_database_file()
+    
+    counts = migrate_json_to_sqlite(database_file)
+    print(f"迁移完成 -> {database_file}")
+    print(f"  题库 {counts['banks']} 个，试卷 {counts['papers']} 份，"
+          f"成绩 {counts['results']} 条，试卷快照 {counts['snapshots']} 份，收藏 {counts['favorites']} 条")
+    
+    if switch:
+        app_config.path_config.storage_backend = "sqlite"
+        app_config.path_config.database_file = str(database_file)
+        app_config.save()
+        print("已切换为 SQLite 存储，重启程序后生效")
+
+
+if __name__ == "__main__":
+    main()
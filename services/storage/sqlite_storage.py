@@ -0,0 +1,512 @@
+"""
+SQLite 存储（WAL 模式）
+题目按行存储并建立题型、章节索引，单题修改只写对应的行；
+试卷、答题结果按文档存储，常用筛选字段单独成列并建立索引
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# 使用高性能 JSON 库（比标准库快 10-50 倍）
+try:
+    import orjson
+    def json_loads(s): return orjson.loads(s)
+    def json_dumps(obj): return orjson.dumps(obj).decode('utf-8')
+except ImportError:
+    import json
+    def json_loads(s): return json.loads(s)
+    def json_dumps(obj): return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+from models import QuestionBank, Question
+from utils.file_lock import RWLock
+from .base import (BankStorage, BankView, DocumentStorage, BlobStorage, Storage,
+                   summarize_paper, summarize_result)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS banks (
+    id TEXT PRIMARY KEY,
+    header TEXT NOT NULL,
+    updated_at TEXT,
+    version INTEGER NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS questions (
+    bank_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    type TEXT,
+    chapter TEXT,
+    difficulty INTEGER,
+    data TEXT NOT NULL,
+    PRIMARY KEY (bank_id, id)
+);
+CREATE INDEX IF NOT EXISTS idx_questions_position ON questions(bank_id, position);
+CREATE INDEX IF NOT EXISTS idx_questions_type ON questions(bank_id, type, difficulty);
+CREATE INDEX IF NOT EXISTS idx_questions_chapter ON questions(bank_id, chapter);
+CREATE TABLE IF NOT EXISTS bank_meta (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    info TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS papers (
+    id TEXT PRIMARY KEY,
+    created_at TEXT,
+    data TEXT NOT NULL,
+    summary TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    id TEXT PRIMARY KEY,
+    paper_id TEXT,
+    status TEXT,
+    start_time TEXT,
+    data TEXT NOT NULL,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_results_paper ON results(paper_id, status);
+CREATE INDEX IF NOT EXISTS idx_results_status ON results(status);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS doc_journal (
+    doc_table TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    record TEXT,
+    PRIMARY KEY (doc_table, doc_id, seq)
+);
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value
+);
+"""
+
+
+class SqliteDatabase:
+    """SQLite 数据库连接（每个线程一个连接）"""
+    
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+    
+    def connection(self) -> sqlite3.Connection:
+        """获取当前线程的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            with self._init_lock:
+                if not self._initialized:
+                    conn.executescript(SCHEMA)
+                    self._initialized = True
+            self._local.conn = conn
+        return conn
+    
+    @contextmanager
+    def transaction(self, write: bool = True):
+        """
+        事务（可嵌套，内层直接并入外层）
+        写事务使用 BEGIN IMMEDIATE，开始时即取得写锁，避免读后升级写锁时死锁
+        """
+        conn = self.connection()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    
+    def next_sequence(self, conn: sqlite3.Connection, key: str) -> int:
+        """递增并返回计数器（调用方需在写事务中）"""
+        conn.execute(
+            "INSERT INTO kv(key, value) VALUES (?, 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1", (key,))
+        return conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()[0]
+
+
+class SqliteBankView(BankView):
+    """题库视图：筛选和分页直接走 questions 表的索引查询"""
+    
+    def __init__(self, db: 'SqliteDatabase', bank_id: str, header: Dict, signature: tuple):
+        super().__init__(header, signature, len(json_dumps(header)))
+        self.db = db
+        self.bank_id = bank_id
+    
+    def select(self, types=None, chapters=None, offset=0, limit=None):
+        where, params = "bank_id = ?", [self.bank_id]
+        for column, values in (('type', types), ('chapter', chapters)):
+            if values is not None:
+                values = list(values)
+                where += f" AND {column} IN ({', '.join('?' * len(values))})"
+                params.extend(values)
+        
+        with self.db.transaction(write=False) as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM questions WHERE {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT data FROM questions WHERE {where} ORDER BY position LIMIT ? OFFSET ?",
+                params + [-1 if limit is None else limit, offset]).fetchall()
+        return [Question.from_dict(json_loads(r[0])).to_dict() for r in rows], total
+    
+    def get_questions(self, question_ids):
+        wanted = list(dict.fromkeys(question_ids))
+        result = {}
+        with self.db.transaction(write=False) as conn:
+            # 分批查询，避免超过 SQLite 的参数个数上限
+            for start in range(0, len(wanted), 500):
+                chunk = wanted[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT id, data FROM questions WHERE bank_id = ? AND id IN ({', '.join('?' * len(chunk))})",
+                    [self.bank_id] + chunk).fetchall()
+                for qid, data in rows:
+                    result[qid] = Question.from_dict(json_loads(data))
+        return result
+
+
+class SqliteBankStorage(BankStorage):
+    """题库 SQLite 存储：题库头信息一行，每道题一行"""
+    
+    def __init__(self, db: SqliteDatabase):
+        self.db = db
+        self._meta_threads = RWLock()
+    
+    @staticmethod
+    def _question_row(bank_id: str, position: int, q: Dict) -> tuple:
+        return (bank_id, q['id'], position, q.get('type'), q.get('chapter') or "",
+                q.get('difficulty'), json_dumps(q))
+    
+    def exists(self, bank_id: str) -> bool:
+        row = self.db.connection().execute("SELECT 1 FROM banks WHERE id = ?", (bank_id,)).fetchone()
+        return row is not None
+    
+    def signature(self, bank_id: str) -> Optional[tuple]:
+        """(版本号,)：题库每次写入都会取一个全局递增的版本号"""
+        row = self.db.connection().execute("SELECT version FROM banks WHERE id = ?", (bank_id,)).fetchone()
+        return None if row is None else (row[0],)
+    
+    def load(self, bank_id: str) -> Optional[Tuple[QuestionBank, tuple, int]]:
+        with self.db.transaction(write=False) as conn:
+            row = conn.execute(
+                "SELECT header, updated_at, version, size FROM banks WHERE id = ?", (bank_id,)).fetchone()
+            if row is None:
+                return None
+            header, updated_at, version, size = row
+            rows = conn.execute(
+                "SELECT data FROM questions WHERE bank_id = ? ORDER BY position", (bank_id,)).fetchall()
+        
+        data = json_loads(header)
+        data['updated_at'] = updated_at
+        data['questions'] = [json_loads(r[0]) for r in rows]
+        return QuestionBank.from_dict(data), (version,), size
+    
+    def open_view(self, bank_id: str) -> Optional[SqliteBankView]:
+        row = self.db.connection().execute(
+            "SELECT header, updated_at, version FROM banks WHERE id = ?", (bank_id,)).fetchone()
+        if row is None:
+            return None
+        header = json_loads(row[0])
+        header['updated_at'] = row[1]
+        return SqliteBankView(self.db, bank_id, header, (row[2],))
+    
+    def save(self, bank: QuestionBank):
+        data = bank.to_dict()
+        questions = data.pop('questions')
+        header = json_dumps(data)
+        rows = [self._question_row(bank.id, i, q) for i, q in enumerate(questions)]
+        size = len(header) + sum(len(r[-1]) for r in rows)
+        
+        with self.db.transaction() as conn:
+            version = self.db.next_sequence(conn, 'bank_version')
+            conn.execute(
+                "INSERT INTO banks(id, header, updated_at, version, size) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET header = excluded.header, updated_at = excluded.updated_at, "
+                "version = excluded.version, size = excluded.size",
+                (bank.id, header, bank.updated_at, version, size))
+            conn.execute("DELETE FROM questions WHERE bank_id = ?", (bank.id,))
+            conn.executemany(
+                "INSERT INTO questions(bank_id, id, position, type, chapter, difficulty, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    
+    def append(self, bank: QuestionBank, records: List[Dict]) -> Tuple[tuple, int, bool]:
+        """逐条写入变更的题目行"""
+        with self.db.transaction() as conn:
+            delta = 0
+            next_position = None
+            for record in records:
+                op = record.get('op')
+                question_id = record['question']['id'] if op in ('add', 'update') else record.get('question_id')
+                row = conn.execute(
+                    "SELECT LENGTH(data) FROM questions WHERE bank_id = ? AND id = ?",
+                    (bank.id, question_id)).fetchone()
+                old_size = row[0] if row else 0
+                
+                if op in ('add', 'update'):
+                    if row is None:
+                        if next_position is None:
+                            next_position = conn.execute(
+                                "SELECT COALESCE(MAX(position), -1) + 1 FROM questions WHERE bank_id = ?",
+                                (bank.id,)).fetchone()[0]
+                        values = self._question_row(bank.id, next_position, record['question'])
+                        next_position += 1
+                        conn.execute(
+                            "INSERT INTO questions(bank_id, id, position, type, chapter, difficulty, data) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)", values)
+                    else:
+                        values = self._question_row(bank.id, 0, record['question'])
+                        conn.execute(
+                            "UPDATE questions SET type = ?, chapter = ?, difficulty = ?, data = ? "
+                            "WHERE bank_id = ? AND id = ?",
+                            values[3:] + (bank.id, question_id))
+                    delta += len(values[-1]) - old_size
+                elif op == 'delete' and row is not None:
+                    conn.execute("DELETE FROM questions WHERE bank_id = ? AND id = ?", (bank.id, question_id))
+                    delta -= old_size
+            
+            version = self.db.next_sequence(conn, 'bank_version')
+            conn.execute(
+                "UPDATE banks SET updated_at = ?, version = ?, size = size + ? WHERE id = ?",
+                (bank.updated_at, version, delta, bank.id))
+            size = conn.execute("SELECT size FROM banks WHERE id = ?", (bank.id,)).fetchone()[0]
+        return (version,), size, False
+    
+    def delete(self, bank_id: str):
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM questions WHERE bank_id = ?", (bank_id,))
+            conn.execute("DELETE FROM banks WHERE id = ?", (bank_id,))
+    
+    def write_lock(self, bank_id: str):
+        """写事务（BEGIN IMMEDIATE 对其他进程同样互斥，期间的读写都并入该事务）"""
+        return self.db.transaction()
+    
+    # ============ 元数据 ============
+    
+    @contextmanager
+    def meta_lock(self, write: bool = False):
+        """线程读写锁 + 写事务（BEGIN IMMEDIATE 对其他进程同样互斥）"""
+        if not write:
+            self._meta_threads.acquire_read()
+            try:
+                yield
+            finally:
+                self._meta_threads.release_read()
+            return
+        self._meta_threads.acquire_write()
+        try:
+            with self.db.transaction():
+                yield
+        finally:
+            self._meta_threads.release_write()
+    
+    def meta_stamp(self) -> Optional[tuple]:
+        row = self.db.connection().execute("SELECT value FROM kv WHERE key = 'meta_version'").fetchone()
+        return None if row is None else (row[0],)
+    
+    def read_meta(self) -> Dict:
+        rows = self.db.connection().execute("SELECT id, info FROM bank_meta ORDER BY position").fetchall()
+        return {bank_id: json_loads(info) for bank_id, info in rows}
+    
+    def write_meta(self, meta: Dict):
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM bank_meta")
+            conn.executemany(
+                "INSERT INTO bank_meta(id, position, info) VALUES (?, ?, ?)",
+                [(bank_id, i, json_dumps(info)) for i, (bank_id, info) in enumerate(meta.items())])
+            self.db.next_sequence(conn, 'meta_version')
+
+
+class SqliteDocumentStorage(DocumentStorage):
+    """文档表：id + 若干索引字段 + 完整 JSON（+ 指定 summarizer 时的摘要 JSON）"""
+    
+    def __init__(self, db: SqliteDatabase, table: str, fields: Tuple[str, ...],
+                 summarizer: Optional[Callable[[Dict], Dict]] = None):
+        self.db = db
+        self.table = table
+        self.fields = fields
+        self.summarizer = summarizer
+        self._summary_column = False
+    
+    def _ensure_summary_column(self):
+        """旧版本创建的表没有 summary 列，首次使用时补上（已有行的摘要在读取时生成）"""
+        if self._summary_column:
+            return
+        conn = self.db.connection()
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({self.table})")}
+        if 'summary' not in columns:
+            try:
+                with self.db.transaction() as conn:
+                    conn.execute(f"ALTER TABLE {self.table} ADD COLUMN summary TEXT")
+            except sqlite3.OperationalError:
+                # 其他进程已经添加
+                pass
+        self._summary_column = True
+    
+    def get(self, doc_id: str) -> Optional[Dict]:
+        row = self.db.connection().execute(
+            f"SELECT data FROM {self.table} WHERE id = ?", (doc_id,)).fetchone()
+        return None if row is None else json_loads(row[0])
+    
+    def _upsert(self, docs: Dict[str, Dict]) -> Tuple[str, List[tuple]]:
+        """写入文档的 SQL 与各行参数"""
+        columns = ("id",) + self.fields + ("data",)
+        if self.summarizer is not None:
+            self._ensure_summary_column()
+            columns += ("summary",)
+        rows = []
+        for doc_id, data in docs.items():
+            values = (doc_id,) + tuple(data.get(f) for f in self.fields) + (json_dumps(data),)
+            if self.summarizer is not None:
+                values += (json_dumps(self.summarizer(data)),)
+            rows.append(values)
+        updates = ", ".join(f"{c} = excluded.{c}" for c in columns[1:])
+        sql = (f"INSERT INTO {self.table}({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+               f"ON CONFLICT(id) DO UPDATE SET {updates}")
+        return sql, rows
+    
+    def put(self, doc_id: str, data: Dict):
+        sql, rows = self._upsert({doc_id: data})
+        with self.db.transaction() as conn:
+            conn.execute(sql, rows[0])
+    
+    def put_many(self, docs: Dict[str, Dict]):
+        if not docs:
+            return
+        sql, rows = self._upsert(docs)
+        with self.db.transaction() as conn:
+            conn.executemany(sql, rows)
+    
+    def update(self, doc_id, func):
+        with self.db.transaction() as conn:
+            row = conn.execute(f"SELECT data FROM {self.table} WHERE id = ?", (doc_id,)).fetchone()
+            if row is None:
+                return None
+            data = json_loads(row[0])
+            new_data = func(data)
+            if new_data is None:
+                return data
+            self.put(doc_id, new_data)
+            return new_data
+    
+    # 增量日志存放在 doc_journal 表，seq 为 0 的行是日志头（表示日志已创建），记录从 1 开始编号
+    
+    def open_journal(self, doc_id: str):
+        with self.db.transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO doc_journal(doc_table, doc_id, seq, record) VALUES (?, ?, 0, NULL)",
+                         (self.table, doc_id))
+    
+    def append_journal(self, doc_id: str, records: List[Dict]) -> bool:
+        with self.db.transaction() as conn:
+            (last,) = conn.execute("SELECT MAX(seq) FROM doc_journal WHERE doc_table = ? AND doc_id = ?",
+                                   (self.table, doc_id)).fetchone()
+            if last is None:
+                return False
+            conn.executemany(
+                "INSERT INTO doc_journal(doc_table, doc_id, seq, record) VALUES (?, ?, ?, ?)",
+                [(self.table, doc_id, last + i, json_dumps(r)) for i, r in enumerate(records, 1)])
+            return True
+    
+    def read_journal(self, doc_id: str) -> List[Dict]:
+        rows = self.db.connection().execute(
+            "SELECT record FROM doc_journal WHERE doc_table = ? AND doc_id = ? AND seq > 0 ORDER BY seq",
+            (self.table, doc_id)).fetchall()
+        return [json_loads(record) for (record,) in rows]
+    
+    def compact(self, doc_id, func, close=False):
+        with self.db.transaction() as conn:
+            row = conn.execute(f"SELECT data FROM {self.table} WHERE id = ?", (doc_id,)).fetchone()
+            if row is None:
+                return None
+            data = json_loads(row[0])
+            new_data = func(data, self.read_journal(doc_id))
+            if new_data is None:
+                return data
+            self.put(doc_id, new_data)
+            conn.execute("DELETE FROM doc_journal WHERE doc_table = ? AND doc_id = ?" + ("" if close else " AND seq > 0"),
+                         (self.table, doc_id))
+            if not close:
+                self.open_journal(doc_id)
+            return new_data
+    
+    def delete(self, doc_id: str) -> bool:
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM doc_journal WHERE doc_table = ? AND doc_id = ?", (self.table, doc_id))
+            cursor = conn.execute(f"DELETE FROM {self.table} WHERE id = ?", (doc_id,))
+            return cursor.rowcount > 0
+    
+    def iter_all(self) -> Iterator[Dict]:
+        rows = self.db.connection().execute(f"SELECT data FROM {self.table}").fetchall()
+        for (data,) in rows:
+            try:
+                yield json_loads(data)
+            except Exception:
+                continue
+    
+    def summaries(self) -> List[Dict]:
+        """读取 summary 列，缺少摘要的行（旧版本写入）由完整 JSON 生成并回填"""
+        if self.summarizer is None:
+            return super().summaries()
+        self._ensure_summary_column()
+        rows = self.db.connection().execute(f"SELECT id, summary FROM {self.table}").fetchall()
+        result = [json_loads(summary) for _, summary in rows if summary is not None]
+        missing = [doc_id for doc_id, summary in rows if summary is None]
+        if missing:
+            with self.db.transaction() as conn:
+                for doc_id in missing:
+                    row = conn.execute(f"SELECT data FROM {self.table} WHERE id = ?", (doc_id,)).fetchone()
+                    if row is None:
+                        continue
+                    summary = self.summarizer(json_loads(row[0]))
+                    conn.execute(f"UPDATE {self.table} SET summary = ? WHERE id = ?", (json_dumps(summary), doc_id))
+                    result.append(summary)
+        return result
+    
+    def find(self, **fields) -> Iterator[Dict]:
+        """索引字段直接走 SQL 条件，其余字段回退为逐个比对"""
+        if not fields or any(k not in self.fields for k in fields):
+            yield from super().find(**fields)
+            return
+        where = " AND ".join(f"{k} = ?" for k in fields)
+        rows = self.db.connection().execute(
+            f"SELECT data FROM {self.table} WHERE {where}", tuple(fields.values())).fetchall()
+        for (data,) in rows:
+            yield json_loads(data)
+
+
+class SqliteBlobStorage(BlobStorage):
+    """存放在 kv 表中的单个 JSON 对象"""
+    
+    def __init__(self, db: SqliteDatabase, key: str):
+        self.db = db
+        self.key = key
+    
+    def load(self) -> Optional[Dict]:
+        row = self.db.connection().execute("SELECT value FROM kv WHERE key = ?", (self.key,)).fetchone()
+        return None if row is None else json_loads(row[0])
+    
+    def save(self, data: Dict):
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO kv(key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (self.key, json_dumps(data)))
+
+
+def create_sqlite_storage(path: str | Path) -> Storage:
+    """创建 SQLite 存储"""
+    db = SqliteDatabase(path)
+    return Storage(
+        name="sqlite",
+        banks=SqliteBankStorage(db),
+        papers=SqliteDocumentStorage(db, "papers", ("created_at",), summarize_paper),
+        results=SqliteDocumentStorage(db, "results", ("paper_id", "status", "start_time"), summarize_result),
+        favorites=SqliteBlobStorage(db, "favorites"),
+        snapshots=SqliteDocumentStorage(db, "snapshots", ())
+    )
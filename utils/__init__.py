@@ -4,11 +4,15 @@
 from .file_handler import FileHandler
 from .validators import Validators
 from .helpers import format_time, generate_id, safe_filename
+from .journal import AppendLog
+from .atomic_io import atomic_write
 
 __all__ = [
     'FileHandler',
     'Validators',
     'format_time',
     'generate_id',
-    'safe_filename'
+    'safe_filename',
+    'AppendLog',
+    'atomic_write'
 ]
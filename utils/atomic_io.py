@@ -0,0 +1,250 @@
+"""
+原子落盘工具
+写临时文件 → flush → fsync → 重命名覆盖，崩溃时目标文件要么是旧内容要么是新内容，不会被截断
+可选“组提交”模式：短时间内的多次写入合并 fsync，同一文件的连续写入只落盘最后一次
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+def _fsync_dir(dir_path: Path):
+    """同步目录项，保证重命名本身落盘（Windows 不支持，跳过）"""
+    if sys.platform == 'win32':
+        return
+    try:
+        fd = os.open(str(dir_path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _fsync_path(path: Path):
+    """同步已写入文件的内容"""
+    with open(path, 'rb+') as f:
+        os.fsync(f.fileno())
+
+
+def _replace(src: Path, dst: Path, retries: int = 5):
+    """重命名覆盖目标文件（Windows 下目标被短暂占用时重试）"""
+    for attempt in range(retries):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if attempt == retries - 1:
+                raise
+            time.sleep(0.05 * (attempt + 1))
+
+
+def _write_temp(path: Path, data: bytes, sync: bool) -> Path:
+    """在目标文件同目录写入临时文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            if sync:
+                os.fsync(f.fileno())
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+    return Path(tmp_name)
+
+
+class _Request:
+    """一次待提交的写入或同步请求"""
+    __slots__ = ('target', 'tmp_path', 'done', 'error')
+
+    def __init__(self, target: Path, tmp_path: Optional[Path]):
+        self.target = target
+        self.tmp_path = tmp_path  # None 表示只需同步 target 本身（追加写）
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class GroupCommitter:
+    """组提交线程：收集一个时间窗口内的写入请求，统一 fsync 与重命名"""
+
+    def __init__(self, window_ms: int = 5):
+        self.window = max(window_ms, 0) / 1000.0
+        self._queue: List[_Request] = []
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+        self._thread.start()
+
+    def submit(self, request: _Request):
+        """提交请求并等待其落盘"""
+        self.submit_many([request])
+
+    def submit_many(self, requests: List[_Request]):
+        """一次提交多个请求（进入同一批），等待全部落盘；有失败时抛出第一个错误"""
+        with self._cond:
+            self._queue.extend(requests)
+            self._cond.notify()
+        for request in requests:
+            request.done.wait()
+        for request in requests:
+            if request.error is not None:
+                raise request.error
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+            # 等待一个窗口，让并发写入汇集成一批
+            if self.window:
+                time.sleep(self.window)
+            with self._cond:
+                batch, self._queue = self._queue, []
+            self._commit(batch)
+
+    def _commit(self, batch: List[_Request]):
+        # 同一目标只保留最后一次写入，之前的临时文件直接丢弃
+        latest: Dict[Path, _Request] = {}
+        synced: Set[Path] = set()
+        for request in batch:
+            if request.tmp_path is None:
+                continue
+            previous = latest.get(request.target)
+            if previous is not None:
+                try:
+                    os.unlink(previous.tmp_path)
+                except OSError:
+                    pass
+            latest[request.target] = request
+
+        dirs: Set[Path] = set()
+        failed: Dict[Path, BaseException] = {}
+        for target, request in latest.items():
+            try:
+                _fsync_path(request.tmp_path)
+                _replace(request.tmp_path, target)
+                dirs.add(target.parent)
+            except BaseException as e:
+                failed[target] = e
+        for request in batch:
+            if request.tmp_path is None and request.target not in synced:
+                try:
+                    _fsync_path(request.target)
+                except FileNotFoundError:
+                    pass
+                except BaseException as e:
+                    failed[request.target] = e
+                synced.add(request.target)
+        for dir_path in dirs:
+            _fsync_dir(dir_path)
+
+        for request in batch:
+            request.error = failed.get(request.target)
+            request.done.set()
+
+
+_committer: Optional[GroupCommitter] = None
+_committer_lock = threading.Lock()
+
+
+def configure_group_commit(enabled: bool, window_ms: int = 5):
+    """开启或关闭组提交模式"""
+    global _committer
+    with _committer_lock:
+        if enabled:
+            if _committer is None or _committer.window != max(window_ms, 0) / 1000.0:
+                _committer = GroupCommitter(window_ms)
+        else:
+            _committer = None
+
+
+def atomic_write(path: str | Path, data: bytes | str, encoding: str = 'utf-8'):
+    """原子写入文件（写临时文件并 fsync 后重命名覆盖）"""
+    path = Path(path)
+    if isinstance(data, str):
+        data = data.encode(encoding)
+
+    committer = _committer
+    if committer is None:
+        tmp_path = _write_temp(path, data, sync=True)
+        try:
+            _replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        _fsync_dir(path.parent)
+    else:
+        tmp_path = _write_temp(path, data, sync=False)
+        committer.submit(_Request(path, tmp_path))
+
+
+def atomic_write_many(items: Iterable[Tuple[str | Path, bytes | str]], encoding: str = 'utf-8'):
+    """
+    原子写入多个文件：先写好全部临时文件，再逐个重命名，每个目录只同步一次
+    每个文件单独保证原子性，整批不是一个事务（中途失败时已重命名的文件保持新内容）
+    """
+    prepared: List[Tuple[Path, bytes]] = []
+    for path, data in items:
+        prepared.append((Path(path), data.encode(encoding) if isinstance(data, str) else data))
+
+    committer = _committer
+    sync = committer is None
+    temps: List[Tuple[Path, Path]] = []
+    try:
+        for path, data in prepared:
+            temps.append((path, _write_temp(path, data, sync=sync)))
+    except BaseException:
+        for _, tmp_path in temps:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+        raise
+
+    if committer is not None:
+        committer.submit_many([_Request(path, tmp_path) for path, tmp_path in temps])
+        return
+
+    dirs: Set[Path] = set()
+    for i, (path, tmp_path) in enumerate(temps):
+        try:
+            _replace(tmp_path, path)
+        except BaseException:
+            for _, rest in temps[i:]:
+                try:
+                    os.unlink(rest)
+                except OSError:
+                    pass
+            raise
+        dirs.add(path.parent)
+    for dir_path in dirs:
+        _fsync_dir(dir_path)
+
+
+def sync_file(path: str | Path, fileno: Optional[int] = None):
+    """
+    同步追加写入的文件内容
+    组提交模式下合并到下一批统一 fsync；否则立即 fsync（可传入已打开文件的描述符）
+    """
+    committer = _committer
+    if committer is None:
+        if fileno is not None:
+            os.fsync(fileno)
+        else:
+            _fsync_path(Path(path))
+    else:
+        committer.submit(_Request(Path(path), None))
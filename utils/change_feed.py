@@ -0,0 +1,144 @@
+"""
+跨进程变更通知
+多个进程（如多 worker 部署的 Web 服务）共用数据目录时，写入方把“某对象已变更”追加到一个共享文件，
+其他进程轮询时读取新追加的记录并让本进程的缓存失效；只传递失效通知，不传递数据
+"""
+import os
+import uuid
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# 使用高性能 JSON 库（比标准库快 10-50 倍）
+try:
+    import orjson
+    def json_loads(s): return orjson.loads(s)
+    def json_dumps_line(obj) -> bytes: return orjson.dumps(obj) + b"\n"
+except ImportError:
+    import json
+    def json_loads(s): return json.loads(s)
+    def json_dumps_line(obj) -> bytes: return (json.dumps(obj, ensure_ascii=False) + "\n").encode('utf-8')
+
+from .atomic_io import atomic_write
+
+
+class ChangeFeed:
+    """
+    变更通知文件：每行一条 {"t": 主题, "k": 键, "p": 进程号}
+    - publish 以 O_APPEND 单次写入追加一行，多个进程同时追加不会交错；不 fsync，崩溃后缓存本就失效
+    - poll 只 stat 一次文件，有新内容时才读取，并跳过本进程发出的通知
+    - 文件超过 MAX_BYTES 时由写入方替换为只含一行 {"g": 代号} 的新文件（inode 可能被复用，以代号区分）；
+      其他进程发现代号变化时无法确定错过了哪些通知，以键 None 通知所有订阅者整体失效
+    未启用时 publish / poll 均为空操作（单进程运行不需要）
+    """
+    
+    MAX_BYTES = 1024 * 1024
+    
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.enabled = False
+        self._handlers: Dict[str, List[Callable[[Optional[str]], None]]] = {}
+        self._lock = threading.Lock()
+        self._stamp: Optional[tuple] = None
+        self._generation: Optional[str] = None
+        self._offset = 0
+    
+    def enable(self):
+        """启用通知，从文件当前末尾开始接收（启动前的变更已体现在存储中）"""
+        with self._lock:
+            if self.enabled:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                with open(self.path, 'rb') as f:
+                    self._generation = self._read_generation(f)
+                    self._offset = f.seek(0, os.SEEK_END)
+                    self._stamp = self._file_stamp(os.fstat(f.fileno()))
+            except FileNotFoundError:
+                pass
+            self.enabled = True
+    
+    def subscribe(self, topic: str, handler: Callable[[Optional[str]], None]):
+        """订阅主题；handler 收到变更对象的键，键为 None 表示该主题下所有对象都可能已变更"""
+        self._handlers.setdefault(topic, []).append(handler)
+    
+    def publish(self, topic: str, key: Optional[str] = None):
+        """通知其他进程：主题 topic 下键为 key 的对象已变更"""
+        if not self.enabled:
+            return
+        line = json_dumps_line({'t': topic, 'k': key, 'p': os.getpid()})
+        try:
+            fd = os.open(str(self.path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            if size > self.MAX_BYTES:
+                atomic_write(self.path, json_dumps_line({'g': uuid.uuid4().hex}))
+        except OSError as e:
+            print(f"写入变更通知失败: {e}")
+    
+    @staticmethod
+    def _file_stamp(st: os.stat_result) -> tuple:
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+    
+    @staticmethod
+    def _read_generation(f) -> Optional[str]:
+        """文件代号（首行），最初创建的文件没有代号"""
+        f.seek(0)
+        first = f.readline()
+        if not first.endswith(b"\n"):
+            return None
+        try:
+            return json_loads(first).get('g')
+        except Exception:
+            return None
+    
+    def poll(self):
+        """读取其他进程新发出的通知并分发给订阅者"""
+        if not self.enabled:
+            return
+        with self._lock:
+            try:
+                f = open(self.path, 'rb')
+            except FileNotFoundError:
+                return
+            with f:
+                stamp = self._file_stamp(os.fstat(f.fileno()))
+                if stamp == self._stamp:
+                    return
+                records = []
+                generation = self._read_generation(f)
+                if generation != self._generation or stamp[1] < self._offset:
+                    if self._stamp is not None:
+                        # 文件被替换，之前的通知可能未读完
+                        records.extend({'t': topic, 'k': None} for topic in self._handlers)
+                    self._generation, self._offset = generation, 0
+                records.extend(self._read_new(f))
+                self._stamp = stamp
+        
+        pid = os.getpid()
+        for record in records:
+            if record.get('p') == pid or 't' not in record:
+                continue
+            for handler in self._handlers.get(record['t'], ()):
+                try:
+                    handler(record.get('k'))
+                except Exception as e:
+                    print(f"处理变更通知失败: {e}")
+    
+    def _read_new(self, f) -> List[Dict]:
+        """读取上次位置之后的完整行（正在写入的半行留到下次）"""
+        f.seek(self._offset)
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+        
+        records = []
+        for line in data[:end].splitlines():
+            try:
+                records.append(json_loads(line))
+            except Exception:
+                continue
+        return records
@@ -7,6 +7,8 @@ from pathlib import Path
 from typing import Any, Optional
 from datetime import datetime
 
+from .atomic_io import atomic_write
+
 
 class FileHandler:
     """文件处理工具类"""
@@ -25,11 +27,7 @@ class FileHandler:
     def write_json(file_path: str | Path, data: Any, indent: int = 2) -> bool:
         """写入JSON文件"""
         try:
-            path = Path(file_path)
-            path.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=indent)
+            atomic_write(file_path, json.dumps(data, ensure_ascii=False, indent=indent))
             return True
         except Exception as e:
             print(f"写入JSON文件失败: {e}")
@@ -57,11 +55,7 @@ class FileHandler:
     def write_text(file_path: str | Path, content: str, encoding: str = 'utf-8') -> bool:
         """写入文本文件"""
         try:
-            path = Path(file_path)
-            path.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(path, 'w', encoding=encoding) as f:
-                f.write(content)
+            atomic_write(file_path, content, encoding=encoding)
             return True
         except Exception as e:
             print(f"写入文本文件失败: {e}")
@@ -0,0 +1,162 @@
+"""
+文件读写锁
+线程级读写锁 + 进程级文件锁（POSIX 使用 flock，Windows 使用 msvcrt.locking，仅支持独占）
+"""
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict
+
+if sys.platform == 'win32':
+    import msvcrt
+else:
+    import fcntl
+
+
+class RWLock:
+    """线程级读写锁（写优先，同一线程可重入，持有写锁时可再获取读锁）"""
+    
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers: Dict[int, int] = {}  # 线程ID -> 重入次数
+        self._writer = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+    
+    def acquire_read(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me or me in self._readers:
+                self._readers[me] = self._readers.get(me, 0) + 1
+                return
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+            self._readers[me] = 1
+    
+    def release_read(self):
+        me = threading.get_ident()
+        with self._cond:
+            count = self._readers[me] - 1
+            if count:
+                self._readers[me] = count
+            else:
+                del self._readers[me]
+                self._cond.notify_all()
+    
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+                return
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._write_depth = 1
+    
+    def release_write(self):
+        with self._cond:
+            self._write_depth -= 1
+            if self._write_depth == 0:
+                self._writer = None
+                self._cond.notify_all()
+
+
+class _ProcessLock:
+    """进程级文件锁（锁住旁路的 .lock 文件，不影响数据文件本身的原子替换）"""
+    
+    def __init__(self, lock_path: Path):
+        self.lock_path = lock_path
+    
+    def acquire(self, exclusive: bool) -> int:
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(self.lock_path), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if sys.platform == 'win32':
+                # msvcrt 只有独占锁；LK_LOCK 失败会重试约10秒，这里循环直到成功
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+    
+    def release(self, fd: int):
+        try:
+            if sys.platform == 'win32':
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+
+class FileRWLock:
+    """单个数据文件的读写锁，同时协调本进程内的线程与其他进程"""
+    
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._threads = RWLock()
+        self._process = _ProcessLock(self.path.with_name(self.path.name + ".lock"))
+        self._local = threading.local()
+    
+    def _depth(self) -> int:
+        return getattr(self._local, 'depth', 0)
+    
+    @contextmanager
+    def read(self):
+        """共享锁：允许多个读者并发"""
+        self._threads.acquire_read()
+        depth = self._depth()
+        fd = self._process.acquire(exclusive=False) if depth == 0 else None
+        self._local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            if fd is not None:
+                self._process.release(fd)
+            self._threads.release_read()
+    
+    @contextmanager
+    def write(self):
+        """独占锁：读-改-写期间阻止其他线程和进程访问"""
+        self._threads.acquire_write()
+        depth = self._depth()
+        fd = self._process.acquire(exclusive=True) if depth == 0 else None
+        self._local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            if fd is not None:
+                self._process.release(fd)
+            self._threads.release_write()
+
+
+_locks: Dict[str, FileRWLock] = {}
+_locks_guard = threading.Lock()
+
+
+def get_file_lock(path: str | Path) -> FileRWLock:
+    """获取数据文件对应的读写锁（同一路径共享同一把锁）"""
+    key = os.path.normcase(os.path.abspath(str(path)))
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = FileRWLock(path)
+            _locks[key] = lock
+        return lock
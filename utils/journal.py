@@ -0,0 +1,105 @@
+"""
+追加式日志工具
+每行一条 JSON 记录，只追加不改写，适合记录增量修改
+"""
+import os
+from pathlib import Path
+from typing import List, Dict, Optional
+
+from .atomic_io import atomic_write, sync_file
+
+# 使用高性能 JSON 库（比标准库快 10-50 倍）
+try:
+    import orjson
+    def json_loads(s): return orjson.loads(s)
+    def json_dumps_line(obj) -> bytes: return orjson.dumps(obj) + b"\n"
+except ImportError:
+    import json
+    def json_loads(s): return json.loads(s)
+    def json_dumps_line(obj) -> bytes: return (json.dumps(obj, ensure_ascii=False) + "\n").encode('utf-8')
+
+
+class AppendLog:
+    """追加式日志文件"""
+    
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+    
+    def exists(self) -> bool:
+        """日志文件是否存在"""
+        return self.path.exists()
+    
+    def size(self) -> int:
+        """日志文件大小（字节），不存在时为0"""
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+    
+    def append(self, records: List[Dict]) -> int:
+        """
+        追加记录并落盘（调用方持有日志的写锁）
+        返回: 追加后的日志大小
+        """
+        if not records:
+            return self.size()
+        
+        payload = b"".join(json_dumps_line(r) for r in records)
+        with open(self.path, 'a+b') as f:
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    # 之前的写入中途崩溃留下残缺行：先换行，新记录不与残缺行粘连（读取时只跳过残缺行）
+                    payload = b"\n" + payload
+            f.write(payload)
+            f.flush()
+            sync_file(self.path, f.fileno())
+            return f.tell()
+    
+    def read(self, offset: int = 0, end: Optional[int] = None) -> List[Dict]:
+        """
+        读取全部记录（可指定起始字节偏移，end 为读取截止的字节偏移，用于与事先取得的日志大小保持一致）
+        写入中途崩溃留下的残缺行会被跳过
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                if offset:
+                    f.seek(offset)
+                data = f.read() if end is None else f.read(max(0, end - offset))
+        except FileNotFoundError:
+            return []
+        
+        records = []
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json_loads(line))
+            except Exception:
+                print(f"跳过损坏的日志记录: {self.path.name}")
+        return records
+    
+    def trim(self, offset: int):
+        """丢弃前 offset 字节（已合并进快照的部分），保留之后追加的记录"""
+        if offset <= 0:
+            return
+        
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                rest = f.read()
+        except FileNotFoundError:
+            return
+        
+        if not rest:
+            self.clear()
+            return
+        
+        atomic_write(self.path, rest)
+    
+    def clear(self):
+        """删除日志文件"""
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
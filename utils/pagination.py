@@ -0,0 +1,90 @@
+"""
+游标分页
+按 (排序值, ID) 定位上一页的最后一条，翻页期间有新增或删除也不会重复、遗漏已返回之外的记录
+"""
+import base64
+import hashlib
+import json
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class CursorError(ValueError):
+    """游标无法解析，或与本次查询的排序、筛选条件不符"""
+
+
+def query_digest(params: Dict) -> str:
+    """查询条件摘要，写入游标，用于发现翻页时条件已变化"""
+    raw = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+
+def encode_cursor(key: Tuple, digest: str) -> str:
+    """生成游标（URL 安全的 base64）"""
+    raw = json.dumps({'k': list(key), 'q': digest}, ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str, digest: str) -> Tuple:
+    """解析游标，返回上一页最后一条的 (排序值, ID)"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = json.loads(raw)
+        key = tuple(data['k'])
+        query = data['q']
+    except Exception:
+        raise CursorError("无效的分页游标")
+    if query != digest or len(key) != 2:
+        raise CursorError("分页游标与查询条件不符")
+    return key
+
+
+def in_date_range(value: Optional[str], date_from: Optional[str], date_to: Optional[str]) -> bool:
+    """
+    时间字符串（"YYYY-MM-DD HH:MM:SS"）是否在范围内，两端都包含
+    date_to 可以只写日期，表示当天结束前
+    """
+    if not date_from and not date_to:
+        return True
+    if not value:
+        return False
+    if date_from and value < date_from:
+        return False
+    if date_to and value[:len(date_to)] > date_to:
+        return False
+    return True
+
+
+def paginate(items: List[Dict], sort_value: Callable[[Dict], Any], descending: bool,
+             page_size: Optional[int], cursor: Optional[str] = None, params: Optional[Dict] = None) -> Dict:
+    """
+    对已筛选的记录排序并取一页
+    sort_value 返回可比较且能写入 JSON 的值（字符串或数字），同值按 ID 排序；
+    params 为本次查询的排序与筛选条件，写入游标摘要；page_size 为 None 时不分页
+    返回: {'items': 当前页, 'total': 符合条件的总数, 'page_size', 'next_cursor': 下一页游标，没有下一页时为 None}
+    """
+    digest = query_digest(params or {})
+    decorated = sorted((((sort_value(item), item.get('id') or ''), item) for item in items),
+                       key=lambda pair: pair[0])
+    keys = [key for key, _ in decorated]
+    after = decode_cursor(cursor, digest) if cursor else None
+    if page_size is None:
+        page_size = len(decorated)
+    
+    if descending:
+        end = bisect_left(keys, after) if after is not None else len(decorated)
+        start = max(0, end - page_size)
+        page = decorated[start:end][::-1]
+        has_more = start > 0
+    else:
+        start = bisect_right(keys, after) if after is not None else 0
+        end = start + page_size
+        page = decorated[start:end]
+        has_more = end < len(decorated)
+    
+    return {
+        'items': [item for _, item in page],
+        'total': len(decorated),
+        'page_size': page_size,
+        'next_cursor': encode_cursor(page[-1][0], digest) if has_more and page else None
+    }
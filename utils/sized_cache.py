@@ -0,0 +1,118 @@
+"""
+按内存预算淘汰的 LRU 缓存
+每个条目记录估算的字节数，总量超出预算时淘汰最久未使用且未被固定的条目
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class SizedLRUCache:
+    """带内存预算的 LRU 缓存（线程安全）"""
+    
+    def __init__(self, budget: Callable[[], int]):
+        """
+        budget: 返回当前预算字节数的函数（每次写入时读取，0 表示不限制）
+        """
+        self._budget = budget
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (signature, value, size)
+        self._pins: Dict[Hashable, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Hashable, signature: Any = None) -> Optional[Any]:
+        """
+        读取缓存，signature 与写入时不一致视为未命中
+        命中时把条目移到最近使用的一端
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != signature:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def peek(self, key: Hashable) -> Optional[tuple]:
+        """读取 (signature, value)，不计入统计也不调整顺序"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[:2]
+    
+    def put(self, key: Hashable, signature: Any, value: Any, size: int):
+        """写入缓存并按预算淘汰"""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (signature, value, size)
+            self._bytes += size
+            self._evict(keep=key)
+    
+    def pop(self, key: Hashable):
+        """移除条目"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[2]
+    
+    def clear(self):
+        """清空缓存（固定标记保留）"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+    
+    def pin(self, key: Hashable):
+        """固定条目使其不被淘汰（可重复固定，需对应次数的 unpin）"""
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+    
+    def unpin(self, key: Hashable):
+        """取消一次固定"""
+        with self._lock:
+            count = self._pins.get(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+            else:
+                self._pins.pop(key, None)
+            self._evict()
+    
+    def _evict(self, keep: Optional[Hashable] = None):
+        """
+        淘汰到预算以内（调用方需持有锁），被固定的条目跳过
+        keep 为刚写入的条目，不被淘汰：单个条目超出预算时也保留，只淘汰其他条目
+        """
+        budget = self._budget()
+        if budget <= 0 or self._bytes <= budget:
+            return
+        for key in list(self._entries):
+            if self._bytes <= budget:
+                break
+            if key in self._pins or key == keep:
+                continue
+            entry = self._entries.pop(key)
+            self._bytes -= entry[2]
+            self.evictions += 1
+    
+    def stats(self) -> Dict:
+        """缓存统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'pinned': sum(1 for key in self._pins if key in self._entries),
+                'bytes': self._bytes,
+                'budget': self._budget(),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,223 @@
+"""
+全文倒排索引
+中文按二元组（bigram）切分，英文与数字按单词切分
+"""
+import math
+import re
+from typing import List, Dict, Set, Tuple, Optional, Iterable
+
+# 中文连续片段 或 英文/数字单词
+_TOKEN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff]+|[a-z0-9]+')
+_CJK_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff]')
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """切分文本：中文取相邻二字组合（单字片段保留单字），英文数字取整词"""
+    tokens = []
+    for run in _TOKEN_RE.findall(text.lower()):
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def _query_terms(keyword: str) -> List[Tuple[str, bool]]:
+    """
+    切分查询词
+    返回: [(词项, 是否可精确匹配)]
+    单个汉字、以及查询首尾可能只是半个单词的英文词，需要在词表中做包含匹配
+    """
+    text = keyword.lower()
+    terms = []
+    for match in _TOKEN_RE.finditer(text):
+        run = match.group()
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                terms.append((run, False))
+            else:
+                terms.extend((run[i:i + 2], True) for i in range(len(run) - 1))
+        else:
+            # 查询中两侧都有分隔符的单词，在文档中也一定是完整单词
+            bounded = match.start() > 0 and match.end() < len(text)
+            terms.append((run, bounded))
+    return terms
+
+
+class InvertedIndex:
+    """按题库分片的倒排索引：词项 -> 题库ID -> {题目ID: 词频}"""
+    
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, Dict[str, int]]] = {}
+        # 正排表：题库ID -> {题目ID: (词项元组, 文档长度)}，用于删除和打分
+        self._docs: Dict[str, Dict[str, Tuple[Tuple[str, ...], int]]] = {}
+        self._total_length = 0
+    
+    @property
+    def doc_count(self) -> int:
+        """文档总数"""
+        return sum(len(docs) for docs in self._docs.values())
+    
+    def has_bank(self, bank_id: str) -> bool:
+        """是否已索引该题库"""
+        return bank_id in self._docs
+    
+    def bank_ids(self) -> List[str]:
+        """已索引的题库ID"""
+        return list(self._docs.keys())
+    
+    def add_document(self, bank_id: str, doc_id: str, text: str):
+        """添加或替换一篇文档"""
+        self.remove_document(bank_id, doc_id)
+        freqs: Dict[str, int] = {}
+        for term in tokenize(text):
+            freqs[term] = freqs.get(term, 0) + 1
+        self._add_freqs(bank_id, doc_id, freqs)
+    
+    def _add_freqs(self, bank_id: str, doc_id: str, freqs: Dict[str, int]):
+        """登记文档词频"""
+        length = sum(freqs.values())
+        self._docs.setdefault(bank_id, {})[doc_id] = (tuple(freqs), length)
+        self._total_length += length
+        for term, tf in freqs.items():
+            self._postings.setdefault(term, {}).setdefault(bank_id, {})[doc_id] = tf
+    
+    def remove_document(self, bank_id: str, doc_id: str):
+        """删除一篇文档"""
+        docs = self._docs.get(bank_id)
+        if not docs or doc_id not in docs:
+            return
+        terms, length = docs.pop(doc_id)
+        self._total_length -= length
+        for term in terms:
+            by_bank = self._postings.get(term)
+            if not by_bank:
+                continue
+            posting = by_bank.get(bank_id)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del by_bank[bank_id]
+            if not by_bank:
+                del self._postings[term]
+    
+    def index_bank(self, bank_id: str, documents: Iterable[Tuple[str, str]]):
+        """重建整个题库分片"""
+        self.drop_bank(bank_id)
+        self._docs[bank_id] = {}
+        for doc_id, text in documents:
+            self.add_document(bank_id, doc_id, text)
+    
+    def drop_bank(self, bank_id: str):
+        """删除整个题库分片"""
+        for doc_id in list(self._docs.get(bank_id, {})):
+            self.remove_document(bank_id, doc_id)
+        self._docs.pop(bank_id, None)
+    
+    def dump_bank(self, bank_id: str) -> Dict[str, Dict[str, int]]:
+        """导出题库分片的倒排表：{词项: {题目ID: 词频}}"""
+        postings: Dict[str, Dict[str, int]] = {}
+        for doc_id, (terms, _) in self._docs.get(bank_id, {}).items():
+            for term in terms:
+                postings.setdefault(term, {})[doc_id] = self._postings[term][bank_id][doc_id]
+        return postings
+    
+    def load_bank(self, bank_id: str, postings: Dict[str, Dict[str, int]]):
+        """载入题库分片的倒排表"""
+        self.drop_bank(bank_id)
+        forward: Dict[str, Dict[str, int]] = {}
+        for term, docs in postings.items():
+            for doc_id, tf in docs.items():
+                forward.setdefault(doc_id, {})[term] = tf
+        self._docs[bank_id] = {}
+        for doc_id, freqs in forward.items():
+            self._add_freqs(bank_id, doc_id, freqs)
+    
+    def _expand(self, term: str) -> List[str]:
+        """在词表中查找包含该片段的词项"""
+        return [t for t in self._postings if term in t]
+    
+    def _match(self, keyword: str, bank_ids: Optional[Iterable[str]]) -> Optional[Dict[str, Dict[str, Set[str]]]]:
+        """
+        求满足全部查询词项的文档
+        返回: {题库ID: {题目ID: 命中的词项集合}}，查询中没有可用词项时返回 None
+        """
+        query = _query_terms(keyword)
+        if not query:
+            return None
+        
+        scope = set(bank_ids) if bank_ids is not None else None
+        matched: Optional[Dict[str, Dict[str, Set[str]]]] = None
+        # 先处理可精确匹配的词项，尽早缩小候选集
+        for term, exact in sorted(query, key=lambda item: not item[1]):
+            hits: Dict[str, Dict[str, Set[str]]] = {}
+            for t in ([term] if exact else self._expand(term)):
+                for bank_id, posting in self._postings.get(t, {}).items():
+                    if scope is not None and bank_id not in scope:
+                        continue
+                    if matched is not None and bank_id not in matched:
+                        continue
+                    bank_hits = hits.setdefault(bank_id, {})
+                    prev = matched.get(bank_id) if matched is not None else None
+                    for doc_id in posting:
+                        if prev is not None and doc_id not in prev:
+                            continue
+                        bank_hits.setdefault(doc_id, set()).add(t)
+            if matched is not None:
+                for bank_id, docs in hits.items():
+                    for doc_id, terms in docs.items():
+                        terms.update(matched[bank_id][doc_id])
+            matched = {b: d for b, d in hits.items() if d}
+            if not matched:
+                break
+        return matched
+    
+    def candidates(self, keyword: str, bank_id: str) -> Optional[Set[str]]:
+        """
+        获取单个题库中可能包含关键词的题目ID（超集，调用方需再做精确比对）
+        返回 None 表示索引无法缩小范围
+        """
+        matched = self._match(keyword, [bank_id])
+        if matched is None:
+            return None
+        return set(matched.get(bank_id, {}))
+    
+    def search(self, keyword: str, bank_ids: Optional[Iterable[str]] = None) -> List[Tuple[float, str, str]]:
+        """
+        跨题库检索，按 BM25 得分降序
+        返回: [(得分, 题库ID, 题目ID)]
+        """
+        matched = self._match(keyword, bank_ids)
+        if not matched:
+            return []
+        
+        total_docs = self.doc_count
+        avg_length = self._total_length / total_docs if total_docs else 0.0
+        idf_cache: Dict[str, float] = {}
+        
+        results = []
+        for bank_id, docs in matched.items():
+            bank_docs = self._docs[bank_id]
+            for doc_id, terms in docs.items():
+                length = bank_docs[doc_id][1]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length) if avg_length else BM25_K1
+                score = 0.0
+                for term in terms:
+                    idf = idf_cache.get(term)
+                    if idf is None:
+                        df = sum(len(p) for p in self._postings[term].values())
+                        idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+                        idf_cache[term] = idf
+                    tf = self._postings[term][bank_id][doc_id]
+                    score += idf * tf * (BM25_K1 + 1) / (tf + norm)
+                results.append((score, bank_id, doc_id))
+        
+        results.sort(key=lambda r: (-r[0], r[1], r[2]))
+        return results
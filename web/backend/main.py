@@ -35,7 +35,7 @@ if sys.platform == 'win32':
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Union, Dict
@@ -47,7 +47,10 @@ from services.paper_service import PaperService, PaperGenerateConfig
 from services.exam_service import ExamService
 from services.ai_service import AIService
 from services.favorite_service import FavoriteService
-from models import Question, QuestionBank
+from services.search_service import SearchService
+from services.storage import change_feed
+from services.storage.codec import FORMATS as DATA_FORMATS, read_file
+from models import Question, QuestionBank, Paper, ExamResult
 
 # 当前版本号
 CURRENT_VERSION = "2.0.0"
@@ -72,12 +75,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 初始化服务
+# 多 worker 部署（web/start.py --workers N）时由启动脚本设置，各 worker 进程共用数据目录
+WORKERS_ENV = "ANSWER_SYSTEM_WORKERS"
+MULTI_WORKER = int(os.environ.get(WORKERS_ENV) or 1) > 1
+
+if MULTI_WORKER:
+    change_feed.enable()
+    
+    @app.middleware("http")
+    async def sync_worker_state(request: Request, call_next):
+        """处理请求前同步其他 worker 的修改：配置文件按修改时间重新加载，题库等缓存按变更通知失效"""
+        app_config.reload_if_changed()
+        change_feed.poll()
+        return await call_next(request)
+
+# 初始化服务（服务内的缓存按存储版本标识校验，考试状态只保存在存储中，可在多个 worker 进程中各自创建）
 bank_service = BankService()
 paper_service = PaperService()
 exam_service = ExamService()
 ai_service = AIService()
 favorite_service = FavoriteService()
+search_service = SearchService()
 
 
 # ============ Pydantic 模型 ============
@@ -140,6 +158,19 @@ class PaperGenerateRequest(BaseModel):
     tags: List[str] = []
     chapters: List[str] = []  # 章节筛选
     score_rules: Optional[Dict[str, float]] = None
+    difficulty_distribution: Optional[Dict[int, float]] = None  # 难度占比
+    chapter_distribution: Optional[Dict[str, float]] = None     # 章节占比
+    target_difficulty: Optional[float] = None
+    tag_quotas: Optional[Dict[str, int]] = None                  # 标签配额
+    total_score: Optional[float] = None
+    allow_shortfall: bool = False
+    seed: Optional[int] = None
+    snapshot: Optional[bool] = None  # 固化试卷快照，不传时按应用配置
+
+
+class PaperBatchGenerateRequest(PaperGenerateRequest):
+    count: int = 2                     # 生成份数
+    max_overlap: Optional[int] = None  # 任意两份之间最多相同的题目数，不传为不限制
 
 
 class AnswerSubmit(BaseModel):
@@ -173,6 +204,10 @@ class PathConfigUpdate(BaseModel):
     papers_dir: Optional[str] = None
     results_dir: Optional[str] = None
     favorites_file: Optional[str] = None
+    storage_backend: Optional[str] = None
+    database_file: Optional[str] = None
+    data_format: Optional[str] = None
+    data_compression: Optional[bool] = None
 
 
 class ExportRequest(BaseModel):
@@ -196,8 +231,14 @@ class ImportRequest(BaseModel):
 # ============ 题库 API ============
 
 @app.get("/api/banks")
-def get_all_banks():
-    """获取所有题库列表"""
+def get_all_banks(request: Request, response: Response):
+    """获取所有题库列表（支持 ETag 协商缓存）"""
+    _, etag = bank_service.get_meta_version()
+    if etag and etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
     return bank_service.get_banks_summary()
 
 
@@ -306,20 +347,39 @@ def get_bank_questions(
     - page=0, page_size=0 表示返回全部（兼容旧版本）
     - page>=1 开始分页
     """
+    chapters = None
+    if chapter:
+        chapters = [""] if chapter == '__uncategorized__' else [chapter]
+    
+    # 无关键词的分页浏览走题库视图，只解析当前页的题目
+    if not keyword and page > 0 and page_size > 0:
+        view = bank_service.get_bank_view(bank_id)
+        if not view:
+            raise HTTPException(status_code=404, detail="题库不存在")
+        items, total = view.select(
+            types=[type] if type else None,
+            chapters=chapters,
+            offset=(page - 1) * page_size,
+            limit=page_size
+        )
+        return {
+            "items": items,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": (total + page_size - 1) // page_size
+        }
+    
     bank = bank_service.get_bank(bank_id)
     if not bank:
         raise HTTPException(status_code=404, detail="题库不存在")
     
-    questions = bank.questions
-    
-    # 应用筛选条件
-    if type:
-        questions = [q for q in questions if q.type == type]
-    if chapter:
-        if chapter == '__uncategorized__':
-            questions = [q for q in questions if not q.chapter]
-        else:
-            questions = [q for q in questions if q.chapter == chapter]
+    # 应用筛选条件（关键词先经全文索引圈定候选，再走题库二级索引）
+    questions = bank.query_questions(
+        types=[type] if type else None,
+        chapters=chapters,
+        ids=search_service.candidates(bank_id, keyword) if keyword else None
+    )
     if keyword:
         keyword_lower = keyword.lower()
         questions = [q for q in questions if keyword_lower in q.question.lower()]
@@ -366,9 +426,8 @@ def add_question(bank_id: str, data: QuestionCreate):
 @app.post("/api/banks/{bank_id}/questions/batch")
 def batch_add_questions(bank_id: str, data: BatchQuestionCreate):
     """批量向题库添加题目"""
-    count = 0
-    for q_data in data.questions:
-        question = Question(
+    questions = [
+        Question(
             type=q_data.type,
             question=q_data.question,
             options=q_data.options,
@@ -378,8 +437,9 @@ def batch_add_questions(bank_id: str, data: BatchQuestionCreate):
             tags=q_data.tags,
             chapter=q_data.chapter
         )
-        if bank_service.add_question_to_bank(bank_id, question):
-            count += 1
+        for q_data in data.questions
+    ]
+    count = bank_service.batch_add_questions(bank_id, questions)
     
     return {"count": count, "message": f"成功添加 {count} 道题目"}
 
@@ -412,7 +472,7 @@ def update_question(bank_id: str, question_id: str, data: QuestionUpdate):
     if data.chapter is not None:
         question.chapter = data.chapter
     
-    bank_service.update_bank(bank)
+    bank_service.update_question_in_bank(bank_id, question)
     return {"message": "更新成功"}
 
 
@@ -439,22 +499,82 @@ def delete_question(bank_id: str, question_id: str):
         raise HTTPException(status_code=500, detail=f"删除题目时发生错误: {str(e)}")
 
 
+# ============ 检索 API ============
+
+@app.get("/api/search")
+def search_questions(
+    q: str = "",
+    page: int = 1,
+    page_size: int = 20,
+    bank_ids: str = ""
+):
+    """
+    跨题库全文检索题目（题干、选项、解析、标签），按相关度排序
+    - bank_ids 为逗号分隔的题库ID，留空表示检索全部题库
+    """
+    scope = [b for b in bank_ids.split(",") if b] if bank_ids else None
+    return search_service.search(q, page=page, page_size=page_size, bank_ids=scope)
+
+
 # ============ 试卷 API ============
 
+# 列表接口分页
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+
+
+def _page_size(page_size: int, legacy: bool) -> Optional[int]:
+    """分页大小：旧版本调用（不分页）返回 None 表示全部"""
+    if legacy:
+        return None
+    return min(page_size if page_size > 0 else DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+
+
+def _paper_item(p: Dict) -> Dict:
+    return {
+        "id": p["id"],
+        "title": p["title"],
+        "description": p["description"],
+        "created_at": p["created_at"],
+        "time_limit": p["time_limit"],
+        "total_score": p["total_score"],
+        "question_count": p["question_count"],
+        "source_banks": p["source_banks"] or []  # 添加来源题库信息用于筛选
+    }
+
+
 @app.get("/api/papers")
-def get_all_papers():
-    """获取所有试卷"""
-    papers = paper_service.get_all_papers()
-    return [{
-        "id": p.id,
-        "title": p.title,
-        "description": p.description,
-        "created_at": p.created_at,
-        "time_limit": p.time_limit,
-        "total_score": p.total_score,
-        "question_count": len(p.questions),
-        "source_banks": p.source_banks  # 添加来源题库信息用于筛选
-    } for p in papers]
+def get_all_papers(
+    page_size: int = 0,
+    cursor: str = "",
+    bank_id: str = "",
+    keyword: str = "",
+    date_from: str = "",
+    date_to: str = "",
+    sort: str = "created_at",
+    order: str = "desc"
+):
+    """
+    获取试卷列表
+    - 不传 page_size 和 cursor 时返回全部试卷的数组（兼容旧版本）
+    - page_size>0 时分页，返回 {items, total, page_size, next_cursor}，下一页传入 cursor=next_cursor
+    - 筛选：bank_id 来源题库，keyword 标题/描述关键词，date_from/date_to 创建日期；
+      排序：sort 为 created_at/title/question_count/total_score/time_limit，order 为 asc/desc
+    """
+    legacy = page_size <= 0 and not cursor
+    try:
+        page = paper_service.query_papers(
+            bank_id=bank_id or None, keyword=keyword or None,
+            date_from=date_from or None, date_to=date_to or None,
+            sort=sort, order=order, page_size=_page_size(page_size, legacy), cursor=cursor or None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    items = [_paper_item(p) for p in page["items"]]
+    if legacy:
+        return items
+    page["items"] = items
+    return page
 
 
 @app.get("/api/papers/{paper_id}")
@@ -475,10 +595,9 @@ def get_paper_questions(paper_id: str):
     return [q.to_dict() for q in questions]
 
 
-@app.post("/api/papers/generate")
-def generate_paper(data: PaperGenerateRequest):
-    """生成试卷"""
-    config = PaperGenerateConfig(
+def _generate_config(data: PaperGenerateRequest) -> PaperGenerateConfig:
+    """组卷请求转为组卷配置"""
+    return PaperGenerateConfig(
         title=data.title,
         description=data.description,
         time_limit=data.time_limit,
@@ -491,14 +610,44 @@ def generate_paper(data: PaperGenerateRequest):
         max_difficulty=data.max_difficulty,
         tags=data.tags,
         chapters=data.chapters,
-        score_rules=data.score_rules
+        score_rules=data.score_rules,
+        difficulty_distribution=data.difficulty_distribution,
+        chapter_distribution=data.chapter_distribution,
+        target_difficulty=data.target_difficulty,
+        tag_quotas=data.tag_quotas,
+        total_score=data.total_score,
+        allow_shortfall=data.allow_shortfall,
+        seed=data.seed,
+        snapshot=data.snapshot
     )
+
+
+@app.post("/api/papers/generate")
+def generate_paper(data: PaperGenerateRequest):
+    """生成试卷"""
+    paper, report = paper_service.generate_paper_with_report(_generate_config(data))
+    if report['error']:
+        raise HTTPException(status_code=400, detail=report['error'])
     
-    paper, error = paper_service.generate_paper(config)
-    if error:
-        raise HTTPException(status_code=400, detail=error)
+    return {"id": paper.id, "message": "生成成功", "paper": paper.to_dict(), "report": report}
+
+
+@app.post("/api/papers/generate-batch")
+def generate_papers(data: PaperBatchGenerateRequest):
+    """批量生成平行试卷（共用候选池，可限制两两之间的重复题目数）"""
+    try:
+        papers, report = paper_service.generate_papers(_generate_config(data), data.count, data.max_overlap)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if report['error']:
+        raise HTTPException(status_code=400, detail=report['error'])
     
-    return {"id": paper.id, "message": "生成成功", "paper": paper.to_dict()}
+    return {
+        "ids": [p.id for p in papers],
+        "message": f"已生成{len(papers)}份试卷",
+        "papers": [p.to_dict() for p in papers],
+        "report": report
+    }
 
 
 @app.delete("/api/papers/{paper_id}")
@@ -527,49 +676,96 @@ def get_in_progress_exam():
 
 
 @app.post("/api/exam/start/{paper_id}")
-def start_exam(paper_id: str):
-    """开始考试"""
-    result = exam_service.start_exam(paper_id)
+def start_exam(paper_id: str, exam_id: Optional[str] = None, restart: bool = False):
+    """
+    开始或恢复考试
+    传入 exam_id 时恢复该场进行中的考试（多名考生可同时作答同一试卷，各自按考试ID恢复）；
+    否则恢复该试卷最近开始的进行中考试，restart 为 true 时新建考试记录（重新开始）
+    """
+    result = exam_service.open_exam(paper_id, resume=not restart, exam_id=exam_id)
     if not result:
         raise HTTPException(status_code=400, detail="无法开始考试")
     return {
         "exam_id": result.id,
         "paper_title": result.paper_title,
-        "total_score": result.total_score
+        "total_score": result.total_score,
+        "answers": {qr.question_id: qr.user_answer for qr in result.details if qr.user_answer is not None}
     }
 
 
+@app.get("/api/exam/{exam_id}/questions")
+def get_exam_questions(exam_id: str):
+    """获取考试的题目（按作答顺序，打乱顺序的考试已按本场考试的排列调整选项）"""
+    questions = exam_service.get_exam_questions(exam_id)
+    if questions is None:
+        raise HTTPException(status_code=404, detail="考试不存在")
+    return [q.to_dict() for q in questions]
+
+
 @app.post("/api/exam/{exam_id}/answer")
 def submit_answer(exam_id: str, data: AnswerSubmit):
     """提交答案"""
-    exam_service.submit_answer(data.question_id, data.answer)
+    if not exam_service.submit_answer(data.question_id, data.answer, exam_id=exam_id):
+        raise HTTPException(status_code=400, detail="考试不存在或已结束")
     return {"message": "提交成功"}
 
 
 @app.post("/api/exam/{exam_id}/submit")
 def finish_exam(exam_id: str):
     """完成考试"""
-    result = exam_service.finish_exam()
+    result = exam_service.finish_exam(exam_id=exam_id)
     if not result:
         raise HTTPException(status_code=400, detail="无法完成考试")
     return result.to_dict()
 
 
 @app.get("/api/results")
-def get_all_results():
-    """获取所有考试记录"""
-    results = exam_service.get_all_results()
-    return [{
-        "id": r.id,
-        "paper_id": r.paper_id,
-        "paper_title": r.paper_title,
-        "user_score": r.user_score,
-        "total_score": r.total_score,
-        "start_time": r.start_time,
-        "end_time": r.end_time,
-        "status": r.status,
-        "source_banks": r.source_banks if hasattr(r, 'source_banks') else []
-    } for r in results]
+def get_all_results(
+    page_size: int = 0,
+    cursor: str = "",
+    bank_id: str = "",
+    status: str = "",
+    paper_id: str = "",
+    date_from: str = "",
+    date_to: str = "",
+    min_score_rate: Optional[float] = None,
+    max_score_rate: Optional[float] = None,
+    sort: str = "start_time",
+    order: str = "desc"
+):
+    """
+    获取考试记录
+    - 不传 page_size 和 cursor 时返回全部记录的数组（兼容旧版本）
+    - page_size>0 时分页，返回 {items, total, page_size, next_cursor}，下一页传入 cursor=next_cursor
+    - 筛选：bank_id 来源题库，status 状态，paper_id 试卷，date_from/date_to 开始日期，
+      min_score_rate/max_score_rate 得分率区间（百分比）；
+      排序：sort 为 start_time/end_time/paper_title/user_score/score_rate，order 为 asc/desc
+    """
+    legacy = page_size <= 0 and not cursor
+    try:
+        page = exam_service.query_results(
+            bank_id=bank_id or None, status=status or None, paper_id=paper_id or None,
+            date_from=date_from or None, date_to=date_to or None,
+            min_score_rate=min_score_rate, max_score_rate=max_score_rate,
+            sort=sort, order=order, page_size=_page_size(page_size, legacy), cursor=cursor or None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    items = [{
+        "id": r["id"],
+        "paper_id": r["paper_id"],
+        "paper_title": r["paper_title"],
+        "user_score": r["user_score"],
+        "total_score": r["total_score"],
+        "start_time": r["start_time"],
+        "end_time": r["end_time"],
+        "status": r["status"],
+        "source_banks": r["source_banks"] or []
+    } for r in page["items"]]
+    if legacy:
+        return items
+    page["items"] = items
+    return page
 
 
 @app.get("/api/results/{result_id}")
@@ -712,14 +908,11 @@ def get_banks_with_favorites():
 @app.post("/api/favorites/{bank_id}/{question_id}")
 def add_favorite(bank_id: str, question_id: str):
     """添加收藏"""
-    # 如果 bank_id 是 unknown，尝试从所有题库中查找该题目
+    # 如果 bank_id 是 unknown，按题目定位索引查找该题目所在的题库
     if bank_id == "unknown":
-        all_banks = bank_service.get_all_banks()
-        for b in all_banks:
-            q = b.get_question(question_id)
-            if q:
-                bank_id = b.id
-                break
+        bank_ids = bank_service.locate_questions([question_id]).get(question_id)
+        if bank_ids:
+            bank_id = bank_ids[0]
     
     bank = bank_service.get_bank(bank_id)
     if not bank:
@@ -821,7 +1014,11 @@ def get_path_config():
         "banks_dir": app_config.path_config.banks_dir,
         "papers_dir": app_config.path_config.papers_dir,
         "results_dir": app_config.path_config.results_dir,
-        "favorites_file": app_config.path_config.favorites_file
+        "favorites_file": app_config.path_config.favorites_file,
+        "storage_backend": app_config.path_config.storage_backend,
+        "database_file": app_config.path_config.database_file,
+        "data_format": app_config.path_config.data_format,
+        "data_compression": app_config.path_config.data_compression
     }
 
 
@@ -836,6 +1033,20 @@ def update_path_config(data: PathConfigUpdate):
         app_config.path_config.results_dir = data.results_dir
     if data.favorites_file is not None:
         app_config.path_config.favorites_file = data.favorites_file
+    # 存储后端在启动时确定，切换后需重启
+    if data.storage_backend is not None:
+        if data.storage_backend not in ("json", "sqlite"):
+            raise HTTPException(status_code=400, detail="不支持的存储后端")
+        app_config.path_config.storage_backend = data.storage_backend
+    if data.database_file is not None:
+        app_config.path_config.database_file = data.database_file
+    # 文件格式只影响之后写入的文件，读取时自动识别；已有文件可用 services.storage.convert 转换
+    if data.data_format is not None:
+        if data.data_format not in DATA_FORMATS:
+            raise HTTPException(status_code=400, detail="不支持的数据格式")
+        app_config.path_config.data_format = data.data_format
+    if data.data_compression is not None:
+        app_config.path_config.data_compression = data.data_compression
     
     # 保存配置
     app_config.save()
@@ -978,8 +1189,7 @@ def scan_import_folder(path: str):
     favorites_file = import_path / "favorites.json"
     if favorites_file.exists():
         try:
-            with open(favorites_file, 'r', encoding='utf-8') as f:
-                fav_data = json.load(f)
+            fav_data = read_file(favorites_file)
             available["favorites"] = len(fav_data) > 0
             available["favorites_count"] = len(fav_data)
         except:
@@ -1016,24 +1226,15 @@ def import_data(data: ImportRequest):
             count = 0
             for bank_file in banks_dir.glob("bank_*.json"):
                 try:
-                    with open(bank_file, 'r', encoding='utf-8') as f:
-                        bank_data = json.load(f)
+                    bank_data = read_file(bank_file)
                     
                     # 尝试保留原始 ID 以维持试卷关联
                     bank = QuestionBank.from_dict(bank_data)
                     bank_service._save_bank(bank)
                     
                     # 更新元数据
-                    meta = bank_service._load_meta()
-                    meta[bank.id] = {
-                        'name': bank.name,
-                        'description': bank.description,
-                        'subject': bank.subject,
-                        'question_count': len(bank.questions),
-                        'created_at': bank.created_at,
-                        'updated_at': bank.updated_at
-                    }
-                    bank_service._save_meta(meta)
+                    with bank_service._edit_meta() as meta:
+                        meta[bank.id] = bank_service._meta_entry(bank)
                     count += 1
                 except Exception as e:
                     errors.append(f"导入题库失败 ({bank_file.name}): {str(e)}")
@@ -1047,12 +1248,9 @@ def import_data(data: ImportRequest):
             count = 0
             for paper_file in papers_dir.glob("paper_*.json"):
                 try:
-                    with open(paper_file, 'r', encoding='utf-8') as f:
-                        paper_data = json.load(f)
-                    # 直接复制到试卷目录
-                    target_dir = Path(app_config.path_config.papers_dir)
-                    target_dir.mkdir(parents=True, exist_ok=True)
-                    shutil.copy2(paper_file, target_dir / paper_file.name)
+                    paper_data = read_file(paper_file)
+                    # 通过存储后端写入（保留原始 ID）
+                    paper_service.update_paper(Paper.from_dict(paper_data))
                     count += 1
                 except Exception as e:
                     errors.append(f"导入试卷失败 ({paper_file.name}): {str(e)}")
@@ -1066,10 +1264,9 @@ def import_data(data: ImportRequest):
             count = 0
             for result_file in results_dir.glob("result_*.json"):
                 try:
-                    # 直接复制到成绩目录
-                    target_dir = Path(app_config.path_config.results_dir)
-                    target_dir.mkdir(parents=True, exist_ok=True)
-                    shutil.copy2(result_file, target_dir / result_file.name)
+                    result_data = read_file(result_file)
+                    # 通过存储后端写入（保留原始 ID）
+                    exam_service._save_result(ExamResult.from_dict(result_data))
                     count += 1
                 except Exception as e:
                     errors.append(f"导入成绩失败 ({result_file.name}): {str(e)}")
@@ -1081,8 +1278,7 @@ def import_data(data: ImportRequest):
         fav_file = import_path / "favorites.json"
         if fav_file.exists():
             try:
-                with open(fav_file, 'r', encoding='utf-8') as f:
-                    fav_data = json.load(f)
+                fav_data = read_file(fav_file)
                 
                 # 获取当前收藏列表
                 current_favs = favorite_service.get_all_favorites()
@@ -1172,6 +1368,18 @@ def get_current_version():
     }
 
 
+@app.get("/api/system/cache-stats")
+def get_cache_stats():
+    """获取题库缓存统计"""
+    return bank_service.get_cache_stats()
+
+
+@app.get("/api/system/autosave-stats")
+def get_autosave_stats():
+    """获取答题自动保存统计（未写入的答案数与持久化延迟）"""
+    return exam_service.get_autosave_stats()
+
+
 @app.get("/api/system/select-folder")
 def select_folder():
     """打开文件夹选择对话框"""
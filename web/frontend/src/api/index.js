@@ -47,6 +47,11 @@ export const bankApi = {
     api.post(`/banks/${bankId}/questions/batch`, { questions }),
 };
 
+// ============ 检索 API ============
+export const searchApi = {
+  search: (q, params = {}) => api.get("/search", { params: { q, ...params } }),
+};
+
 // ============ 试卷 API ============
 export const paperApi = {
   getAll: () => api.get("/papers"),
@@ -58,7 +63,8 @@ export const paperApi = {
 
 // ============ 考试 API ============
 export const examApi = {
-  start: (paperId) => api.post(`/exam/start/${paperId}`),
+  start: (paperId, params) => api.post(`/exam/start/${paperId}`, null, { params }),
+  getQuestions: (examId) => api.get(`/exam/${examId}/questions`),
   submitAnswer: (examId, data) => api.post(`/exam/${examId}/answer`, data),
   finish: (examId) => api.post(`/exam/${examId}/submit`),
   getInProgress: () => api.get("/exam/in-progress"),
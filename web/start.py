@@ -1,6 +1,7 @@
 """
 智题坊 - 启动脚本
 支持开发模式和打包后运行
+生产模式可用 --workers N 启动多个 worker 进程（共用数据目录，见 web/backend/main.py）
 """
 import subprocess
 import sys
@@ -53,14 +54,12 @@ def check_dependencies():
         subprocess.run([sys.executable, "-m", "pip", "install", "fastapi", "uvicorn"])
 
 
-def start_production_server():
-    """生产模式：使用 FastAPI 同时服务 API 和静态文件"""
+def create_app():
+    """创建挂载了前端静态文件的 FastAPI 应用（多 worker 模式下每个 worker 进程各自调用）"""
     # 将项目根目录添加到 Python 路径
     sys.path.insert(0, str(APP_ROOT))
     sys.path.insert(0, str(BACKEND_DIR))
     
-    import uvicorn
-    from fastapi import FastAPI
     from fastapi.staticfiles import StaticFiles
     from fastapi.responses import FileResponse
     
@@ -104,12 +103,44 @@ def start_production_server():
             # 返回 index.html 以支持 SPA 路由
             return FileResponse(str(FRONTEND_DIST / "index.html"))
     
+    return app
+
+
+def get_workers() -> int:
+    """命令行参数 --workers N（或 --workers=N）指定的 worker 进程数，默认 1"""
+    args = sys.argv[1:]
+    for i, arg in enumerate(args):
+        value = None
+        if arg == "--workers" and i + 1 < len(args):
+            value = args[i + 1]
+        elif arg.startswith("--workers="):
+            value = arg.split("=", 1)[1]
+        if value is not None:
+            try:
+                return max(1, int(value))
+            except ValueError:
+                print(f"无效的 worker 数量: {value}")
+    return 1
+
+
+def start_production_server():
+    """生产模式：使用 FastAPI 同时服务 API 和静态文件"""
+    import uvicorn
+    
+    workers = get_workers()
+    if workers > 1 and IS_FROZEN:
+        # 打包后的程序无法按模块路径在子进程中重新导入应用
+        print("打包版本不支持多 worker 模式，使用单进程运行")
+        workers = 1
+    
     print()
     print("=" * 50)
     print("           智 题 坊")
     print("=" * 50)
     print()
     print("  服务正在启动...")
+    if workers > 1:
+        print(f"  worker 进程数: {workers}")
     print()
     print("  访问地址: http://localhost:8000")
     print()
@@ -125,7 +156,13 @@ def start_production_server():
     
     # 启动服务
     # 在打包环境下禁用颜色输出，避免 isatty 错误
-    uvicorn.run(app, host="127.0.0.1", port=8000, log_level="warning", use_colors=not IS_FROZEN)
+    if workers > 1:
+        # 多 worker：各进程按模块路径重新导入并创建应用，通过环境变量告知后端启用跨进程同步
+        os.environ["ANSWER_SYSTEM_WORKERS"] = str(workers)
+        uvicorn.run("start:create_app", factory=True, app_dir=str(WEB_ROOT), workers=workers,
+                    host="127.0.0.1", port=8000, log_level="warning", use_colors=not IS_FROZEN)
+    else:
+        uvicorn.run(create_app(), host="127.0.0.1", port=8000, log_level="warning", use_colors=not IS_FROZEN)
 
 
 def start_dev_server():
@@ -199,7 +236,7 @@ def main():
         start_production_server()
         return
     
-    # 开发模式：检查是否有前端构建产物
+    # 开发模式：检查是否有前端构建产物（开发服务器使用 --reload，不支持多 worker）
     use_production = FRONTEND_DIST.exists() and "--dev" not in sys.argv
     
     if use_production: